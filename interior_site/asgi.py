@@ -3,6 +3,8 @@ ASGI config for interior_site project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Production server profile: interior_site/gunicorn_asgi.py
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -12,5 +14,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'interior_site.settings')
+# Serve the public read endpoints from main/async_views.py under ASGI
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
 
 application = get_asgi_application()
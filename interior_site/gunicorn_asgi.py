@@ -0,0 +1,49 @@
+"""
+Gunicorn profile for serving interior_site.asgi with Uvicorn workers.
+
+    gunicorn -c interior_site/gunicorn_asgi.py interior_site.asgi:application
+
+Each worker runs one event loop, so the async read endpoints can hold many
+slow-client connections without tying up a worker process per request.
+"""
+import glob
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+# I/O bound event-loop workers: one per core is enough
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Keep-alive longer than the load balancer's idle timeout, otherwise it can
+# reuse a connection we have just closed
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = 2000
+max_requests_jitter = 200
+
+# Only the load balancer may set the client address via X-Forwarded-For;
+# trusting '*' lets any client pick its own IP and dodge the throttles
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+accesslog = '-'
+
+
+def on_starting(server):
+    # Fresh metrics for a fresh master: drop files left by a previous run's
+    # workers (main/metrics.py, METRICS_MULTIPROC_DIR)
+    directory = os.environ.get('METRICS_MULTIPROC_DIR')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    # Recycled worker (max_requests): fold its counters into archive.json so
+    # per-pid files don't pile up and a reused pid starts clean
+    directory = os.environ.get('METRICS_MULTIPROC_DIR')
+    if directory:
+        from main.metrics import mark_process_dead
+        mark_process_dead(worker.pid, directory)
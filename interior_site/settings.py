@@ -34,9 +34,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.MetricsMiddleware',
+    'main.middleware.QueryInspectorMiddleware',
+    'main.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, async-capable wrapper (ASGI par poora stack async rehta hai)
+    'main.middleware.StaticFilesMiddleware',
+    'main.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,6 +78,32 @@ DATABASES = {
     )
 }
 
+# Read replicas (main/dbrouting.py): DATABASE_REPLICA_URLS comma-separated.
+# main.views ke GET requests replica se padhte hain, writes hamesha primary par.
+# Write ke baad wo client STICKY_SECONDS tak primary se padhta hai (cookie / token),
+# taaki admin ko apne edits turant dikhein. Local test: primary ki SQLite file
+# copy karke uska URL yahan dein (replicas par migrate nahi chalta).
+for _i, _url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]), 1):
+    DATABASES[f'replica_{_i}'] = {
+        **dj_database_url.parse(_url, conn_max_age=600, conn_health_checks=True),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['main.dbrouting.PrimaryReplicaRouter']
+DATABASE_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': env.int('DATABASE_STICKY_SECONDS', default=15),
+    'COOKIE': 'db_primary_until',
+    'HEALTH_CHECK_INTERVAL': 10,  # seconds between probes of one replica
+    'MAX_LAG': env.int('DATABASE_REPLICA_MAX_LAG', default=5),  # seconds
+}
+
+# Cache (API responses). Production mein Redis/Memcached URL dein, e.g. redis://...
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+API_CACHE_TIMEOUT = env.int('API_CACHE_TIMEOUT', default=300)
+API_CACHE_LOCK_TIMEOUT = 5
+
 # Custom User Model
 AUTH_USER_MODEL = 'main.User'
 
@@ -118,11 +149,157 @@ CLOUDINARY_STORAGE = {
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication + in-process LRU cache (har request par Token/User query nahi)
+        'main.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # orjson based (stdlib fallback agar orjson install nahi hai)
+    'DEFAULT_RENDERER_CLASSES': [
+        'main.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'main.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Throttles client IP se key karte hain. 0 = REMOTE_ADDR, jo uvicorn
+    # sirf FORWARDED_ALLOW_IPS (load balancer) ke X-Forwarded-For se set karta
+    # hai. Bina uvicorn proxy handling ke N proxies ke peeche ho toh N set karein;
+    # None par client ka bheja poora X-Forwarded-For key ban jaata hai (spoofable).
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+}
+
+# Native async read endpoints (main/async_views.py). asgi.py isko on karta hai;
+# WSGI (gunicorn sync workers) par off rehna chahiye
+ASYNC_READ_VIEWS = env.bool('ASYNC_READ_VIEWS', default=False)
+
+# Responsive image variants: name -> max width (px). Cloudinary URL mein
+# c_limit,w_<width>,q_auto,f_auto transformation jodkar banaye jaate hain.
+IMAGE_VARIANTS = {
+    'thumbnail': 320,
+    'card': 640,
+    'full': 1600,
+}
+# True: naye uploads ka sirf "v<version>/<public_id>" save hoga, poora URL nahi
+IMAGE_STORE_PUBLIC_ID = env.bool('IMAGE_STORE_PUBLIC_ID', default=False)
+
+# API Pagination (keyset/cursor based)
+API_PAGE_SIZE = env.int('API_PAGE_SIZE', default=24)
+API_MAX_PAGE_SIZE = env.int('API_MAX_PAGE_SIZE', default=100)
+# Purana frontend poori list expect karta hai; jab tak woh cursor use nahi karta, True rakhein
+API_LEGACY_UNPAGINATED = env.bool('API_LEGACY_UNPAGINATED', default=True)
+
+# Streaming catalog export: rows per DB fetch / prefetch batch
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=500)
+
+# Batch update/delete endpoints
+API_BATCH_MAX_ITEMS = env.int('API_BATCH_MAX_ITEMS', default=500)
+
+# Bulk import (CSV / NDJSON)
+IMPORT_BATCH_SIZE = env.int('IMPORT_BATCH_SIZE', default=500)
+IMPORT_MAX_ERRORS = 1000
+
+# Token -> user cache used by CachedTokenAuthentication. ENABLED unset (None) ka
+# matlab: sirf shared cache (Redis/Memcached) par on; locmem par doosre workers
+# ko token revoke hone ka pata nahi chalta. Single process (runserver) mein True kar sakte hain.
+AUTH_TOKEN_CACHE = {
+    'ENABLED': env.bool('AUTH_TOKEN_CACHE', default=None),
+    'MAX_SIZE': env.int('AUTH_TOKEN_CACHE_SIZE', default=10000),
+    'TTL': env.int('AUTH_TOKEN_CACHE_TTL', default=300),  # seconds
+}
+
+# Delta sync /api/projects/changes/ (main/changes.py). prune_changes ko roz
+# cron se chalayein; RETENTION_DAYS se purana cursor 410 (full resync) paata hai.
+DELTA_SYNC = {
+    'PAGE_SIZE': env.int('DELTA_SYNC_PAGE_SIZE', default=500),  # log entries per response
+    'RETENTION_DAYS': env.int('DELTA_SYNC_RETENTION_DAYS', default=30),
+}
+
+# "Similar designs" (main/related.py): har project ki top SIZE list pehle se
+# compute hoti hai; writes par sirf affected projects refresh hote hain.
+RELATED_PROJECTS = {
+    'SIZE': env.int('RELATED_PROJECTS_SIZE', default=12),  # stored per project, max ?limit=
+    'DEFAULT_LIMIT': 6,
+    'MIN_SCORE': 0.3,
+    'WEIGHTS': {
+        'categories': 0.5,  # Jaccard overlap
+        'design_type': 0.15,
+        'interior_or_exterior': 0.2,
+        'design_loc': 0.15,
+    },
+    'BATCH_SIZE': 500,
+}
+
+# Background jobs (main/jobs.py): snapshot render aur related lists ka refresh
+# write ke baad `manage.py run_jobs` worker karta hai. Worker ko web ke saath
+# alag process mein chalayein. EAGER=True (bina worker ke local dev) par jobs
+# request mein hi commit ke baad chal jaati hain.
+JOBS = {
+    'EAGER': env.bool('JOBS_EAGER', default=False),
+    'THREADS': env.int('JOBS_THREADS', default=4),
+    'BATCH_SIZE': env.int('JOBS_BATCH_SIZE', default=200),  # jobs per handler call
+    'POLL_INTERVAL': 1,  # seconds, when the queue is empty
+    'LEASE_SECONDS': 300,  # a claimed batch is claimed again after this (worker died)
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 10,  # seconds before the first retry, doubled after each
+}
+
+# API response compression (main.middleware.CompressionMiddleware).
+# Brotli tabhi jab 'brotli' package install ho, warna sirf gzip.
+API_COMPRESSION = {
+    'MIN_SIZE': env.int('API_COMPRESSION_MIN_SIZE', default=1024),  # bytes
+    'CONTENT_TYPES': ('application/json', 'application/x-ndjson'),
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'STREAM_FLUSH_BYTES': 64 * 1024,
+}
+
+# Per-route request metrics, admin-only /api/metrics/ (Prometheus text format).
+# Gunicorn ke kai workers ho toh METRICS_MULTIPROC_DIR set karein, taaki har
+# worker apna data wahan likhe aur scrape sabka total dikhaye.
+METRICS = {
+    'ENABLED': env.bool('METRICS_ENABLED', default=True),
+    'MULTIPROC_DIR': env('METRICS_MULTIPROC_DIR', default=''),
+    'FLUSH_INTERVAL': 10,  # seconds between a worker's file writes
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100),
+}
+
+# N+1 detector + slow-query log (main/querycheck.py), development/tests ke liye.
+# RAISE=True par N+1 milte hi NPlusOneError (tests fail ho jayenge).
+QUERY_INSPECTOR = {
+    'ENABLED': env.bool('QUERY_INSPECTOR', default=DEBUG),
+    'REPEAT_THRESHOLD': env.int('QUERY_REPEAT_THRESHOLD', default=5),
+    'SLOW_QUERY_MS': env.int('SLOW_QUERY_MS', default=100),
+    'RAISE': env.bool('QUERY_INSPECTOR_RAISE', default=False),
+    'STACK_DEPTH': 8,  # app frames shown per report
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'main': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Login/registration throttles (main/throttling.py). 'cache' backend saare
+# workers mein shared limit deta hai; 'local' har process ka apna token bucket.
+# Keys: 'ip' = client IP, 'identity' = request ka username/email.
+API_THROTTLES = {
+    'BACKEND': env('API_THROTTLE_BACKEND', default='cache'),
+    'RATES': {
+        'login': {'ip': '30/min', 'identity': '10/min'},
+        'register': {'ip': '10/min', 'identity': '5/min'},
+        'google_check': {'ip': '30/min', 'identity': '10/min'},
+        'reset_password': {'ip': '10/min', 'identity': '3/min'},
+    },
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
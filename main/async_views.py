@@ -0,0 +1,148 @@
+"""
+Native async versions of the public read endpoints.
+
+Under ASGI these skip the per-request sync_to_async hop that DRF's sync
+@api_view views pay, so one worker can keep many slow clients open. They
+return the same payloads, ETags and cache entries as the sync views in
+views.py; main/urls.py picks them when settings.ASYNC_READ_VIEWS is on.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
+
+from .cache import acategories_key, aget_or_build, alist_key, aproject_key
+from .changes import ahead_id
+from .conditional import aconditional, make_etag, query_string
+from .fieldsets import InvalidFields, aproject_documents, project_queryset, requested_fields
+from .models import Category, Feedback, Project
+from .pagination import InvalidCursor, get_page_size, keyset_queryset, page_payload, split_page, wants_pagination
+from .renderers import dumps
+from .serializers import FeedbackSerializer
+from .snapshots import aproject_document, render_list, render_page
+from . import views
+from .views import feedback_state, raw_json_response
+
+
+def _json(data, status=200):
+    # Same encoder as the DRF renderer, so both view sets emit identical bytes
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+# ------------------ HELPERS ------------------
+async def _fetch(queryset):
+    # Prefetches (if any) run chunk-wise inside aiterator (Django 5+)
+    return [obj async for obj in queryset.aiterator(chunk_size=500)]
+
+
+async def apaginate_queryset(queryset, ordering, cursor=None, page_size=None):
+    """Async twin of pagination.paginate_queryset()."""
+    queryset = keyset_queryset(queryset, ordering, cursor)
+    return split_page(await _fetch(queryset[:page_size + 1]), ordering, page_size)
+
+
+# ------------------ CONDITIONAL GET VALIDATORS ------------------
+async def projects_validators(request):
+    return make_etag('projects', await ahead_id(), await acategories_key(), query_string(request)), None
+
+
+async def project_detail_validators(request, id):
+    last = await Project.objects.filter(id=id).values_list('updated_at', flat=True).afirst()
+    if last is None:
+        return None
+    return make_etag('project', id, last, query_string(request)), last
+
+
+async def categories_validators(request):
+    return make_etag(await acategories_key()), None
+
+
+async def feedback_validators(request, project_id):
+    state = await feedback_state(project_id).afirst()
+    if state is None:
+        return None
+    return make_etag('feedback', project_id, *state, query_string(request)), None
+
+
+# ------------------ VIEWS ------------------
+@require_safe
+@aconditional(projects_validators)
+async def projects_api(request):
+    try:
+        fields = requested_fields(request.GET)
+    except InvalidFields as e:
+        return _json({"error": str(e)}, status=400)
+
+    async def build():
+        projects = project_queryset(fields).order_by('-id')
+        if not wants_pagination(request):
+            return render_list(await aproject_documents(await _fetch(projects), fields))
+
+        rows, next_cursor = await apaginate_queryset(
+            projects, ['-id'], request.GET.get('cursor'), get_page_size(request)
+        )
+        return render_page(await aproject_documents(rows, fields), next_cursor)
+
+    try:
+        return raw_json_response(await aget_or_build(await alist_key('projects-doc', request.GET), build))
+    except InvalidCursor:
+        return _json({"error": "Invalid cursor"}, status=400)
+
+
+@require_safe
+@aconditional(project_detail_validators)
+async def project_detail_api(request, id):
+    try:
+        fields = requested_fields(request.GET)
+    except InvalidFields as e:
+        return _json({"error": str(e)}, status=400)
+
+    async def build():
+        if fields is None:
+            doc = await aproject_document(id)
+        else:
+            docs = await aproject_documents(await _fetch(project_queryset(fields).filter(id=id)), fields)
+            doc = docs[0] if docs else None
+        if doc is None:
+            raise Http404
+        return doc
+
+    try:
+        return raw_json_response(await aget_or_build(await aproject_key(id, request.GET), build))
+    except Http404:
+        return _json({"detail": "No Project matches the given query."}, status=404)
+
+
+@require_safe
+@aconditional(categories_validators)
+async def categories_list(request):
+    async def build():
+        return [{"id": c.id, "name": c.name} async for c in Category.objects.aiterator()]
+
+    return _json(await aget_or_build(await acategories_key(), build))
+
+
+@csrf_exempt  # same as DRF's @api_view; POST is delegated to it
+@aconditional(feedback_validators)
+async def add_feedback_api(request, project_id):
+    if request.method not in ('GET', 'HEAD'):
+        # Writes (POST) stay on the sync DRF view: auth, transactions, counters
+        return await sync_to_async(views.add_feedback_api)(request, project_id=project_id)
+
+    try:
+        await aget_object_or_404(Project.objects.only('id'), id=project_id)
+    except Http404:
+        return _json({"detail": "No Project matches the given query."}, status=404)
+
+    feedbacks = Feedback.objects.filter(project_id=project_id).select_related('user').order_by('-date', '-id')
+    if not wants_pagination(request):
+        return _json(FeedbackSerializer(await _fetch(feedbacks), many=True).data)
+    try:
+        rows, next_cursor = await apaginate_queryset(
+            feedbacks, ['-date', '-id'], request.GET.get('cursor'), get_page_size(request)
+        )
+    except InvalidCursor:
+        return _json({"error": "Invalid cursor"}, status=400)
+    return _json(page_payload(FeedbackSerializer(rows, many=True).data, next_cursor))
+
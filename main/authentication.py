@@ -0,0 +1,131 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication
+
+
+def _generation_key(user_id):
+    return f'main:auth:gen:{user_id}'
+
+
+def _enabled():
+    """
+    AUTH_TOKEN_CACHE['ENABLED'], or by default only on a shared cache: with a
+    per-process (locmem) or dummy cache other workers never see a
+    generation bump and would keep a revoked token for the whole TTL.
+    """
+    enabled = settings.AUTH_TOKEN_CACHE['ENABLED']
+    if enabled is None:
+        return not isinstance(caches['default'], (LocMemCache, DummyCache))
+    return enabled
+
+
+def _copies(user, token):
+    """Each request gets its own instances; a view changing request.user must not touch the cached one."""
+    user = copy.copy(user)
+    token = copy.copy(token)
+    token.user = user
+    return user, token
+
+
+class TokenCache:
+    """
+    Bounded LRU of token key -> (user, token) with a TTL. Per process; other
+    workers notice invalidations through a per-user generation number kept
+    in the shared Django cache (see _enabled). Callers get copies.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        if not _enabled():
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+        if entry is not None:
+            _, user, token, generation = entry
+            if cache.get(_generation_key(user.pk), 0) == generation:
+                self.hits += 1
+                return _copies(user, token)
+            self.discard(key)
+        self.misses += 1
+        return None
+
+    def set(self, key, user, token):
+        if not _enabled():
+            return
+        user, token = _copies(user, token)
+        generation = cache.get(_generation_key(user.pk), 0)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user, token, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        """Drop the user's tokens here and make other workers re-check theirs."""
+        try:
+            cache.incr(_generation_key(user_id))
+        except ValueError:
+            cache.set(_generation_key(user_id), int(time.time() * 1000), None)
+        with self._lock:
+            stale = [k for k, entry in self._entries.items() if entry[1].pk == user_id]
+            for key in stale:
+                del self._entries[key]
+        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+token_cache = TokenCache(
+    max_size=settings.AUTH_TOKEN_CACHE['MAX_SIZE'],
+    ttl=settings.AUTH_TOKEN_CACHE['TTL'],
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in for DRF's TokenAuthentication that skips the Token + User query
+    while the token is cached. See token_cache for TTL / invalidation.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
@@ -0,0 +1,292 @@
+"""
+In-process load benchmark for every endpoint in main/urls.py.
+
+Each Endpoint issues one request through django.test.Client (no network,
+so the numbers are view + ORM + rendering time), records its latency and
+counts the SQL it ran. `budget` is the most queries one request of that
+endpoint may run; going over it usually means an N+1 crept in. Objects the
+write endpoints need are prepared outside the timed section and everything
+the benchmark creates is removed afterwards.
+"""
+import io
+import secrets
+import statistics
+import time
+import uuid
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from .cache import drop_response_cache
+from .models import Category, ChangeLogEntry, Feedback, Project, ProjectImage, User
+from .pagination import encode_cursor
+from .renderers import dumps, loads
+from .signals import batch_project_changes
+from .snapshots import rebuild_snapshots
+
+BENCH_PREFIX = '[bench]'
+BENCH_USER_PREFIX = 'bench_admin_'
+REGISTER_PREFIX = 'bench_reg_'
+
+
+# ------------------ STATS ------------------
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+def summarize(timings, queries, statuses, budget):
+    ordered = sorted(timings)
+    total = sum(ordered)
+    return {
+        'requests': len(ordered),
+        'errors': sum(n for code, n in statuses.items() if int(code) >= 400),
+        'status': statuses,
+        'latency_ms': {
+            'p50': round(percentile(ordered, 50), 3),
+            'p90': round(percentile(ordered, 90), 3),
+            'p95': round(percentile(ordered, 95), 3),
+            'p99': round(percentile(ordered, 99), 3),
+            'max': round(ordered[-1], 3),
+            'mean': round(statistics.fmean(ordered), 3),
+        },
+        # Single client, back to back: requests per second of pure server time
+        'rps': round(len(ordered) / (total / 1000), 1) if total else None,
+        'queries': {'max': max(queries), 'mean': round(statistics.fmean(queries), 2)},
+        'budget': budget,
+        'over_budget': max(queries) > budget,
+    }
+
+
+# ------------------ CONTEXT ------------------
+class BenchContext:
+    """
+    Client, admin credentials and the sample rows the requests point at.
+    The admin is a fresh user with a random name and password, so a run
+    never takes over (or deletes) an account that was already there.
+    """
+
+    def __init__(self):
+        self.client = Client()
+        self.run_id = uuid.uuid4().hex[:8]
+        self.password = secrets.token_urlsafe(16)
+        username = f'{BENCH_USER_PREFIX}{self.run_id}'
+        self.admin = User.objects.create_user(username, f'{username}@example.com', self.password, is_staff=True)
+        self.token = Token.objects.create(user=self.admin).key
+
+        self.project_ids = list(
+            Project.objects.exclude(title__startswith=BENCH_PREFIX).order_by('-id').values_list('id', flat=True)[:200]
+        )
+        if not self.project_ids:
+            raise ValueError("The catalog is empty; run seed_catalog first.")
+        self.category_ids = list(Category.objects.values_list('id', flat=True)[:3])
+        # Project with the most feedback, so the feedback list has pages to walk
+        self.feedback_project_id = (
+            Project.objects.order_by('-feedback_count').values_list('id', flat=True).first()
+        )
+        self.sample_word = Project.objects.filter(pk=self.project_ids[0]).values_list('title', flat=True).first().split()[0]
+        # Delta sync from ~200 log entries back: a typical client that was offline for a while
+        last = ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.sync_cursor = encode_cursor([max(0, last - 200), int(time.time())])
+        self.base = self.make_project('base')
+        # Stored by the snapshots.rebuild job in production; reads only render a missing one
+        rebuild_snapshots(self.base.pk)
+
+    def auth(self):
+        return {'HTTP_AUTHORIZATION': f'Token {self.token}'}
+
+    def next_id(self, i):
+        return self.project_ids[i % len(self.project_ids)]
+
+    def make_project(self, label, images=1):
+        project = Project.objects.create(
+            title=f'{BENCH_PREFIX} {label}', description='benchmark row',
+            design_type='3D', interior_or_exterior='Interior',
+        )
+        ProjectImage.objects.bulk_create(
+            [ProjectImage(project=project, image=f'https://example.com/bench/{project.pk}_{n}.jpg') for n in range(images)]
+        )
+        return project
+
+    def json(self, method, path, data, **extra):
+        return getattr(self.client, method)(path, dumps(data), content_type='application/json', **extra)
+
+    def cleanup(self):
+        with transaction.atomic(), batch_project_changes():
+            Project.objects.filter(title__startswith=BENCH_PREFIX).delete()
+            # Only the users this run created
+            User.objects.filter(username__startswith=f'{REGISTER_PREFIX}{self.run_id}_').delete()
+            self.admin.delete()
+
+
+# ------------------ ENDPOINTS ------------------
+class Endpoint:
+    """
+    One benchmarked call. `prepare(ctx, i)` runs untimed and returns the
+    argument for `request(ctx, i, arg)`, which must return the response.
+    """
+
+    def __init__(self, name, budget, request, prepare=None, method='GET'):
+        self.name = name
+        self.budget = budget
+        self.request = request
+        self.prepare = prepare
+        self.method = method
+
+    @property
+    def view_name(self):
+        # 'projects_api[full]' benchmarks a variant of the projects_api route
+        return self.name.split('[')[0]
+
+
+def _consume(response):
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _import_file(ctx, i):
+    rows = ['title,description,design_type,interior_or_exterior,image_urls']
+    rows += [f'{BENCH_PREFIX} import {i}-{n},imported,2D,Interior,https://example.com/bench/i{n}.jpg' for n in range(10)]
+    upload = io.BytesIO('\n'.join(rows).encode())
+    upload.name = 'bench.csv'
+    return upload
+
+
+def _feedback_row(ctx, i):
+    return Feedback.objects.create(project=ctx.base, user=ctx.admin, message='bench').pk
+
+
+def _projects(ctx, count):
+    return [ctx.make_project(f'batch {n}').pk for n in range(count)]
+
+
+def _images(ctx, count):
+    images = ProjectImage.objects.bulk_create(
+        [ProjectImage(project=ctx.base, image=f'https://example.com/bench/b{n}.jpg') for n in range(count)]
+    )
+    return [img.pk for img in images]
+
+
+def _feedbacks(ctx, count):
+    rows = Feedback.objects.bulk_create([Feedback(project=ctx.base, user=ctx.admin, message='bench') for _ in range(count)])
+    return [f.pk for f in rows]
+
+
+def _register(ctx, i):
+    return f'{REGISTER_PREFIX}{ctx.run_id}_{i}'
+
+
+ENDPOINTS = [
+    # Public reads
+    Endpoint('projects_api', 2, lambda ctx, i, _: ctx.client.get('/api/projects/?page_size=24')),
+    Endpoint('projects_api[full]', 2, lambda ctx, i, _: ctx.client.get('/api/projects/')),
+    Endpoint('projects_api[compact]', 3, lambda ctx, i, _: ctx.client.get('/api/projects/?view=compact&page_size=24')),
+    Endpoint('search_projects_api', 2,
+             lambda ctx, i, _: ctx.client.get(f'/api/projects/search/?q={ctx.sample_word}&page_size=24')),
+    Endpoint('export_projects_api', 2,
+             lambda ctx, i, _: _consume(ctx.client.get('/api/projects/export/?format=ndjson'))),
+    Endpoint('project_facets_api', 2, lambda ctx, i, _: ctx.client.get('/api/projects/facets/')),
+    Endpoint('project_detail_api', 2, lambda ctx, i, _: ctx.client.get(f'/api/projects/{ctx.next_id(i)}/')),
+    Endpoint('project_changes_api', 3,
+             lambda ctx, i, _: ctx.client.get(f'/api/projects/changes/?since={ctx.sync_cursor}')),
+    Endpoint('related_projects_api', 2,
+             lambda ctx, i, _: ctx.client.get(f'/api/projects/{ctx.next_id(i)}/related/?limit=6')),
+    Endpoint('categories_list', 1, lambda ctx, i, _: ctx.client.get('/api/categories/')),
+    Endpoint('add_feedback_api', 3,
+             lambda ctx, i, _: ctx.client.get(f'/api/projects/{ctx.feedback_project_id}/feedback/?page_size=20')),
+    Endpoint('add_feedback_api[post]', 9, method='POST',
+             request=lambda ctx, i, _: ctx.json('post', f'/api/projects/{ctx.base.pk}/feedback/',
+                                                 {'message': 'bench feedback'}, **ctx.auth())),
+
+    # Admin writes
+    Endpoint('add_project_api', 12, method='POST', request=lambda ctx, i, _: ctx.json('post', '/api/projects/add/', {
+        'title': f'{BENCH_PREFIX} added {i}', 'description': 'benchmark', 'design_type': '3D',
+        'interior_or_exterior': 'Interior', 'categories': ctx.category_ids,
+        'image_urls': [f'https://example.com/bench/a{n}.jpg' for n in range(4)],
+    }, **ctx.auth())),
+    Endpoint('import_projects_api', 9, method='POST', prepare=_import_file,
+             request=lambda ctx, i, upload: ctx.client.post('/api/projects/import/', {'file': upload}, **ctx.auth())),
+    Endpoint('update_project_api', 12, method='PATCH',
+             request=lambda ctx, i, _: ctx.json('patch', f'/api/projects/{ctx.base.pk}/update/', {
+                 'title': f'{BENCH_PREFIX} base {i}', 'categories': ctx.category_ids[:1 + i % 2],
+             }, **ctx.auth())),
+    Endpoint('delete_project_api', 14, method='DELETE', prepare=lambda ctx, i: ctx.make_project('delete').pk,
+             request=lambda ctx, i, pk: ctx.client.delete(f'/api/projects/{pk}/delete/', **ctx.auth())),
+    Endpoint('delete_feedback_api', 9, method='DELETE', prepare=_feedback_row,
+             request=lambda ctx, i, pk: ctx.client.delete(f'/api/feedbacks/{pk}/delete/', **ctx.auth())),
+    Endpoint('delete_image_api', 10, method='DELETE', prepare=lambda ctx, i: _images(ctx, 1)[0],
+             request=lambda ctx, i, pk: ctx.client.delete(f'/api/images/{pk}/delete/', **ctx.auth())),
+    Endpoint('batch_update_projects_api', 11, method='POST', prepare=lambda ctx, i: _projects(ctx, 10),
+             request=lambda ctx, i, ids: ctx.json('post', '/api/projects/batch/update/', {
+                 'ids': ids, 'changes': {'design_type': '2D'}, 'add_categories': ctx.category_ids,
+             }, **ctx.auth())),
+    Endpoint('batch_delete_projects_api', 15, method='POST', prepare=lambda ctx, i: _projects(ctx, 10),
+             request=lambda ctx, i, ids: ctx.json('post', '/api/projects/batch/delete/', {'ids': ids}, **ctx.auth())),
+    Endpoint('batch_delete_images_api', 10, method='POST', prepare=lambda ctx, i: _images(ctx, 10),
+             request=lambda ctx, i, ids: ctx.json('post', '/api/images/batch/delete/', {'ids': ids}, **ctx.auth())),
+    Endpoint('batch_delete_feedbacks_api', 10, method='POST', prepare=lambda ctx, i: _feedbacks(ctx, 10),
+             request=lambda ctx, i, ids: ctx.json('post', '/api/feedbacks/batch/delete/', {'ids': ids}, **ctx.auth())),
+
+    Endpoint('metrics_api', 1, lambda ctx, i, _: ctx.client.get('/api/metrics/', **ctx.auth())),
+
+    # Auth
+    Endpoint('register_api', 5, method='POST', prepare=_register,
+             request=lambda ctx, i, name: ctx.json('post', '/api/register/', {'username': name, 'password': 'x-Bench-123'})),
+    Endpoint('login_api', 2, method='POST',
+             request=lambda ctx, i, _: ctx.json('post', '/api/login/', {'username': ctx.admin.username, 'password': ctx.password})),
+    Endpoint('google-check', 2, method='POST',
+             request=lambda ctx, i, _: ctx.json('post', '/api/google-check/', {'email': ctx.admin.email})),
+    Endpoint('reset_password_api', 2, method='POST',
+             request=lambda ctx, i, _: ctx.json('post', '/api/reset-password/',
+                                                {'email': ctx.admin.email, 'new_password': ctx.password})),
+]
+
+
+# ------------------ RUNNER ------------------
+def run_endpoint(ctx, endpoint, iterations, warmup=1, cold=False):
+    timings, queries, statuses = [], [], {}
+    for i in range(warmup + iterations):
+        arg = endpoint.prepare(ctx, i) if endpoint.prepare else None
+        if cold:
+            drop_response_cache()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = endpoint.request(ctx, i, arg)
+            elapsed = (time.perf_counter() - start) * 1000
+        if i < warmup:
+            continue
+        timings.append(elapsed)
+        queries.append(len(captured.captured_queries))
+        code = str(response.status_code)
+        statuses[code] = statuses.get(code, 0) + 1
+    return summarize(timings, queries, statuses, endpoint.budget)
+
+
+def compare(current, baseline):
+    """Per-endpoint change vs a previous run's JSON (positive % = slower)."""
+    rows = []
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        row = {'endpoint': name}
+        for key in ('p50', 'p95'):
+            old, new = before['latency_ms'][key], result['latency_ms'][key]
+            row[key] = round((new - old) / old * 100, 1) if old else None
+        row['queries'] = result['queries']['max'] - before['queries']['max']
+        rows.append(row)
+    return rows
+
+
+def load_results(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .dbrouting import aconsistent_reads, consistent_reads, note_write
+
+# Cache keys carry a version number; a write just bumps the version and the
+# old entries are never read again (they expire on their own TTL).
+LIST_VERSION_KEY = 'main:v:projects'
+CATEGORIES_VERSION_KEY = 'main:v:categories'
+RELATED_VERSION_KEY = 'main:v:related'
+_MISSING = object()
+
+# Striped locks guarding the single-flight registry: bounded memory, no per-key lock objects
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+# ------------------ VERSIONS ------------------
+def _project_version_key(project_id):
+    return f'main:v:project:{project_id}'
+
+
+def _fresh_version():
+    # Version key missing (cold cache / evicted): start from the clock so we
+    # never reuse a version number that may still have live entries.
+    return int(time.time() * 1000)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), None)
+
+
+def _versions(*keys):
+    found = cache.get_many(keys)
+    missing = {k: _fresh_version() for k in keys if k not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[k] for k in keys]
+
+
+async def _aversions(*keys):
+    found = await cache.aget_many(keys)
+    missing = {k: _fresh_version() for k in keys if k not in found}
+    if missing:
+        await cache.aset_many(missing, None)
+        found.update(missing)
+    return [found[k] for k in keys]
+
+
+def invalidate_projects(*project_ids):
+    """Project/images/categories changed: drop the list pages and those details."""
+    note_write()
+    _bump(LIST_VERSION_KEY)
+    for project_id in project_ids:
+        _bump(_project_version_key(project_id))
+
+
+def invalidate_categories():
+    """Category names are embedded in every project payload, so this is global."""
+    note_write()
+    _bump(CATEGORIES_VERSION_KEY)
+    _bump(LIST_VERSION_KEY)
+
+
+def invalidate_related():
+    """Related-projects lists were refreshed (by a job, after the write's own invalidation)."""
+    note_write()
+    _bump(RELATED_VERSION_KEY)
+
+
+def drop_response_cache():
+    """Orphan every cached API response (bench_api --cold); other keys in the shared cache are left alone."""
+    for key in (LIST_VERSION_KEY, CATEGORIES_VERSION_KEY, RELATED_VERSION_KEY):
+        _bump(key)
+
+
+# ------------------ KEYS ------------------
+def _params_hash(params):
+    items = sorted((k, tuple(sorted(params.getlist(k)))) for k in params)
+    return hashlib.md5(repr(items).encode()).hexdigest()
+
+
+def list_key(name, params):
+    """One key per list endpoint + filter/page combination."""
+    list_v, cats_v = _versions(LIST_VERSION_KEY, CATEGORIES_VERSION_KEY)
+    return f'main:{name}:{list_v}.{cats_v}:{_params_hash(params)}'
+
+
+async def alist_key(name, params):
+    list_v, cats_v = await _aversions(LIST_VERSION_KEY, CATEGORIES_VERSION_KEY)
+    return f'main:{name}:{list_v}.{cats_v}:{_params_hash(params)}'
+
+
+def project_key(project_id, params=None):
+    project_v, cats_v = _versions(_project_version_key(project_id), CATEGORIES_VERSION_KEY)
+    suffix = _params_hash(params) if params else ''
+    return f'main:project:{project_id}:{project_v}.{cats_v}:{suffix}'
+
+
+def related_version():
+    """Part of the related list's cache key and ETag."""
+    (related_v,) = _versions(RELATED_VERSION_KEY)
+    return related_v
+
+
+def categories_key():
+    (cats_v,) = _versions(CATEGORIES_VERSION_KEY)
+    return f'main:categories:{cats_v}'
+
+
+async def aproject_key(project_id, params=None):
+    project_v, cats_v = await _aversions(_project_version_key(project_id), CATEGORIES_VERSION_KEY)
+    suffix = _params_hash(params) if params else ''
+    return f'main:project:{project_id}:{project_v}.{cats_v}:{suffix}'
+
+
+async def acategories_key():
+    (cats_v,) = await _aversions(CATEGORIES_VERSION_KEY)
+    return f'main:categories:{cats_v}'
+
+
+# ------------------ SINGLE-FLIGHT GET ------------------
+class _Flight:
+    """One in-process build of a key; other threads wait on `done`."""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = _MISSING
+        self.error = None
+
+
+_flights = {}  # key -> _Flight, registered under the key's stripe lock
+
+
+def get_or_build(key, build, timeout=None):
+    """
+    Return the cached value for key, building it at most once per key at a time.
+    Threads in this process wait on the first one's in-flight event (the
+    striped lock is only held to register it); other processes wait on a
+    short-lived cache.add() lock and re-check the cache before building.
+    """
+    timeout = settings.API_CACHE_TIMEOUT if timeout is None else timeout
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    stripe = _LOCKS[hash(key) % len(_LOCKS)]
+    with stripe:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if flight.done.wait(settings.API_CACHE_LOCK_TIMEOUT):
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        # Builder is stuck; don't wait forever, build our own copy
+        return _build(key, build, timeout)
+
+    try:
+        flight.value = _build(key, build, timeout)
+        return flight.value
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with stripe:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _build(key, build, timeout):
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, settings.API_CACHE_LOCK_TIMEOUT)
+    if not locked:
+        # Another worker is building it; poll for a bit before giving up
+        deadline = time.monotonic() + settings.API_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+    try:
+        # Right after a write a lagging replica would cache old data for the whole TTL
+        with consistent_reads():
+            value = build()
+        cache.set(key, value, timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+# Async views: concurrent misses on the same event loop await one build
+_inflight = {}
+
+
+async def aget_or_build(key, build, timeout=None):
+    """Async get_or_build(); `build` is a coroutine function."""
+    timeout = settings.API_CACHE_TIMEOUT if timeout is None else timeout
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        async with aconsistent_reads():
+            value = await build()
+        await cache.aset(key, value, timeout)
+        future.set_result(value)
+        return value
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved; waiters still get it
+        raise
+    finally:
+        _inflight.pop(key, None)
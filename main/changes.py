@@ -0,0 +1,153 @@
+"""
+Delta sync: /api/projects/changes/?since=<cursor>.
+
+Every write to projects (signals._record, in the write's own transaction)
+appends one ChangeLogEntry per project, marked as a tombstone if the project
+is gone. It
+also appends one per image that was saved or deleted on its own. A sync
+reads the log from the client's cursor in id order, so it costs O(changes)
+however big the catalog is.
+
+A project entry returns the current snapshot document, which carries its
+full images list (images added in bulk with a project only show up there).
+Images of a deleted project have no tombstones of their own: the project
+tombstone covers them.
+
+Cursors are opaque and hold [last log id, issued at]. Reading by id is
+only safe if entries become visible in id order: an id handed out before a
+slow transaction commits would otherwise land below a cursor a client
+already holds, and that change would be skipped for good. So log writers
+are serialized from their insert to their commit (_lock_log): SQLite
+allows one writer at a time anyway, and on PostgreSQL record_changes takes
+a transaction-scoped advisory lock. The lock is held until the write
+commits, so a transaction should log its changes last; one that takes row
+locks after logging can deadlock with another writer (PostgreSQL then
+aborts one of them).
+
+RETENTION_DAYS: prune_changes deletes older entries, so a cursor older
+than that gets 410 and the client re-downloads the catalog.
+
+Call without `since` to get a starting cursor, before the full download.
+Replayed changes are idempotent upserts.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ChangeLogEntry, ProjectImage
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .renderers import Fragment
+from .serializers import ProjectImageSerializer
+from .snapshots import documents_for, snapshot_queryset
+
+
+class ExpiredCursor(InvalidCursor):
+    """The cursor is older than the log's retention; a full resync is needed."""
+
+
+# ------------------ WRITE SIDE ------------------
+# pg_advisory_xact_lock key for the log writers (any constant no other lock uses)
+_LOG_LOCK_KEY = 0x6368616e6765
+
+
+def _lock_log():
+    """Hold other log writers off until this transaction ends (see the module docstring)."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_LOG_LOCK_KEY])
+
+
+def record_changes(project_ids, live_project_ids, image_ids=()):
+    """Append log entries; ids not in live_project_ids (or no longer in the DB, for images) are tombstones."""
+    live_images = set()
+    if image_ids:
+        live_images = set(ProjectImage.objects.filter(pk__in=image_ids).values_list('pk', flat=True))
+    entries = [
+        ChangeLogEntry(kind='project', object_id=pk, deleted=pk not in live_project_ids)
+        for pk in sorted(project_ids)
+    ] + [
+        ChangeLogEntry(kind='image', object_id=pk, deleted=pk not in live_images)
+        for pk in sorted(image_ids)
+    ]
+    with transaction.atomic(savepoint=False):
+        # Taken right before the insert: ids are handed out (and committed) in lock order
+        _lock_log()
+        ChangeLogEntry.objects.bulk_create(entries, batch_size=settings.DELTA_SYNC['PAGE_SIZE'])
+
+
+def prune(older_than=None):
+    """Delete entries past retention; returns the number removed."""
+    older_than = older_than or timezone.now() - timedelta(days=settings.DELTA_SYNC['RETENTION_DAYS'])
+    deleted, _ = ChangeLogEntry.objects.filter(created_at__lt=older_than).delete()
+    return deleted
+
+
+# ------------------ READ SIDE ------------------
+def _cursor(last_id):
+    return encode_cursor([last_id, int(time.time())])
+
+
+def _head():
+    return ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True)
+
+
+def head_id():
+    """Id of the newest log entry (None if the log is empty); one primary-key lookup."""
+    return _head().first()
+
+
+async def ahead_id():
+    return await _head().afirst()
+
+
+def head_cursor():
+    """Cursor for "now": later changes only."""
+    return _cursor(head_id() or 0)
+
+
+def _parse(cursor):
+    values = decode_cursor(cursor)
+    if len(values) != 2 or not all(isinstance(v, int) for v in values):
+        raise InvalidCursor(cursor)
+    last_id, issued = values
+    if issued < time.time() - settings.DELTA_SYNC['RETENTION_DAYS'] * 86400:
+        raise ExpiredCursor(cursor)
+    return last_id
+
+
+def changes_since(cursor, limit=None):
+    """
+    Payload for one sync page: upserted projects (snapshot documents) and
+    images, tombstones, the next cursor and has_more.
+    """
+    limit = limit or settings.DELTA_SYNC['PAGE_SIZE']
+    last_id = _parse(cursor)
+    rows = list(
+        ChangeLogEntry.objects.filter(id__gt=last_id).order_by('id')
+        .values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Latest entry per object wins
+    latest = {}
+    for _, kind, object_id, deleted in rows:
+        latest[kind, object_id] = deleted
+    upserted = {'project': [], 'image': []}
+    deleted = {'project': [], 'image': []}
+    for (kind, object_id), is_deleted in sorted(latest.items()):
+        (deleted if is_deleted else upserted)[kind].append(object_id)
+
+    # Upserts whose object is gone by now are skipped; their tombstone is further on in the log
+    projects = list(snapshot_queryset().filter(pk__in=upserted['project']).order_by('id'))
+    images = ProjectImage.objects.filter(pk__in=upserted['image']).only('id', 'project_id', 'image').order_by('id')
+    return {
+        "projects": [Fragment(doc) for doc in documents_for(projects)],
+        "images": [{**ProjectImageSerializer(img).data, "project": img.project_id} for img in images],
+        "deleted": {"projects": deleted['project'], "images": deleted['image']},
+        "cursor": _cursor(rows[-1][0] if rows else last_id),
+        "has_more": has_more,
+    }
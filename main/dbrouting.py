@@ -0,0 +1,213 @@
+"""
+Primary/replica routing for the read API.
+
+ReplicaRoutingMiddleware (main/middleware.py) picks a database for each
+request: GET/HEAD requests to views in main.views / main.async_views read
+from a healthy replica, and everything else uses the primary.
+PrimaryReplicaRouter then sends reads to that choice (kept in a contextvar,
+so sync_to_async threads see it too) and sends every write to the primary.
+
+Read-your-writes: a successful write makes the client sticky to the primary
+for DATABASE_REPLICAS['STICKY_SECONDS']. This is carried in a cookie for
+browsers and the admin site, and in a cache marker keyed on the API token,
+because the cross-origin frontend sends no cookies.
+
+Replicas are probed at most every HEALTH_CHECK_INTERVAL seconds. A probe
+fails when the replica cannot be reached, or (PostgreSQL) when it lags more
+than MAX_LAG seconds. A failed replica is skipped until it passes again, and
+with no healthy replica reads go to the primary.
+
+Shared caches: a cache entry built from a lagging replica right after an
+invalidation would keep stale data for the whole cache TTL. So builds that
+start within MAX_LAG seconds of the last invalidation read from the primary
+(see consistent_reads()). Conditional views (main/conditional.py) run their
+ETag validator and the body under the same block, so the two always agree.
+"""
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('main.db')
+
+ROUTED_MODULES = ('main.views', 'main.async_views')
+SAFE_METHODS = ('GET', 'HEAD')
+LAST_WRITE_KEY = 'main:db:last-write'
+
+_read_alias = contextvars.ContextVar('main_db_read_alias', default=None)
+_health = {}  # alias -> (healthy, checked_at)
+_health_lock = threading.Lock()
+
+# Postgres: seconds behind the primary, 0 when everything received is replayed
+# (an idle primary would otherwise look like growing lag)
+_PG_LAG = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def replica_aliases():
+    return settings.DATABASE_REPLICAS['ALIASES']
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()  # None -> default
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary: the same rows everywhere
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Schema reaches the replicas through replication
+        return False if db in replica_aliases() else None
+
+
+# ------------------ HEALTH ------------------
+def _probe(alias):
+    try:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            if connection.vendor == 'postgresql':
+                cursor.execute(_PG_LAG)
+                lag = float(cursor.fetchone()[0])
+                if lag > settings.DATABASE_REPLICAS['MAX_LAG']:
+                    logger.warning("Replica %s is %.1fs behind; reading from the primary", alias, lag)
+                    return False
+        return True
+    except DatabaseError as e:
+        logger.warning("Replica %s failed its health check: %s", alias, e)
+        connections[alias].close()
+        return False
+
+
+def _due(now):
+    interval = settings.DATABASE_REPLICAS['HEALTH_CHECK_INTERVAL']
+    return [a for a in replica_aliases() if now - _health.get(a, (False, float('-inf')))[1] >= interval]
+
+
+def health_check_due():
+    return bool(_due(time.monotonic()))
+
+
+def refresh_health():
+    """Probe the replicas whose last check is too old. One thread at a time; others use the last result."""
+    if not _health_lock.acquire(blocking=False):
+        return
+    try:
+        for alias in _due(time.monotonic()):
+            _health[alias] = (_probe(alias), time.monotonic())
+    finally:
+        _health_lock.release()
+
+
+def healthy_replicas():
+    return [a for a in replica_aliases() if _health.get(a, (False, 0))[0]]
+
+
+# ------------------ PER REQUEST ------------------
+def start_request():
+    """Reads go to the primary until route_reads() picks a replica."""
+    return _read_alias.set(None)
+
+
+def end_request(token):
+    _read_alias.reset(token)
+
+
+def route_reads(request, view_func):
+    """Send this request's reads to a healthy replica if it is a safe, non-sticky read-API call."""
+    if (
+        request.method in SAFE_METHODS
+        and getattr(view_func, '__module__', None) in ROUTED_MODULES
+        and not is_sticky(request)
+    ):
+        replicas = healthy_replicas()
+        if replicas:
+            _read_alias.set(random.choice(replicas))
+
+
+def after_response(request, response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        mark_sticky(request, response)
+
+
+# ------------------ STICKINESS ------------------
+def _token(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    keyword, _, token = header.partition(' ')
+    return token.strip() if keyword == 'Token' else ''
+
+
+def _sticky_key(token):
+    return 'main:db:sticky:' + hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def is_sticky(request):
+    """Did this client write within the last STICKY_SECONDS?"""
+    try:
+        until = float(request.COOKIES.get(settings.DATABASE_REPLICAS['COOKIE'], 0))
+    except ValueError:
+        until = 0
+    if until > time.time():
+        return True
+    token = _token(request)
+    return bool(token) and cache.get(_sticky_key(token)) is not None
+
+
+def mark_sticky(request, response):
+    seconds = settings.DATABASE_REPLICAS['STICKY_SECONDS']
+    response.set_cookie(
+        settings.DATABASE_REPLICAS['COOKIE'], str(int(time.time() + seconds)),
+        max_age=seconds, httponly=True, samesite='Lax',
+    )
+    token = _token(request)
+    if token:
+        cache.set(_sticky_key(token), 1, seconds)
+
+
+# ------------------ CACHE CONSISTENCY ------------------
+def note_write():
+    """Called on cache invalidation (main/cache.py)."""
+    if replica_aliases():
+        cache.set(LAST_WRITE_KEY, time.time(), None)
+
+
+def _recently_written(last_write):
+    return last_write is not None and time.time() - last_write < settings.DATABASE_REPLICAS['MAX_LAG']
+
+
+@contextmanager
+def consistent_reads():
+    """Read from the primary inside the block if the data changed within MAX_LAG."""
+    if _read_alias.get() is None or not _recently_written(cache.get(LAST_WRITE_KEY)):
+        yield
+        return
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@asynccontextmanager
+async def aconsistent_reads():
+    if _read_alias.get() is None or not _recently_written(await cache.aget(LAST_WRITE_KEY)):
+        yield
+        return
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
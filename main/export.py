@@ -0,0 +1,40 @@
+from itertools import islice
+
+from django.conf import settings
+
+from .snapshots import documents_for, snapshot_queryset
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def iter_project_documents(chunk_size=None):
+    """
+    Yield each project's pre-encoded JSON snapshot. iterator(chunk_size)
+    fetches rows in chunks (server-side cursor on Postgres), and missing
+    snapshots are rendered per chunk, so only one chunk is alive at once.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = snapshot_queryset().order_by('id').iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from documents_for(chunk)
+
+
+def stream_export(fmt):
+    """Bytes generator for StreamingHttpResponse: a JSON array or NDJSON lines."""
+    if fmt == 'ndjson':
+        for doc in iter_project_documents():
+            yield (doc + '\n').encode()
+        return
+
+    yield b'['
+    first = True
+    for doc in iter_project_documents():
+        yield (doc if first else ',' + doc).encode()
+        first = False
+    yield b']'
@@ -0,0 +1,51 @@
+from django.db.models import CharField, Count, F, IntegerField, Value
+
+from .models import Project
+
+
+def compute_facets(queryset):
+    """
+    Counts per design_type, interior_or_exterior and category for the given
+    (optionally filtered) project queryset, in one UNION ALL round-trip:
+
+      * 'total' rows group projects by (design_type, interior_or_exterior),
+        so each project is counted once;
+      * 'category' rows join the categories M2M and group by category too.
+    """
+    queryset = queryset.order_by()
+    columns = ('kind', 'design_type', 'interior_or_exterior', 'cat_id', 'cat_name')
+
+    totals = queryset.annotate(
+        kind=Value('total', output_field=CharField()),
+        cat_id=Value(None, output_field=IntegerField()),
+        cat_name=Value(None, output_field=CharField()),
+    ).values(*columns).annotate(n=Count('id'))
+
+    per_category = queryset.filter(categories__isnull=False).annotate(
+        kind=Value('category', output_field=CharField()),
+        cat_id=F('categories__id'),
+        cat_name=F('categories__name'),
+    ).values(*columns).annotate(n=Count('id'))
+
+    design_types = {value: 0 for value, _ in Project._meta.get_field('design_type').choices}
+    placements = {value: 0 for value, _ in Project._meta.get_field('interior_or_exterior').choices}
+    categories = {}
+    total = 0
+
+    for row in totals.union(per_category, all=True):
+        if row['kind'] == 'total':
+            total += row['n']
+            design_types[row['design_type']] = design_types.get(row['design_type'], 0) + row['n']
+            placements[row['interior_or_exterior']] = (
+                placements.get(row['interior_or_exterior'], 0) + row['n']
+            )
+        else:
+            entry = categories.setdefault(row['cat_id'], {"id": row['cat_id'], "name": row['cat_name'], "count": 0})
+            entry['count'] += row['n']
+
+    return {
+        "total": total,
+        "design_type": design_types,
+        "interior_or_exterior": placements,
+        "categories": sorted(categories.values(), key=lambda c: (-c['count'], c['name'])),
+    }
@@ -0,0 +1,98 @@
+"""
+Sparse fieldsets for the project read endpoints.
+
+?fields=id,title / ?exclude=description,images / ?view=compact narrow the
+payload, and the query follows: only the needed columns are loaded and the
+images/categories prefetches run only when those fields are asked for. Such
+requests bypass the stored full snapshots and serialize on the fly.
+"""
+from django.db.models import Prefetch
+
+from .filters import param_values
+from .models import Category, Project
+from .serializers import ProjectListSerializer, ProjectSerializer
+from .snapshots import adocuments_for, documents_for, encode_document, snapshot_queryset
+
+VIEWS = {
+    'full': ProjectSerializer,
+    'compact': ProjectListSerializer,
+}
+
+# Serializer field -> model columns it reads (default: a column of the same name)
+_COLUMNS = {
+    'image_variants': ('image',),
+    'image_srcset': ('image',),
+    'images': (),
+    'categories': (),
+    'category_names': (),
+}
+# Serializer field -> relation that has to be prefetched for it
+_PREFETCH = {
+    'images': 'images',
+    'categories': 'categories',
+    'category_names': 'categories',
+}
+
+
+class InvalidFields(ValueError):
+    """Unknown field name or view in the query string."""
+
+
+def requested_fields(params):
+    """
+    Field names to serialize, in payload order, or None when the client asked
+    for the full document (no fields/exclude/view params).
+    """
+    if not any(name in params for name in ('fields', 'exclude', 'view')):
+        return None
+
+    view = params.get('view', 'full')
+    if view not in VIEWS:
+        raise InvalidFields(f"view must be one of {list(VIEWS)}")
+    available = list(VIEWS[view].Meta.fields)
+
+    fields = param_values(params, 'fields')
+    exclude = set(param_values(params, 'exclude'))
+    unknown = (set(fields) | exclude) - set(ProjectSerializer.Meta.fields)
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # ?fields= can pick any project field, the view only sets the default set
+    selected = [f for f in ProjectSerializer.Meta.fields if f in fields] if fields else available
+    return [f for f in selected if f not in exclude]
+
+
+def project_queryset(fields):
+    """Queryset for project_documents(): trimmed to what `fields` needs."""
+    if fields is None:
+        return snapshot_queryset()
+
+    columns = {'id'}
+    for name in fields:
+        columns.update(_COLUMNS.get(name, (name,)))
+    queryset = Project.objects.only(*columns)
+
+    relations = {_PREFETCH[name] for name in fields if name in _PREFETCH}
+    if 'images' in relations:
+        queryset = queryset.prefetch_related('images')
+    if 'categories' in relations:
+        queryset = queryset.prefetch_related(Prefetch('categories', queryset=Category.objects.only('id', 'name')))
+    return queryset
+
+
+def _render(projects, fields):
+    return [encode_document(ProjectSerializer(p, fields=fields).data) for p in projects]
+
+
+def project_documents(projects, fields):
+    """JSON documents for rows of project_queryset(fields)."""
+    if fields is None:
+        return documents_for(projects)
+    return _render(projects, fields)
+
+
+async def aproject_documents(projects, fields):
+    if fields is None:
+        return await adocuments_for(projects)
+    # Relations were prefetched by aiterator(), so serializing does no I/O
+    return _render(projects, fields)
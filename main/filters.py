@@ -0,0 +1,30 @@
+from django.db.models import Subquery
+
+from .models import Project
+
+
+def param_values(params, name):
+    """Accept both ?categories=1,2 and ?categories=1&categories=2."""
+    values = []
+    for raw in params.getlist(name):
+        values.extend(v.strip() for v in raw.split(',') if v.strip())
+    return values
+
+
+def filter_projects(queryset, params):
+    """Apply the catalog filters (categories, design_type, interior_or_exterior)."""
+    category_ids = [int(v) for v in param_values(params, 'categories') if v.isdigit()]
+    if category_ids:
+        # Subquery instead of a join so no DISTINCT is needed (any-of semantics)
+        through = Project.categories.through.objects.filter(category_id__in=category_ids)
+        queryset = queryset.filter(id__in=Subquery(through.values('project_id')))
+
+    design_types = param_values(params, 'design_type')
+    if design_types:
+        queryset = queryset.filter(design_type__in=design_types)
+
+    placements = param_values(params, 'interior_or_exterior')
+    if placements:
+        queryset = queryset.filter(interior_or_exterior__in=placements)
+
+    return queryset
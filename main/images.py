@@ -0,0 +1,104 @@
+import re
+
+from django.conf import settings
+
+# https://res.cloudinary.com/<cloud>/image/upload/[<transformations>/][v<version>/]<public_id>[.<ext>]
+_CLOUDINARY_URL = re.compile(
+    r'^https?://res\.cloudinary\.com/(?P<cloud>[^/]+)/image/upload/(?P<rest>.+)$'
+)
+_VERSION = re.compile(r'^v\d+$')
+
+
+def _cloud_name():
+    return settings.CLOUDINARY_STORAGE['CLOUD_NAME']
+
+
+def _is_url(value):
+    return value.startswith(('http://', 'https://', '//'))
+
+
+def parse_image(value):
+    """
+    Split a stored image value into (cloud, version, public_id).
+    Accepts a full Cloudinary delivery URL or a bare public_id; returns None
+    for anything else (external URLs are served untouched).
+    """
+    if not value:
+        return None
+    if _is_url(value):
+        match = _CLOUDINARY_URL.match(value.split('?', 1)[0])
+        if not match:
+            return None
+        cloud, parts = match['cloud'], match['rest'].split('/')
+    else:
+        cloud, parts = _cloud_name(), value.lstrip('/').split('/')
+    # Upload URLs carry a version; anything before it is a transformation
+    # (w_500,c_fill/...) and anything after it is the public_id with folders.
+    # Without a version we can't tell a transformation from a folder, so the
+    # whole path is taken as the public_id.
+    version = None
+    for index, part in enumerate(parts[:-1]):
+        if _VERSION.match(part):
+            version, parts = part, parts[index + 1:]
+            break
+    return cloud, version, '/'.join(parts)
+
+
+def build_url(cloud, version, public_id, transformation=None):
+    segments = [f'https://res.cloudinary.com/{cloud}/image/upload']
+    if transformation:
+        segments.append(transformation)
+    if version:
+        segments.append(version)
+    segments.append(public_id)
+    return '/'.join(segments)
+
+
+def _transformation(width):
+    return f'c_limit,w_{width},q_auto,f_auto'
+
+
+# ------------------ WRITE SIDE ------------------
+def storage_value(url):
+    """
+    What to save in Project.image / ProjectImage.image for an uploaded URL.
+    With IMAGE_STORE_PUBLIC_ID only "v<version>/<public_id>" is kept (our own
+    cloud only; the version keeps CDN caches correct after a re-upload).
+    original_url() expands it again on read.
+    """
+    if not url or not settings.IMAGE_STORE_PUBLIC_ID:
+        return url
+    parsed = parse_image(url)
+    if parsed is None or parsed[0] != _cloud_name():
+        return url
+    _, version, public_id = parsed
+    return f'{version}/{public_id}' if version else public_id
+
+
+# ------------------ READ SIDE ------------------
+def original_url(value):
+    """Full URL of the original upload, whether value is a URL or a public_id."""
+    if not value or _is_url(value):
+        return value
+    return build_url(_cloud_name(), None, value.lstrip('/'))
+
+
+def variant_urls(value):
+    """{'thumbnail': url, 'card': url, 'full': url} per settings.IMAGE_VARIANTS."""
+    parsed = parse_image(value)
+    if parsed is None:
+        # Not a Cloudinary image: every variant is just the original
+        return {name: value for name in settings.IMAGE_VARIANTS} if value else {}
+    return {
+        name: build_url(*parsed, transformation=_transformation(width))
+        for name, width in settings.IMAGE_VARIANTS.items()
+    }
+
+
+def srcset(value):
+    """srcset attribute listing every variant by width, narrowest first."""
+    parsed = parse_image(value)
+    if parsed is None:
+        return ''
+    widths = sorted(set(settings.IMAGE_VARIANTS.values()))
+    return ', '.join(f'{build_url(*parsed, transformation=_transformation(w))} {w}w' for w in widths)
@@ -0,0 +1,185 @@
+import csv
+import json
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from .images import storage_value
+from .models import Category, Project, ProjectImage
+from .signals import projects_changed
+
+FORMATS = ('csv', 'ndjson')
+_TEXT_FIELDS = ('plot_size', 'design_loc', 'contact_number', 'whatsapp_number')
+
+
+class RowError(ValueError):
+    """A single input row is invalid; reported back, the import continues."""
+
+
+# ------------------ STREAMING READERS ------------------
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def _decode_lines(lines, undecodable):
+    """UTF-8 lines for the csv module; a line that does not decode is blanked and noted."""
+    for number, line in enumerate(lines, start=1):
+        try:
+            yield line.decode('utf-8-sig' if number == 1 else 'utf-8')
+        except UnicodeDecodeError as e:
+            undecodable.append((number, RowError(f"Not valid UTF-8: {e}")))
+            yield '\n'  # blank line, skipped by the reader; keeps line_num in step
+
+
+def _drain(errors):
+    while errors:
+        yield errors.pop(0)
+
+
+def iter_rows(lines, fmt):
+    """
+    Yield (row_number, dict) from an iterable of byte lines (an open file or
+    an UploadedFile). Nothing is read ahead, so memory stays per-row.
+    """
+    if fmt == 'csv':
+        undecodable = []
+        reader = csv.DictReader(_decode_lines(lines, undecodable))
+        for row in reader:
+            yield from _drain(undecodable)
+            yield reader.line_num, row
+        yield from _drain(undecodable)
+        return
+
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, RowError(f"Invalid JSON: {e}")
+            continue
+        yield number, row if isinstance(row, dict) else RowError("Each line must be a JSON object")
+
+
+# ------------------ ROW VALIDATION ------------------
+def _scalar(name, value):
+    """NDJSON may send numbers (phone numbers, plot sizes); lists, objects and booleans are row errors."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise RowError(f"{name} must be a string")
+    return str(value).strip()
+
+
+def _split(name, value):
+    """CSV cells carry lists as 'a|b|c'; NDJSON can send real lists."""
+    if value in (None, ''):
+        return []
+    if isinstance(value, (list, tuple)):
+        values = [_scalar(name, v) for v in value]
+    else:
+        values = re.split(r'[|\n]', _scalar(name, value))
+    return [v.strip() for v in values if v.strip()]
+
+
+def _clean(model, name, value):
+    """Model field validation (NOT NULL, max_length, choices) for one value of this row."""
+    try:
+        return model._meta.get_field(name).clean(value, None)
+    except ValidationError as e:
+        raise RowError(f"{name}: {' '.join(e.messages)}")
+
+
+def clean_row(row, category_lookup):
+    fields = {}
+    # Required: blank/missing is a row error, not a silently empty column
+    for name in ('title', 'design_type', 'interior_or_exterior'):
+        value = row.get(name)
+        fields[name] = _clean(Project, name, None if value is None else _scalar(name, value))
+    description = row.get('description')
+    fields['description'] = '' if description in (None, '') else _clean(Project, 'description', _scalar('description', description))
+    for name in _TEXT_FIELDS:
+        value = row.get(name)
+        fields[name] = _clean(Project, name, None if value is None else _scalar(name, value) or None)
+
+    category_ids = []
+    for ref in _split('categories', row.get('categories')):
+        category_id = category_lookup.get(ref.lower())
+        if category_id is None:
+            raise RowError(f"Unknown category: {ref}")
+        category_ids.append(category_id)
+
+    image_urls = [
+        _clean(ProjectImage, 'image', storage_value(url))
+        for url in _split('image_urls', row.get('image_urls') or row.get('images'))
+    ]
+    project = Project(image=image_urls[0] if image_urls else None, **fields)
+    return project, image_urls, category_ids
+
+
+# ------------------ BATCHED INSERT ------------------
+def _insert_chunk(chunk):
+    """One transaction per chunk: projects, then images and M2M rows in bulk."""
+    with transaction.atomic():
+        projects = Project.objects.bulk_create([project for _, (project, _, _) in chunk])
+        images = []
+        links = []
+        Through = Project.categories.through
+        for project, (_, (_, image_urls, category_ids)) in zip(projects, chunk):
+            images.extend(ProjectImage(project_id=project.pk, image=url) for url in image_urls)
+            links.extend(Through(project_id=project.pk, category_id=cid) for cid in set(category_ids))
+        ProjectImage.objects.bulk_create(images)
+        Through.objects.bulk_create(links, ignore_conflicts=True)
+        # bulk_create signals nahi bhejta: snapshots, log, related jobs khud (isi transaction mein)
+        projects_changed(*(p.pk for p in projects), touch=False, related=True)
+    return projects
+
+
+def import_projects(rows, batch_size=None):
+    """
+    Import (row_number, dict) pairs from iter_rows(). Invalid rows are skipped
+    and reported; a database error fails only the chunk it happened in.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    # Categories can be referenced by id or (case-insensitive) name
+    category_lookup = {}
+    for pk, name in Category.objects.values_list('pk', 'name'):
+        category_lookup[name.lower()] = pk
+        category_lookup[str(pk)] = pk
+    report = {"created": 0, "failed": 0, "errors": []}
+
+    def fail(number, message):
+        report['failed'] += 1
+        if len(report['errors']) < settings.IMPORT_MAX_ERRORS:
+            report['errors'].append({"row": number, "error": message})
+
+    def flush(chunk):
+        if not chunk:
+            return
+        try:
+            projects = _insert_chunk(chunk)
+        except DatabaseError as e:
+            for number, _ in chunk:
+                fail(number, f"Database error (chunk rolled back): {e}")
+            return
+        report['created'] += len(projects)
+
+    chunk = []
+    for number, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            chunk.append((number, clean_row(row, category_lookup)))
+        except RowError as e:
+            fail(number, str(e))
+        if len(chunk) >= batch_size:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+    return report
@@ -0,0 +1,206 @@
+"""
+Background jobs for post-write work, kept in the database (no broker).
+
+main/signals.py enqueues jobs inside the write's own transaction, next to
+the change log, so a job exists exactly when its write committed. Work the
+next read depends on stays in the write: the change log, dropping stale
+snapshots (readers render a missing one without storing it) and, on commit,
+cache invalidation. The slow part moves here: re-rendering snapshots and
+refreshing the related-projects lists.
+
+    enqueue({'snapshots.rebuild': [1, 2], 'related.refresh': [2]})
+
+A job is (task, key), the key usually being a project id. Identical pending
+jobs collapse into one row (job_pending_unique), so a project saved ten
+times before the worker gets to it is rebuilt once.
+
+`manage.py run_jobs` drains the table. Each round claims up to
+JOBS['BATCH_SIZE'] due jobs per task and runs them as one handler call on a
+thread pool. A claim is a lease: a worker that dies mid-batch leaves the jobs
+to be claimed again once LEASE_SECONDS pass. A failed batch is retried with
+exponential backoff (RETRY_BACKOFF, doubled per attempt); after MAX_ATTEMPTS
+its jobs stay as 'failed' (`run_jobs --retry-failed` requeues them).
+A key is never in two running batches at once. Exclusive tasks (shared
+state, like the related lists) run one batch at a time per worker, so run a
+single worker process and scale it with --threads.
+
+With JOBS['EAGER'] (development without a worker) handlers run right after
+the write commits, in the request.
+"""
+import logging
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_projects, invalidate_related
+from .models import Job
+from .related import refresh_related
+from .snapshots import rebuild_snapshots
+
+logger = logging.getLogger('main.jobs')
+
+TASKS = {}  # name -> Task
+
+
+class Task:
+    def __init__(self, name, handler, exclusive):
+        self.name = name
+        self.handler = handler      # handler(keys): keys are strings
+        self.exclusive = exclusive  # at most one batch at a time
+
+
+def task(name, exclusive=False):
+    def register(handler):
+        TASKS[name] = Task(name, handler, exclusive)
+        return handler
+    return register
+
+
+# ------------------ ENQUEUE ------------------
+def enqueue(jobs):
+    """Add jobs ({task: keys}); call inside the write's transaction. Duplicates of pending jobs are dropped."""
+    jobs = {name: sorted({str(key) for key in keys}) for name, keys in jobs.items() if keys}
+    if not jobs:
+        return
+    if settings.JOBS['EAGER']:
+        transaction.on_commit(lambda: run_now(jobs))
+        return
+    Job.objects.bulk_create(
+        [Job(task=name, key=key) for name, keys in jobs.items() for key in keys],
+        ignore_conflicts=True,
+    )
+
+
+def run_now(jobs):
+    for name, keys in jobs.items():
+        TASKS[name].handler(keys)
+
+
+# ------------------ WORKER ------------------
+def claim(name, limit):
+    """Lease up to `limit` due jobs of one task: [(id, key, attempts)]."""
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.JOBS['LEASE_SECONDS'])
+    due = (
+        Job.objects.filter(task=name, status__in=('pending', 'running'), run_after__lte=now)
+        # A key never runs twice at once: a newer duplicate waits for the running one
+        .exclude(key__in=Job.objects.filter(task=name, status='running', run_after__gt=now).values('key'))
+        .order_by('id')
+    )
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    # Without SKIP LOCKED (SQLite) there is no transaction around the read: one that
+    # reads and then writes cannot get the write lock while a batch holds it. The
+    # UPDATE re-checks the due condition; claims only come from the worker's main thread.
+    with transaction.atomic() if skip_locked else nullcontext():
+        if skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        jobs = list(due.values_list('id', 'key', 'attempts')[:limit])
+        if jobs:
+            # Counted now, so a batch that kills its worker still runs out of attempts
+            Job.objects.filter(
+                pk__in=[j[0] for j in jobs], status__in=('pending', 'running'), run_after__lte=now,
+            ).update(status='running', run_after=lease, attempts=F('attempts') + 1)
+    return [(pk, key, attempts + 1) for pk, key, attempts in jobs]
+
+
+def _retry(jobs, error):
+    config = settings.JOBS
+    now = timezone.now()
+    for pk, _, attempts in jobs:
+        if attempts >= config['MAX_ATTEMPTS']:
+            changes = {'status': 'failed'}
+        else:
+            delay = config['RETRY_BACKOFF'] * 2 ** (attempts - 1)
+            changes = {'status': 'pending', 'run_after': now + timedelta(seconds=delay)}
+        try:
+            with transaction.atomic():
+                Job.objects.filter(pk=pk).update(last_error=error, **changes)
+        except IntegrityError:
+            # The same job was enqueued again meanwhile; that one does the work
+            Job.objects.filter(pk=pk).delete()
+
+
+def run_batch(name, jobs):
+    """Run one claimed batch; True if it succeeded."""
+    try:
+        TASKS[name].handler([key for _, key, _ in jobs])
+    except Exception as e:
+        logger.exception("Job batch %s (%d jobs) failed", name, len(jobs))
+        _retry(jobs, f'{type(e).__name__}: {e}')
+        return False
+    else:
+        Job.objects.filter(pk__in=[pk for pk, _, _ in jobs]).delete()
+        return True
+    finally:
+        # Pool threads keep their own connection otherwise
+        connection.close()
+
+
+def work(threads=None, once=False, stop=None):
+    """
+    Drain the queue on a thread pool until `stop` is set, or, with once=True,
+    until nothing is due. Returns (batches, failed batches).
+    """
+    config = settings.JOBS
+    threads = threads or config['THREADS']
+    running = {}  # future -> task name
+    done = failed = 0
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job') as pool:
+        while not (stop and stop.is_set()):
+            close_old_connections()
+            for name, spec in TASKS.items():
+                busy = sum(1 for n in running.values() if n == name)
+                while len(running) < threads and busy < (1 if spec.exclusive else threads):
+                    jobs = claim(name, config['BATCH_SIZE'])
+                    if not jobs:
+                        break
+                    running[pool.submit(run_batch, name, jobs)] = name
+                    busy += 1
+            if not running:
+                if once:
+                    break
+                time.sleep(config['POLL_INTERVAL'])
+                continue
+            finished, _ = wait(running, timeout=config['POLL_INTERVAL'], return_when=FIRST_COMPLETED)
+            for future in finished:
+                del running[future]
+                done += 1
+                failed += not future.result()
+        wait(running)
+        done += len(running)
+        failed += sum(not future.result() for future in running)
+    return done, failed
+
+
+def retry_failed():
+    """Requeue failed jobs; returns how many. One with a pending duplicate is just dropped."""
+    failed = list(Job.objects.filter(status='failed').values_list('pk', flat=True))
+    for pk in failed:
+        try:
+            with transaction.atomic():
+                Job.objects.filter(pk=pk).update(status='pending', attempts=0, run_after=timezone.now())
+        except IntegrityError:
+            Job.objects.filter(pk=pk).delete()
+    return len(failed)
+
+
+# ------------------ TASKS ------------------
+@task('snapshots.rebuild')
+def _rebuild_snapshots(keys):
+    ids = [int(key) for key in keys]
+    rebuild_snapshots(*ids)
+    # A reader may have stored (and cached) a render from just before the write committed
+    invalidate_projects(*ids)
+
+
+@task('related.refresh', exclusive=True)
+def _refresh_related(keys):
+    # One catalog load for the whole batch; lists are shared state, hence exclusive
+    refresh_related(*(int(key) for key in keys))
+    invalidate_related()
@@ -0,0 +1,135 @@
+import json
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from main import bench, urls
+from main.models import Category, Feedback, Project, ProjectImage, User
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark every API endpoint in-process: latency percentiles, throughput and SQL query budgets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per endpoint first.")
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help="Only these endpoints (repeatable), e.g. --endpoint projects_api.")
+        parser.add_argument('--cold', action='store_true', help="Drop the cached API responses before every request.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Previous --output file to diff against.")
+        parser.add_argument('--no-enforce', action='store_true', help="Report query budget overruns without failing.")
+        parser.add_argument('--i-know-this-is-not-prod', action='store_true', dest='not_prod',
+                            help="Run with DEBUG off (the run writes and deletes rows and creates an admin user).")
+
+    def handle(self, *args, **options):
+        # Writes, deletes aur ek staff user banata hai: production DB par galti se na chale
+        if not settings.DEBUG and not options['not_prod']:
+            raise CommandError("DEBUG is off; bench_api writes to this database. Pass --i-know-this-is-not-prod to run anyway.")
+        endpoints = bench.ENDPOINTS
+        if options['endpoints']:
+            endpoints = [e for e in endpoints if e.name in options['endpoints'] or e.view_name in options['endpoints']]
+            if not endpoints:
+                raise CommandError("No matching endpoints")
+        self._check_coverage()
+
+        # Throttles would turn the auth endpoints into a 429 benchmark. One process,
+        # so the token cache is safe (and measured) whatever the cache backend.
+        with override_settings(API_THROTTLES={**settings.API_THROTTLES, 'RATES': {}},
+                               AUTH_TOKEN_CACHE={**settings.AUTH_TOKEN_CACHE, 'ENABLED': True}):
+            try:
+                ctx = bench.BenchContext()
+            except ValueError as e:
+                raise CommandError(str(e))
+            try:
+                results = {}
+                for endpoint in endpoints:
+                    results[endpoint.name] = {
+                        'method': endpoint.method,
+                        **bench.run_endpoint(ctx, endpoint, options['iterations'], options['warmup'], options['cold']),
+                    }
+                    self._print_row(endpoint.name, results[endpoint.name])
+            finally:
+                ctx.cleanup()
+
+        report = {'meta': self._meta(options), 'endpoints': results}
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['compare']:
+            self._print_comparison(bench.compare(report, bench.load_results(options['compare'])))
+
+        over = [name for name, r in results.items() if r['over_budget']]
+        if over:
+            message = "Query budget exceeded: " + ", ".join(
+                f"{name} ({results[name]['queries']['max']} > {results[name]['budget']})" for name in over
+            )
+            if options['no_enforce']:
+                self.stderr.write(self.style.WARNING(message))
+            else:
+                raise CommandError(message)
+        errors = [name for name, r in results.items() if r['errors']]
+        if errors:
+            self.stderr.write(self.style.WARNING("Endpoints with error responses: " + ", ".join(errors)))
+
+    def _check_coverage(self):
+        """Warn when a route in main/urls.py has no benchmark yet."""
+        benchmarked = {e.view_name for e in bench.ENDPOINTS}
+        missing = []
+        for pattern in urls.urlpatterns:
+            # @api_view wraps the function in a class that keeps its name
+            name = pattern.name or getattr(pattern.callback, 'cls', pattern.callback).__name__
+            if name not in benchmarked:
+                missing.append(name)
+        if missing:
+            self.stderr.write(self.style.WARNING("Not benchmarked: " + ", ".join(sorted(missing))))
+
+    def _meta(self, options):
+        return {
+            'started_at': timezone.now().isoformat(),
+            'git': _git_revision(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'async_read_views': settings.ASYNC_READ_VIEWS,
+            'iterations': options['iterations'],
+            'cold_cache': options['cold'],
+            'catalog': {
+                'projects': Project.objects.count(),
+                'images': ProjectImage.objects.count(),
+                'categories': Category.objects.count(),
+                'feedback': Feedback.objects.count(),
+                'users': User.objects.count(),
+            },
+        }
+
+    def _print_row(self, name, r):
+        lat = r['latency_ms']
+        flag = self.style.ERROR(' OVER BUDGET') if r['over_budget'] else ''
+        self.stdout.write(
+            f"{name:<30} p50 {lat['p50']:>8.2f}  p95 {lat['p95']:>8.2f}  p99 {lat['p99']:>8.2f} ms  "
+            f"{r['rps'] or 0:>8.1f} req/s  queries {r['queries']['max']:>3}/{r['budget']:<3} "
+            f"status {r['status']}{flag}"
+        )
+
+    def _print_comparison(self, rows):
+        self.stdout.write("\nvs baseline (positive = slower):")
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint']:<30} p50 {row['p50']:>+7}%  p95 {row['p95']:>+7}%  queries {row['queries']:+d}"
+            )
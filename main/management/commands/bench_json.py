@@ -0,0 +1,74 @@
+import io
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from main.models import Feedback, Project
+from main.renderers import FastJSONParser, FastJSONRenderer, orjson
+from main.serializers import FeedbackSerializer, ProjectSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's stdlib JSON renderer/parser with main.renderers on the real catalog payload."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2000,
+                            help="Projects in the payload; real rows are repeated if the catalog is smaller.")
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def _time(self, fn, rounds):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        projects = list(Project.objects.prefetch_related('images', 'categories').order_by('-id')[:options['count']])
+        if not projects:
+            raise CommandError("No projects found; seed the catalog first.")
+        data = ProjectSerializer(projects, many=True).data
+        data = [data[i % len(data)] for i in range(options['count'])]
+        # Feedback rows carry real datetimes through the serializer
+        feedback = FeedbackSerializer(Feedback.objects.select_related('user')[:500], many=True).data
+
+        payloads = {'projects': data, 'feedback': list(feedback)}
+        rounds = options['rounds']
+        results = []
+        for name, payload in payloads.items():
+            body = JSONRenderer().render(payload)
+            fast_body = FastJSONRenderer().render(payload)
+            if json.loads(body) != json.loads(fast_body):
+                raise CommandError(f"{name}: renderers disagree on the output")
+            stdlib_render = self._time(lambda: JSONRenderer().render(payload), rounds)
+            fast_render = self._time(lambda: FastJSONRenderer().render(payload), rounds)
+            stdlib_parse = self._time(lambda: JSONParser().parse(io.BytesIO(body)), rounds)
+            fast_parse = self._time(lambda: FastJSONParser().parse(io.BytesIO(body)), rounds)
+            results.append({
+                'payload': name,
+                'items': len(payload),
+                'bytes': len(body),
+                'render_ms': {'stdlib': round(stdlib_render, 3), 'fast': round(fast_render, 3)},
+                'parse_ms': {'stdlib': round(stdlib_parse, 3), 'fast': round(fast_parse, 3)},
+                'render_speedup': round(stdlib_render / fast_render, 2) if fast_render else None,
+                'parse_speedup': round(stdlib_parse / fast_parse, 2) if fast_parse else None,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps({'orjson': orjson is not None, 'results': results}, indent=2))
+            return
+        if orjson is None:
+            self.stderr.write(self.style.WARNING("orjson is not installed: 'fast' is the stdlib fallback"))
+        for r in results:
+            self.stdout.write(
+                f"{r['payload']:<10} {r['items']:>6} items {r['bytes']:>10} bytes | "
+                f"render {r['render_ms']['stdlib']:>8} -> {r['render_ms']['fast']:>8} ms (x{r['render_speedup']}) | "
+                f"parse {r['parse_ms']['stdlib']:>8} -> {r['parse_ms']['fast']:>8} ms (x{r['parse_speedup']})"
+            )
+
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from main import queryplans
+from main.models import Project
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot queries on the seeded catalog and fail if any plan falls back to a full scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='append', dest='checks',
+                            help="Only these checks (repeatable), e.g. --check feedback_list.")
+        parser.add_argument('--min-projects', type=int, default=1000,
+                            help="Refuse to run on a smaller catalog (plans on tiny tables prove nothing).")
+        parser.add_argument('--no-analyze', action='store_true', help="Keep the current planner statistics.")
+
+    def handle(self, *args, **options):
+        checks = queryplans.CHECKS
+        if options['checks']:
+            checks = [c for c in checks if c.name in options['checks']]
+            if not checks:
+                raise CommandError("No matching checks")
+
+        projects = Project.objects.count()
+        if projects < options['min_projects']:
+            raise CommandError(
+                f"Only {projects} projects (need {options['min_projects']}); run `manage.py seed_catalog` first."
+            )
+        sample = queryplans.sample_values()
+        if sample is None:
+            raise CommandError("The catalog needs feedback and users with an email; run `manage.py seed_catalog`.")
+        if not options['no_analyze']:
+            queryplans.analyze()
+
+        failed = []
+        for check, plan, problems in queryplans.run_checks(sample, checks):
+            if plan is None:
+                reason = check.note or f"not checked on {connection.vendor}"
+                self.stdout.write(f"SKIP  {check.name:<26} {reason}")
+                continue
+            if problems:
+                failed.append(check.name)
+                self.stdout.write(self.style.ERROR(f"FAIL  {check.name:<26} {', '.join(problems)}"))
+            else:
+                self.stdout.write(f"OK    {check.name}")
+            if problems or options['verbosity'] > 1:
+                self.stdout.write('      ' + plan.replace('\n', '\n      '))
+
+        if failed:
+            raise CommandError(f"Query plan regressed: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes"))
@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importer import FORMATS, detect_format, import_projects, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Stream-import projects from a CSV or NDJSON file in batched transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension (csv).")
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        try:
+            stream = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(str(e))
+        with stream:
+            report = import_projects(iter_rows(stream, fmt), options['batch_size'])
+
+        self.stdout.write(json.dumps(report, indent=2))
+        if report['failed']:
+            self.stderr.write(self.style.WARNING(f"{report['failed']} row(s) failed"))
+        self.stdout.write(self.style.SUCCESS(f"Imported {report['created']} project(s)"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from main.cache import invalidate_related
+from main.related import load_profiles, rebuild_related
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed related-projects lists of every project (or the given ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        profiles = load_profiles()
+        ids = options['ids'] or sorted(profiles)
+        size = options['batch_size']
+        for start in range(0, len(ids), size):
+            rebuild_related(ids[start:start + size], profiles)
+            self.stdout.write(f"Rebuilt {min(start + size, len(ids))}/{len(ids)}")
+        invalidate_related()
+        self.stdout.write(self.style.SUCCESS("Related projects rebuilt"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main.cache import invalidate_projects
+from main.models import Project
+from main.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = "Re-render the stored JSON snapshot of every project (or the given ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--missing', action='store_true',
+            help="Only projects without a snapshot (backfill; reads render those on the fly without storing).",
+        )
+        parser.add_argument(
+            '--touch', action='store_true',
+            help="Also bump updated_at, so clients drop cached copies (use after a payload format change).",
+        )
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('id')
+        if options['ids']:
+            projects = projects.filter(pk__in=options['ids'])
+        if options['missing']:
+            projects = projects.filter(snapshot__isnull=True)
+        ids = list(projects.values_list('id', flat=True))
+        size = options['batch_size']
+        for start in range(0, len(ids), size):
+            batch = ids[start:start + size]
+            if options['touch']:
+                Project.objects.filter(pk__in=batch).update(updated_at=timezone.now())
+            rebuild_snapshots(*batch)
+            invalidate_projects(*batch)
+            self.stdout.write(f"Rebuilt {min(start + size, len(ids))}/{len(ids)}")
+        self.stdout.write(self.style.SUCCESS("Snapshots rebuilt"))
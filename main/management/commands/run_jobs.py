@@ -0,0 +1,27 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from main.jobs import retry_failed, work
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (snapshot renders, related-list refreshes). Keep one running next to the web process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None, help="Defaults to JOBS['THREADS'].")
+        parser.add_argument('--once', action='store_true', help="Exit when nothing is due (cron, deploys).")
+        parser.add_argument('--retry-failed', action='store_true', help="Requeue failed jobs first.")
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f"Requeued {retry_failed()} failed job(s)")
+
+        # SIGTERM/Ctrl-C: stop claiming, let the running batches finish
+        stop = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: stop.set())
+
+        batches, failed = work(options['threads'], once=options['once'], stop=stop)
+        self.stdout.write(self.style.SUCCESS(f"Ran {batches} batch(es), {failed} failed"))
@@ -0,0 +1,137 @@
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.cache import invalidate_categories, invalidate_projects
+from main.models import Category, Feedback, Project, ProjectImage, User
+from main.signals import batch_project_changes, refresh_feedback_stats
+from main.snapshots import rebuild_snapshots
+
+SEED_USER_PREFIX = 'seed_user_'
+# Seeded image URLs live under this Cloudinary folder, which is how --clear finds them
+SEED_FOLDER = 'seed'
+
+ROOMS = ['Living Room', 'Bedroom', 'Kitchen', 'Bathroom', 'Dining Area', 'Home Office',
+         'Kids Room', 'Balcony', 'Pooja Room', 'Facade', 'Terrace Garden', 'Entrance Lobby']
+STYLES = ['Modern', 'Minimal', 'Contemporary', 'Traditional', 'Scandinavian', 'Industrial',
+          'Rustic', 'Luxury', 'Boho', 'Indo-Western', 'Art Deco', 'Coastal']
+CITIES = ['Indore', 'Bhopal', 'Ujjain', 'Dewas', 'Jaipur', 'Pune', 'Mumbai', 'Ahmedabad']
+WORDS = (
+    'false ceiling wardrobe modular laminate veneer marble granite wooden flooring '
+    'pendant lights cove lighting wallpaper accent wall sofa recliner bed headboard '
+    'storage shelves tv unit crockery vanity mirror tiles elevation glass railing '
+    'planters jaali cladding texture paint warm neutral palette teak brass finish '
+    'open layout natural light ventilation compact budget premium family space'
+).split()
+FEEDBACK = [
+    'Bahut sundar design hai!', 'Please share the cost estimate.', 'Loved the lighting.',
+    'Can this work for a 2BHK?', 'Kitchen layout is very practical.', 'Colour combination is great.',
+    'What material is used for the wardrobe?', 'Need something similar for my home.',
+]
+
+
+class Command(BaseCommand):
+    help = "Generate a realistic synthetic catalog (projects, images, categories, users, feedback) for load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--images', type=int, default=4, help="Images per project.")
+        parser.add_argument('--categories', type=int, default=len(ROOMS))
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--feedback', type=int, default=5, help="Average feedback rows per project.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--clear', action='store_true', help="Remove previously seeded rows first.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        size = options['batch_size']
+        if options['clear']:
+            self._clear()
+
+        categories = self._categories(options['categories'])
+        users = self._users(options['users'], size)
+        cloud = settings.CLOUDINARY_STORAGE['CLOUD_NAME']
+
+        created = 0
+        for start in range(0, options['projects'], size):
+            count = min(size, options['projects'] - start)
+            with transaction.atomic():
+                projects = Project.objects.bulk_create(
+                    [self._project(rng, start + i, cloud) for i in range(count)], batch_size=size
+                )
+                ids = [p.pk for p in projects]
+                ProjectImage.objects.bulk_create([
+                    ProjectImage(project_id=pk, image=self._image_url(cloud, pk, n))
+                    for pk in ids for n in range(options['images'])
+                ], batch_size=size)
+                Through = Project.categories.through
+                Through.objects.bulk_create([
+                    Through(project_id=pk, category_id=c.pk)
+                    for pk in ids for c in rng.sample(categories, min(len(categories), rng.randint(1, 3)))
+                ], batch_size=size, ignore_conflicts=True)
+                if users and options['feedback']:
+                    Feedback.objects.bulk_create([
+                        Feedback(project_id=pk, user_id=rng.choice(users), message=rng.choice(FEEDBACK))
+                        for pk in ids for _ in range(rng.randint(0, options['feedback'] * 2))
+                    ], batch_size=size)
+                # bulk_create skips signals: counters, snapshots and caches by hand
+                refresh_feedback_stats(*ids)
+            rebuild_snapshots(*ids)
+            created += count
+            self.stdout.write(f"Seeded {created}/{options['projects']} projects")
+
+        invalidate_projects()
+        invalidate_categories()
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalog: {Project.objects.count()} projects, {ProjectImage.objects.count()} images, "
+            f"{Category.objects.count()} categories, {User.objects.count()} users, "
+            f"{Feedback.objects.count()} feedback"
+        ))
+
+    def _image_url(self, cloud, project_id, n):
+        return f'https://res.cloudinary.com/{cloud}/image/upload/v1700000000/{SEED_FOLDER}/project_{project_id}_{n}.jpg'
+
+    def _project(self, rng, n, cloud):
+        room, style = rng.choice(ROOMS), rng.choice(STYLES)
+        return Project(
+            title=f"{style} {room} Design #{n + 1}",
+            description=' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 160))).capitalize() + '.',
+            design_type=rng.choice(['2D', '3D']),
+            interior_or_exterior='Exterior' if room in ('Facade', 'Terrace Garden') else 'Interior',
+            plot_size=f"{rng.choice([20, 25, 30, 40, 50])}x{rng.choice([40, 50, 60, 80])}",
+            design_loc=rng.choice(CITIES),
+            contact_number='+9191092' + str(rng.randint(10000, 99999)),
+            whatsapp_number='+9191092' + str(rng.randint(10000, 99999)),
+            # Real id is unknown before insert; the main image only needs to look real
+            image=f'https://res.cloudinary.com/{cloud}/image/upload/v1700000000/{SEED_FOLDER}/cover_{n}.jpg',
+        )
+
+    def _categories(self, count):
+        names = ROOMS[:count] + [f'Category {i}' for i in range(len(ROOMS), count)]
+        existing = {c.name: c for c in Category.objects.filter(name__in=names)}
+        Category.objects.bulk_create([Category(name=n) for n in names if n not in existing])
+        return list(Category.objects.filter(name__in=names))
+
+    def _users(self, count, size):
+        # One hash for everyone: make_password is deliberately slow
+        password = make_password('seed-password')
+        existing = set(User.objects.filter(username__startswith=SEED_USER_PREFIX).values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(username=f'{SEED_USER_PREFIX}{i}', email=f'{SEED_USER_PREFIX}{i}@example.com', password=password)
+            for i in range(count) if f'{SEED_USER_PREFIX}{i}' not in existing
+        ], batch_size=size)
+        return list(User.objects.filter(username__startswith=SEED_USER_PREFIX).values_list('pk', flat=True)[:count])
+
+    def _clear(self):
+        seeded = Project.objects.filter(image__contains=f'/{SEED_FOLDER}/')
+        ids = list(seeded.values_list('pk', flat=True))
+        # One snapshot/cache flush for the whole delete instead of one per row
+        with transaction.atomic(), batch_project_changes():
+            for start in range(0, len(ids), 500):
+                Project.objects.filter(pk__in=ids[start:start + 500]).delete()
+            User.objects.filter(username__startswith=SEED_USER_PREFIX).delete()
+        self.stdout.write(f"Removed {len(ids)} seeded projects")
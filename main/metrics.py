@@ -0,0 +1,327 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+Every request records, under (route, method, status): a latency histogram,
+the number of SQL queries and the time spent in them, and the response
+size. The hot path takes no lock: each thread writes to its own shard and
+the shards are only merged when /api/metrics is scraped.
+
+SQL is timed by a wrapper installed on every new DB connection
+(connection_created); it reports to the request running in the current
+context, so queries the async views run via sync_to_async are counted too.
+
+With METRICS['MULTIPROC_DIR'] set, each worker also writes its totals to
+<dir>/<pid>.json (at most every FLUSH_INTERVAL seconds), and a scrape sums
+every file, so one request to any gunicorn worker returns the totals for
+all of them. When a worker exits (max_requests recycles them) gunicorn's
+child_exit hook calls mark_process_dead(), which folds its file into
+archive.json: counters stay monotonic, the directory holds one file per live
+worker, and a later worker reusing the pid starts from zero.
+gunicorn_asgi.py empties the directory when the master starts.
+
+The worker files also carry the auth token cache's counters
+(main/authentication.py), summed the same way; its size is a gauge, so only
+live workers count towards it.
+"""
+import atexit
+import bisect
+import contextvars
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .authentication import token_cache
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; multiprocess mode is for gunicorn (POSIX)
+    fcntl = None
+
+# Per-entry value layout
+_COUNT, _SECONDS, _QUERIES, _SQL_SECONDS, _BYTES, _LATENCY_BUCKETS, _QUERY_BUCKETS = range(7)
+
+_current = contextvars.ContextVar('main_metrics_request', default=None)
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()  # only taken once per thread, when its shard is created
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+ARCHIVE = 'archive.json'  # totals of exited workers
+TOKEN_CACHE_GAUGES = ('size', 'max_size')  # not archived: an exited worker holds no tokens
+
+
+# ------------------ SQL TIMING ------------------
+class _QueryStats:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook; a no-op outside a tracked request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - start
+
+
+def install_sql_wrapper(connection):
+    """Called for every new DB connection (connection_created)."""
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+def start_request():
+    stats = _QueryStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+# ------------------ RECORDING ------------------
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _new_entry():
+    config = settings.METRICS
+    return [0, 0.0, 0, 0.0, 0,
+            [0] * (len(config['LATENCY_BUCKETS']) + 1),
+            [0] * (len(config['QUERY_BUCKETS']) + 1)]
+
+
+def record(route, method, status, seconds, stats, size):
+    config = settings.METRICS
+    key = (route, method, str(status))
+    shard = _shard()
+    entry = shard.get(key)
+    if entry is None:
+        entry = shard[key] = _new_entry()
+    entry[_COUNT] += 1
+    entry[_SECONDS] += seconds
+    entry[_QUERIES] += stats.count
+    entry[_SQL_SECONDS] += stats.seconds
+    entry[_BYTES] += size
+    # Non-cumulative bucket counts; made cumulative when rendered
+    entry[_LATENCY_BUCKETS][bisect.bisect_left(config['LATENCY_BUCKETS'], seconds)] += 1
+    entry[_QUERY_BUCKETS][bisect.bisect_left(config['QUERY_BUCKETS'], stats.count)] += 1
+
+    if config['MULTIPROC_DIR'] and time.monotonic() - _last_flush >= config['FLUSH_INTERVAL']:
+        flush()
+
+
+# ------------------ AGGREGATION ------------------
+def _merge_into(total, key, entry):
+    current = total.get(key)
+    if current is None:
+        total[key] = [list(v) if isinstance(v, list) else v for v in entry]
+        return
+    for i, value in enumerate(entry):
+        if isinstance(value, list):
+            current[i] = [a + b for a, b in zip(current[i], value)]
+        else:
+            current[i] += value
+
+
+def local_totals():
+    """Merge this process's thread shards (copies; writers keep going)."""
+    with _shards_lock:
+        shards = list(_shards)
+    total = {}
+    for shard in shards:
+        for key, entry in shard.copy().items():
+            _merge_into(total, key, entry)
+    return total
+
+
+@contextmanager
+def _directory_lock(directory, exclusive=False):
+    """Readers share it; mark_process_dead takes it alone, so no scrape sees a worker twice or not at all."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _empty():
+    return {'requests': {}, 'token_cache': {}}
+
+
+def local_collected():
+    return {'requests': local_totals(), 'token_cache': token_cache.stats()}
+
+
+def _write(directory, name, collected):
+    """Atomic rename, so readers never see half a file."""
+    data = {
+        'requests': [[*key, *entry] for key, entry in collected['requests'].items()],
+        'token_cache': collected['token_cache'],
+    }
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, os.path.join(directory, name))
+
+
+def _read(path, collected):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False  # gone
+    for row in data['requests']:
+        _merge_into(collected['requests'], tuple(row[:3]), row[3:])
+    token_stats = collected['token_cache']
+    for name, value in data['token_cache'].items():
+        token_stats[name] = token_stats.get(name, 0) + value
+    return True
+
+
+def flush():
+    """Write this process's totals to MULTIPROC_DIR/<pid>.json."""
+    global _last_flush
+    directory = settings.METRICS['MULTIPROC_DIR']
+    if not directory or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        _write(directory, f'{os.getpid()}.json', local_collected())
+    finally:
+        _flush_lock.release()
+
+
+atexit.register(flush)
+
+
+def mark_process_dead(pid, directory=None):
+    """
+    Fold an exited worker's file into the archive and delete it. Called by
+    the gunicorn master (child_exit), after the worker's last flush.
+    """
+    directory = directory or settings.METRICS['MULTIPROC_DIR']
+    path = os.path.join(directory, f'{pid}.json')
+    if not os.path.exists(path):
+        return
+    with _directory_lock(directory, exclusive=True):
+        collected = _empty()
+        if not _read(path, collected):
+            return
+        for name in TOKEN_CACHE_GAUGES:
+            collected['token_cache'].pop(name, None)
+        _read(os.path.join(directory, ARCHIVE), collected)
+        _write(directory, ARCHIVE, collected)
+        os.remove(path)
+
+
+def collect():
+    """Request totals and token cache stats across all workers (multiprocess mode) or just this process."""
+    directory = settings.METRICS['MULTIPROC_DIR']
+    if not directory:
+        return local_collected()
+    flush()
+    collected = _empty()
+    with _directory_lock(directory):
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            _read(path, collected)  # archive.json included
+    return collected
+
+
+# ------------------ EXPOSITION ------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _histogram(lines, name, help_text, bounds, series):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, (buckets, total, count) in sorted(series.items()):
+        label_dict = dict(labels)
+        cumulative = 0
+        for bound, n in zip(list(bounds) + ['+Inf'], buckets):
+            cumulative += n
+            lines.append(f'{name}_bucket{_labels(**label_dict, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(**label_dict)} {total}')
+        lines.append(f'{name}_count{_labels(**label_dict)} {count}')
+
+
+def _token_cache_lines(stats):
+    return [
+        '# HELP auth_token_cache_lookups_total Auth token cache lookups by result.',
+        '# TYPE auth_token_cache_lookups_total counter',
+        f'auth_token_cache_lookups_total{_labels(result="hit")} {stats.get("hits", 0)}',
+        f'auth_token_cache_lookups_total{_labels(result="miss")} {stats.get("misses", 0)}',
+        '# HELP auth_token_cache_evictions_total Tokens dropped because the cache was full.',
+        '# TYPE auth_token_cache_evictions_total counter',
+        f'auth_token_cache_evictions_total {stats.get("evictions", 0)}',
+        '# HELP auth_token_cache_invalidations_total Users whose cached tokens were dropped (password/role change, logout).',
+        '# TYPE auth_token_cache_invalidations_total counter',
+        f'auth_token_cache_invalidations_total {stats.get("invalidations", 0)}',
+        '# HELP auth_token_cache_entries Tokens cached now, live workers summed.',
+        '# TYPE auth_token_cache_entries gauge',
+        f'auth_token_cache_entries {stats.get("size", 0)}',
+        '# HELP auth_token_cache_capacity MAX_SIZE, live workers summed.',
+        '# TYPE auth_token_cache_capacity gauge',
+        f'auth_token_cache_capacity {stats.get("max_size", 0)}',
+    ]
+
+
+def render(collected):
+    config = settings.METRICS
+    lines = []
+    requests, sql_seconds, response_bytes = [], [], []
+    latency, queries = {}, {}
+    for (route, method, status), entry in sorted(collected['requests'].items()):
+        labels = _labels(route=route, method=method, status=status)
+        requests.append(f'http_requests_total{labels} {entry[_COUNT]}')
+        sql_seconds.append(f'http_request_sql_seconds_total{labels} {entry[_SQL_SECONDS]}')
+        response_bytes.append(f'http_response_size_bytes_total{labels} {entry[_BYTES]}')
+        # Histograms per route/method; statuses summed
+        for series, buckets, total in (
+            (latency, entry[_LATENCY_BUCKETS], entry[_SECONDS]),
+            (queries, entry[_QUERY_BUCKETS], entry[_QUERIES]),
+        ):
+            key = (('route', route), ('method', method))
+            if key in series:
+                old_buckets, old_total, old_count = series[key]
+                series[key] = ([a + b for a, b in zip(old_buckets, buckets)], old_total + total, old_count + entry[_COUNT])
+            else:
+                series[key] = (list(buckets), total, entry[_COUNT])
+
+    lines += ['# HELP http_requests_total Requests by route, method and status.',
+              '# TYPE http_requests_total counter', *requests]
+    _histogram(lines, 'http_request_duration_seconds', 'Request latency, middleware included.',
+               config['LATENCY_BUCKETS'], latency)
+    _histogram(lines, 'http_request_sql_queries', 'SQL queries per request.',
+               config['QUERY_BUCKETS'], queries)
+    lines += ['# HELP http_request_sql_seconds_total Time spent in SQL.',
+              '# TYPE http_request_sql_seconds_total counter', *sql_seconds]
+    lines += ['# HELP http_response_size_bytes_total Response body bytes sent (streamed bodies not counted).',
+              '# TYPE http_response_size_bytes_total counter', *response_bytes]
+    lines += _token_cache_lines(collected['token_cache'])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,365 @@
+import gzip
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_etags
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import dbrouting, metrics
+from .querycheck import inspect_queries
+
+try:
+    import brotli
+except ImportError:  # optional: without it we only offer gzip
+    brotli = None
+
+
+# ------------------ ENCODERS ------------------
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31: zlib stream with a gzip header/trailer
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def process(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+def _compress(encoding, data, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['GZIP_LEVEL'], mtime=0)
+
+
+def _stream(encoding, config):
+    if encoding == 'br':
+        return _BrotliStream(config['BROTLI_QUALITY'])
+    return _GzipStream(config['GZIP_LEVEL'])
+
+
+# ------------------ NEGOTIATION ------------------
+def _accepted(header):
+    """Accept-Encoding -> {coding: q}, e.g. 'br;q=1.0, gzip;q=0.8, *;q=0'."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """Best coding we can produce for this Accept-Encoding, or None."""
+    accepted = _accepted(header or '')
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in offered:  # server preference breaks ties
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+# ------------------ MIDDLEWARE ------------------
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    gzip/brotli for API responses (WhiteNoise already serves pre-compressed
+    static files). Only content types in API_COMPRESSION['CONTENT_TYPES'] at
+    or above MIN_SIZE are compressed; streaming responses are compressed
+    chunk by chunk. Strong ETags are weakened, as Django's GZipMiddleware
+    does, since the encoded bytes differ from the ones the ETag describes;
+    If-None-Match uses weak comparison, so revalidation keeps working, and
+    a 304 answering a compressed copy gets the weak form too.
+    """
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # CPU only, no I/O: run inline instead of MiddlewareMixin's sync_to_async hop
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        config = settings.API_COMPRESSION
+        if response.status_code == 304:
+            return self._not_modified(request, response)
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in config['CONTENT_TYPES']:
+            return response
+
+        # Same URL, different bytes depending on Accept-Encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if response.has_header('Content-Encoding') or response.status_code in (204, 206):
+            return response
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            encoder = _stream(encoding, config)
+            flush_every = config['STREAM_FLUSH_BYTES']
+            if response.is_async:
+                response.streaming_content = self._acompress_stream(
+                    response.streaming_content, encoder, flush_every
+                )
+            else:
+                response.streaming_content = self._compress_stream(
+                    response.streaming_content, encoder, flush_every
+                )
+            del response['Content-Length']
+        else:
+            if len(response.content) < config['MIN_SIZE']:
+                return response
+            compressed = _compress(encoding, response.content, config)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def _not_modified(request, response):
+        """
+        A 304 has no body or Content-Type to decide on, but it must carry the
+        ETag the 200 would have. The client's If-None-Match says which form
+        it got: the weak one only comes from a compressed 200, and that 200
+        is compressed again as long as the client still accepts an encoding.
+        """
+        etag = response.get('ETag')
+        if not etag or not etag.startswith('"'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        sent = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if 'W/' + etag in sent and choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING')):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    # Flushing after every chunk would cost ratio on small NDJSON lines;
+    # flush once enough input has gone in so clients still see steady progress.
+    @staticmethod
+    def _compress_stream(chunks, encoder, flush_every):
+        pending = 0
+        for chunk in chunks:
+            pending += len(chunk)
+            data = encoder.process(chunk)
+            if pending >= flush_every:
+                data += encoder.flush()
+                pending = 0
+            if data:
+                yield data
+        yield encoder.finish()
+
+    @staticmethod
+    async def _acompress_stream(chunks, encoder, flush_every):
+        pending = 0
+        async for chunk in chunks:
+            pending += len(chunk)
+            data = encoder.process(chunk)
+            if pending >= flush_every:
+                data += encoder.flush()
+                pending = 0
+            if data:
+                yield data
+        yield encoder.finish()
+
+
+# ------------------ STATIC FILES ------------------
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, async-capable. WhiteNoiseMiddleware is sync-only, so under
+    ASGI Django would wrap everything below it (views included) in
+    sync_to_async. Here only a static file hit leaves the event loop (its
+    stat/open are blocking); every other request awaits the next handler.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+# ------------------ METRICS ------------------
+class MetricsMiddleware:
+    """
+    Records latency, SQL count/time, size and status per route (see
+    main/metrics.py). Put it first in MIDDLEWARE so the latency covers the
+    whole stack and the size is what went on the wire (after compression).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS['ENABLED']
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        stats, token = metrics.start_request()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            metrics.end_request(token)
+            self._record(request, response, time.perf_counter() - start, stats)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        stats, token = metrics.start_request()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            metrics.end_request(token)
+            self._record(request, response, time.perf_counter() - start, stats)
+
+    @staticmethod
+    def _record(request, response, seconds, stats):
+        match = getattr(request, 'resolver_match', None)
+        # Route template, not the raw path, so ids don't explode the label set
+        route = '/' + match.route if match else 'unmatched'
+        if response is None:
+            status, size = 500, 0
+        else:
+            status = response.status_code
+            size = 0 if response.streaming else len(response.content)
+        metrics.record(route, request.method, status, seconds, stats, size)
+
+
+# ------------------ N+1 / SLOW QUERIES ------------------
+class QueryInspectorMiddleware:
+    """
+    Runs each request under querycheck.inspect_queries(): repeated statement
+    shapes (N+1) and slow statements are logged, or raised with
+    QUERY_INSPECTOR['RAISE'] so the test client surfaces them. Removed from
+    the stack entirely when QUERY_INSPECTOR['ENABLED'] is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with inspect_queries(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with inspect_queries(f'{request.method} {request.path}'):
+            return await self.get_response(request)
+
+
+# ------------------ READ REPLICAS ------------------
+class ReplicaRoutingMiddleware:
+    """
+    Chooses the read database per request (main/dbrouting.py): a replica
+    for safe calls to the read API, picked in process_view where the view
+    is known, and the primary otherwise. Successful writes make the client
+    sticky to the primary. Removed from the stack when no replica is set up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not dbrouting.replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in dbrouting.SAFE_METHODS and dbrouting.health_check_due():
+            dbrouting.refresh_health()
+        token = dbrouting.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            dbrouting.end_request(token)
+        dbrouting.after_response(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if request.method in dbrouting.SAFE_METHODS and dbrouting.health_check_due():
+            await sync_to_async(dbrouting.refresh_health)()
+        token = dbrouting.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            dbrouting.end_request(token)
+        dbrouting.after_response(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        dbrouting.route_reads(request, view_func)
+        return None
+
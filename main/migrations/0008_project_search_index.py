@@ -0,0 +1,60 @@
+# Full-text search index for /api/projects/search/
+#
+# The SQL is a frozen copy of main/search.py as of this migration (migrations
+# must not import app code that changes later). Changing the search document
+# or the FTS table means a new migration, not an edit here.
+
+from django.db import migrations
+
+PG_CREATE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS main_project_search_gin ON main_project USING GIN ("
+    "to_tsvector('english', coalesce(title, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(design_loc, '')))"
+)
+
+SQLITE_FTS_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS main_project_fts USING fts5("
+    "title, description, design_loc, content='main_project', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS main_project_fts_ai AFTER INSERT ON main_project BEGIN "
+    "INSERT INTO main_project_fts(rowid, title, description, design_loc) "
+    "VALUES (new.id, new.title, new.description, new.design_loc); END",
+    "CREATE TRIGGER IF NOT EXISTS main_project_fts_ad AFTER DELETE ON main_project BEGIN "
+    "INSERT INTO main_project_fts(main_project_fts, rowid, title, description, design_loc) "
+    "VALUES ('delete', old.id, old.title, old.description, old.design_loc); END",
+    "CREATE TRIGGER IF NOT EXISTS main_project_fts_au AFTER UPDATE ON main_project BEGIN "
+    "INSERT INTO main_project_fts(main_project_fts, rowid, title, description, design_loc) "
+    "VALUES ('delete', old.id, old.title, old.description, old.design_loc); "
+    "INSERT INTO main_project_fts(rowid, title, description, design_loc) "
+    "VALUES (new.id, new.title, new.description, new.design_loc); END",
+    "INSERT INTO main_project_fts(main_project_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(PG_CREATE_INDEX)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FTS_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS main_project_search_gin")
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS main_project_fts_{suffix}")
+        schema_editor.execute("DROP TABLE IF EXISTS main_project_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_category_updated_at_feedback_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
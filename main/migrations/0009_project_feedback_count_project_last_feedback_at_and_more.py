@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:34
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_feedback_stats(apps, schema_editor):
+    Project = apps.get_model('main', 'Project')
+    Feedback = apps.get_model('main', 'Feedback')
+    per_project = Feedback.objects.filter(project=OuterRef('pk')).order_by().values('project')
+    Project.objects.update(
+        feedback_count=Coalesce(Subquery(per_project.annotate(n=Count('id')).values('n')), 0),
+        last_feedback_at=Subquery(per_project.annotate(last=Max('date')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_project_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='feedback_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_feedback_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['project', '-date', '-id'], name='feedback_project_date_idx'),
+        ),
+        migrations.RunPython(backfill_feedback_stats, migrations.RunPython.noop),
+    ]
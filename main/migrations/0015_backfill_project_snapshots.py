@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:05
+
+from django.db import migrations
+
+
+def enqueue_missing_snapshots(apps, schema_editor):
+    # Reads no longer store a missing snapshot; queue one render per project
+    # that has none, for the run_jobs worker (same rows main.jobs.enqueue writes)
+    Job = apps.get_model('main', 'Job')
+    Project = apps.get_model('main', 'Project')
+    db = schema_editor.connection.alias
+    ids = Project.objects.using(db).filter(snapshot__isnull=True).values_list('pk', flat=True).iterator()
+    batch = []
+    for pk in ids:
+        batch.append(Job(task='snapshots.rebuild', key=str(pk)))
+        if len(batch) == 1000:
+            Job.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Job.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(enqueue_missing_snapshots, migrations.RunPython.noop),
+    ]
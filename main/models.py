@@ -1,9 +1,13 @@
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.name
 
@@ -20,6 +24,21 @@ class Project(models.Model):
     design_loc = models.CharField(max_length=200, blank=True, null=True)
     contact_number = models.CharField(max_length=20,default="+919109231207", blank=True, null=True)
     whatsapp_number = models.CharField(max_length=20, blank=True, null=True)
+    # Images/categories badalne par bhi signals isko touch karte hain (ETag ke liye)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized engagement stats, signals se maintain hote hain (list mein COUNT nahi chahiye)
+    feedback_count = models.PositiveIntegerField(default=0)
+    last_feedback_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Catalog filters (?design_type=&interior_or_exterior=) newest-first, aur facets ka GROUP BY
+            models.Index(fields=['design_type', 'interior_or_exterior', '-id'], name='project_type_placement_idx'),
+            # Sirf ?interior_or_exterior= wala filter (upar wale index ka leading column nahi hai)
+            models.Index(fields=['interior_or_exterior', '-id'], name='project_placement_idx'),
+            # Admin list_filter / search by location
+            models.Index(fields=['design_loc', '-id'], name='project_design_loc_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -32,12 +51,98 @@ class ProjectImage(models.Model):
     def __str__(self):
         return self.project.title
 
+class ProjectSnapshot(models.Model):
+    """
+    Read model: the project's fully rendered API payload as pre-encoded JSON,
+    dropped on write and rebuilt by a background job, or by the first read
+    that finds it missing (see main/snapshots.py), so reads just concatenate it.
+    """
+    project = models.OneToOneField(Project, related_name='snapshot', on_delete=models.CASCADE, primary_key=True)
+    payload = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+class RelatedProject(models.Model):
+    """
+    Precomputed "similar designs" (see main/related.py): the top
+    RELATED_PROJECTS['SIZE'] matches per project, refreshed on write only for
+    the projects a change affects, so reading them is one index range scan.
+    """
+    # db_index off: the top-K index below already starts with project
+    project = models.ForeignKey(Project, related_name='related_entries', on_delete=models.CASCADE, db_index=False)
+    # Deleting a project leaves rows pointing at it in other lists until the
+    # refresh job rebuilds those; reads INNER JOIN, so they never show
+    related = models.ForeignKey(Project, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False)
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            # Top-K: WHERE project_id = ? ORDER BY score DESC, related_id DESC
+            models.Index(fields=['project', '-score', '-related'], name='related_project_topk_idx'),
+        ]
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log behind /api/projects/changes/ (see main/changes.py): one
+    row per changed or deleted project/image, written in the write's own
+    transaction. The id is the sync cursor, so a delta read is a range scan
+    from the client's id.
+    """
+    KIND_CHOICES = (('project', 'Project'), ('image', 'Image'))
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # True = tombstone
+    deleted = models.BooleanField(default=False)
+    # Pruning (prune_changes) deletes by age
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class Job(models.Model):
+    """
+    Post-write work waiting for the `run_jobs` worker (see main/jobs.py).
+    Enqueued in the write's own transaction; a job is deleted once it has run.
+    """
+    STATUS_CHOICES = (('pending', 'Pending'), ('running', 'Running'), ('failed', 'Failed'))
+    task = models.CharField(max_length=50)
+    # The task's argument, usually a project id
+    key = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # pending: not before this (retry backoff); running: lease expiry, after which it is claimed again
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Identical pending jobs collapse into one (enqueue ignores the conflict)
+            models.UniqueConstraint(fields=['task', 'key'], condition=models.Q(status='pending'),
+                                    name='job_pending_unique'),
+        ]
+        indexes = [
+            # Worker poll: WHERE status IN (...) AND run_after <= now ORDER BY id
+            models.Index(fields=['status', 'run_after'], name='job_due_idx'),
+        ]
+
 class Feedback(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     message = models.TextField()
     date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Project ki feedback list: WHERE project_id = ? ORDER BY date DESC, id DESC
+            models.Index(fields=['project', '-date', '-id'], name='feedback_project_date_idx'),
+        ]
 
 class User(AbstractUser):
     ROLE_CHOICES = (('admin', 'Admin'), ('user', 'User'))
-    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='user')
\ No newline at end of file
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='user')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Google login / register: WHERE email = ?
+            models.Index(fields=['email'], name='user_email_idx'),
+            # Reset password: email__iexact, jo Postgres par UPPER(email) = UPPER(?) banta hai
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,129 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+# ------------------ CURSOR ENCODING ------------------
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts datetimes to milliseconds; a keyset cursor needs them exact
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Pack the keyset values of the last row into an opaque, URL-safe token."""
+    raw = json.dumps(values, cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values
+
+
+# ------------------ REQUEST HELPERS ------------------
+def wants_pagination(request):
+    """Old frontend sends no paging params and expects the full list back."""
+    params = request.GET
+    if 'cursor' in params or 'page_size' in params:
+        return True
+    return not settings.API_LEGACY_UNPAGINATED
+
+
+def get_page_size(request):
+    try:
+        size = int(request.GET.get('page_size', settings.API_PAGE_SIZE))
+    except (TypeError, ValueError):
+        size = settings.API_PAGE_SIZE
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+# ------------------ KEYSET PAGINATION ------------------
+def _keyset_filter(ordering, values):
+    """
+    Build the "row comes after the cursor" condition for an ordering such as
+    ['-date', '-id'], i.e. (date < d) OR (date = d AND id < i).
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _cursor_values(queryset, ordering, cursor):
+    """Decode the cursor and coerce each value to its ordering field's type."""
+    values = decode_cursor(cursor)
+    if len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+    coerced = []
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        # Annotations (search rank) first, then model fields
+        annotation = queryset.query.annotations.get(name)
+        output = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+        try:
+            value = output.to_python(value)
+            output.run_validators(value)  # integer range for the backend
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise InvalidCursor(cursor)
+        if value is None:
+            raise InvalidCursor(cursor)
+        coerced.append(value)
+    return coerced
+
+
+def keyset_queryset(queryset, ordering, cursor=None):
+    """Order the queryset and keep only rows after the cursor."""
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_keyset_filter(ordering, _cursor_values(queryset, ordering, cursor)))
+    return queryset
+
+
+def split_page(rows, ordering, page_size):
+    """rows holds up to page_size + 1 items; the extra one only signals a next page."""
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, f.lstrip('-')) for f in ordering])
+    return rows, next_cursor
+
+
+def paginate_queryset(queryset, ordering, cursor=None, page_size=None):
+    """
+    Return (rows, next_cursor) for one page. The last ordering field must be
+    unique (normally the pk) so the cursor always points at exactly one row.
+    """
+    page_size = page_size or settings.API_PAGE_SIZE
+    queryset = keyset_queryset(queryset, ordering, cursor)
+    return split_page(list(queryset[:page_size + 1]), ordering, page_size)
+
+
+def page_payload(results, next_cursor):
+    return {
+        "results": results,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    }
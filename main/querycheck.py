@@ -0,0 +1,152 @@
+"""
+N+1 detector and slow-query log (development and tests).
+
+While a request (or an inspect_queries() block) runs, every SQL statement
+is reduced to its shape: literals, placeholders and IN/VALUES lists are
+collapsed, so "... WHERE project_id = 1" and "... = 2" count as one shape.
+A shape that runs REPEAT_THRESHOLD or more times is reported as a likely
+N+1, with the application stack of its first occurrence. A statement slower
+than SLOW_QUERY_MS is logged with the stack that issued it. With RAISE on,
+the N+1 report raises NPlusOneError instead, which fails the test.
+
+Settings: QUERY_INSPECTOR in settings.py. Logger: 'main.queries'.
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger('main.queries')
+
+_current = contextvars.ContextVar('main_query_inspector', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_VALUES_LIST = re.compile(r'(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+')
+_SPACE = re.compile(r'\s+')
+
+
+class NPlusOneError(AssertionError):
+    """Raised (QUERY_INSPECTOR['RAISE']) when a statement shape repeats too often."""
+
+
+def normalize(sql):
+    """Statement shape: the SQL with every value replaced by '?' and lists collapsed."""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _IN_LIST.sub('(...)', shape)
+    shape = _VALUES_LIST.sub(r'\1', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+# Frames that say nothing about who asked for the query
+_PLUMBING = (
+    os.path.join('django', 'db', ''),
+    os.path.join('django', 'utils', ''),
+    os.path.join('asgiref', ''),
+    os.path.join('main', 'metrics.py'),
+    os.path.join('main', 'querycheck.py'),
+)
+
+
+def app_stack(limit=None):
+    """
+    Where a query came from: the innermost caller outside the ORM (often a
+    DRF field for serializer N+1s) followed by this project's own frames.
+    """
+    limit = limit or settings.QUERY_INSPECTOR['STACK_DEPTH']
+    base = str(settings.BASE_DIR)
+    frames = [f for f in traceback.extract_stack()[:-1] if not any(p in f.filename for p in _PLUMBING)]
+    if not frames:
+        return ''
+    origin = frames[-1]
+    app = [f for f in frames if f.filename.startswith(base) and 'site-packages' not in f.filename]
+    shown = app[-limit:]
+    if origin not in shown:
+        shown.append(origin)
+    return ''.join(traceback.format_list(shown))
+
+
+# ------------------ COLLECTOR ------------------
+class QueryInspector:
+    """SQL shapes seen in one request/block, plus where each first ran."""
+
+    def __init__(self, label, threshold=None, slow_ms=None, raise_errors=None):
+        config = settings.QUERY_INSPECTOR
+        self.label = label
+        self.threshold = config['REPEAT_THRESHOLD'] if threshold is None else threshold
+        self.slow_ms = config['SLOW_QUERY_MS'] if slow_ms is None else slow_ms
+        self.raise_errors = config['RAISE'] if raise_errors is None else raise_errors
+        self.shapes = Counter()
+        self.first_seen = {}
+        self.total = 0
+
+    def add(self, sql, duration_ms):
+        shape = normalize(sql)
+        self.total += 1
+        self.shapes[shape] += 1
+        if shape not in self.first_seen:
+            self.first_seen[shape] = app_stack()
+        if duration_ms >= self.slow_ms:
+            logger.warning(
+                "Slow query (%.1f ms) during %s:\n  %s\nIssued from:\n%s",
+                duration_ms, self.label, sql, app_stack(),
+            )
+
+    def repeated(self):
+        """[(shape, count)] for shapes at or over the threshold, worst first."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= self.threshold]
+
+    def report(self):
+        repeated = self.repeated()
+        if not repeated:
+            return
+        lines = [f"Possible N+1 during {self.label}: {self.total} queries, repeated shapes:"]
+        for shape, n in repeated:
+            lines.append(f"  {n}x {shape}\n  first issued from:\n{self.first_seen[shape]}")
+        message = '\n'.join(lines)
+        if self.raise_errors:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook; a no-op outside an inspected block."""
+    inspector = _current.get()
+    if inspector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        inspector.add(sql, (time.perf_counter() - start) * 1000)
+
+
+def install_sql_wrapper(connection):
+    """Called for every new DB connection (connection_created)."""
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+@contextmanager
+def inspect_queries(label='block', **options):
+    """
+    Collect the SQL run inside the block and report repeated shapes on exit.
+    In tests: `with inspect_queries('projects list', raise_errors=True): ...`
+    """
+    inspector = QueryInspector(label, **options)
+    token = _current.set(inspector)
+    try:
+        yield inspector
+    finally:
+        _current.reset(token)
+    inspector.report()
@@ -0,0 +1,183 @@
+"""
+EXPLAIN regression checks for the hot queries.
+
+Each PlanCheck builds the query a view (or the admin) actually runs, using
+the same helpers, and inspects its plan: the listed tables must be reached
+through an index, never a full scan, the index the check was written for
+must be the one used, and with `ordered` set the ORDER BY must come straight
+from the index, without a separate sort step. A dropped index, or a rewrite
+that stops a filter from using one, fails the check. Run it against a
+seeded catalog (`manage.py check_query_plans`); main/tests.py runs it on
+one it seeds itself.
+
+Filter values are the rarest ones in the data: that is where an index
+matters most, and where the planner picks one even with fresh statistics.
+
+On PostgreSQL the plans are taken with enable_seqscan off. A seeded table is
+small enough that a seq scan can honestly be the cheapest plan, but the
+question here is whether an index *can* serve the query. Any seq scan that
+is still left is one that no index could avoid.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.http import QueryDict
+
+from .fieldsets import project_queryset, requested_fields
+from .filters import filter_projects
+from .models import Feedback, Project, RelatedProject, User
+from .pagination import keyset_queryset
+from .related import related_queryset
+
+PAGE = 21  # page_size + 1, as paginate_queryset fetches
+
+# "SCAN main_project" (older SQLite: "SCAN TABLE main_project"), "Seq Scan on main_project"
+_FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+_SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'(?:^|->)\s*(?:Incremental )?Sort\b', re.M),
+}
+
+
+class PlanCheck:
+    def __init__(self, name, models, build, index, ordered=False, vendors=None, note=''):
+        self.name = name
+        self.tables = [m._meta.db_table for m in models]
+        self.build = build      # build(sample) -> queryset
+        self.index = index      # name of the index the plan must use
+        self.ordered = ordered
+        self.vendors = vendors  # None = every vendor in _FULL_SCAN
+        self.note = note
+
+    def supports(self, vendor):
+        return vendor in _FULL_SCAN and (self.vendors is None or vendor in self.vendors)
+
+
+# ------------------ SAMPLE VALUES ------------------
+def _rarest(field):
+    return (
+        Project.objects.exclude(**{f'{field}__isnull': True}).values(field)
+        .annotate(n=Count('id')).order_by('n', field).values_list(field, flat=True).first()
+    )
+
+
+def sample_values():
+    """Filter values for the checks, or None if the catalog is empty."""
+    combo = (
+        Project.objects.values('design_type', 'interior_or_exterior')
+        .annotate(n=Count('id')).order_by('n').first()
+    )
+    busiest = Feedback.objects.values('project').annotate(n=Count('id')).order_by('-n').first()
+    email = User.objects.exclude(email='').values_list('email', flat=True).first()
+    if not combo or not busiest or not email:
+        return None
+    return {
+        'design_type': combo['design_type'],
+        'combo_placement': combo['interior_or_exterior'],
+        'placement': _rarest('interior_or_exterior'),
+        'design_loc': _rarest('design_loc'),
+        'project_id': busiest['project'],
+        'email': email,
+    }
+
+
+# ------------------ HOT QUERIES ------------------
+def _catalog(params):
+    # projects_api with filters: snapshot join + keyset page, newest first
+    queryset = filter_projects(project_queryset(requested_fields(QueryDict())), QueryDict(params))
+    return keyset_queryset(queryset, ['-id'])[:PAGE]
+
+
+CHECKS = [
+    PlanCheck(
+        'feedback_list', [Feedback],
+        lambda s: keyset_queryset(
+            Feedback.objects.filter(project_id=s['project_id']).select_related('user'), ['-date', '-id'],
+        )[:PAGE],
+        'feedback_project_date_idx',
+        ordered=True,
+    ),
+    PlanCheck(
+        'catalog_type_placement', [Project],
+        lambda s: _catalog(f"design_type={s['design_type']}&interior_or_exterior={s['combo_placement']}"),
+        'project_type_placement_idx',
+        ordered=True,
+    ),
+    PlanCheck(
+        'catalog_placement', [Project],
+        lambda s: _catalog(f"interior_or_exterior={s['placement']}"),
+        'project_placement_idx',
+        ordered=True,
+    ),
+    PlanCheck(
+        'admin_design_loc', [Project],
+        lambda s: Project.objects.filter(design_loc=s['design_loc']).order_by('-id')[:100],
+        'project_design_loc_idx',
+        ordered=True,
+    ),
+    PlanCheck(
+        'related_topk', [RelatedProject, Project],
+        lambda s: related_queryset(s['project_id'], 6),
+        'related_project_topk_idx',
+        ordered=True,
+    ),
+    PlanCheck(
+        'user_email', [User],
+        lambda s: User.objects.filter(email=s['email']),
+        'user_email_idx',
+    ),
+    PlanCheck(
+        'user_email_iexact', [User],
+        lambda s: User.objects.filter(email__iexact=s['email'].upper()),
+        'user_email_upper_idx',
+        vendors=['postgresql'],
+        note="SQLite compiles iexact to LIKE, which no expression index can serve",
+    ),
+]
+
+
+# ------------------ RUNNING ------------------
+def analyze():
+    """Refresh planner statistics so plans reflect the seeded data."""
+    tables = sorted({table for check in CHECKS for table in check.tables})
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('ANALYZE ' + ', '.join(connection.ops.quote_name(t) for t in tables))
+        elif connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+
+
+def explain(queryset):
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def problems(check, plan, vendor):
+    """What is wrong with the plan; empty when it is fine."""
+    found = [f'full scan of {table}' for table in check.tables
+             if table in _FULL_SCAN[vendor].findall(plan)]
+    if not re.search(rf'\b{re.escape(check.index)}\b', plan):
+        found.append(f'{check.index} not used')
+    if check.ordered and _SORT[vendor].search(plan):
+        found.append('separate sort for ORDER BY')
+    return found
+
+
+def run_checks(sample, checks=None):
+    """[(check, plan or None if skipped, problems)] for the current connection."""
+    vendor = connection.vendor
+    results = []
+    for check in checks or CHECKS:
+        if not check.supports(vendor):
+            results.append((check, None, []))
+            continue
+        plan = explain(check.build(sample))
+        results.append((check, plan, problems(check, plan, vendor)))
+    return results
@@ -0,0 +1,265 @@
+"""
+"Similar designs": a precomputed top-K list per project.
+
+    score = w_categories * Jaccard(categories)
+          + w_design_type * same design_type
+          + w_interior_or_exterior * same interior_or_exterior
+          + w_design_loc * same design_loc
+
+Each project stores its best RELATED_PROJECTS['SIZE'] matches scoring at
+least MIN_SCORE. Ties go to the newer project. Reading a list is one range
+scan of related_project_topk_idx.
+
+Writes enqueue the changed ids, and a background job (main/jobs.py) calls
+refresh_related() with a batch of them. A changed project's own list is
+recomputed. Another project's list only changes if it
+already holds a changed project or if a changed project now beats its
+weakest entry. Such a list is merged with the new scores. A merge is exact
+unless a full list lost an entry (a lower score, or a deleted project): the
+true replacement is unknown then, so that list is recomputed.
+rebuild_related() recomputes everything (`manage.py rebuild_related`).
+
+A refresh never loads the whole catalog. Without a shared category the
+score is the sum of the matching columns' weights, so only projects that
+share a category, or a set of columns whose weights reach MIN_SCORE, can
+score high enough against a given project (candidate_profiles). Those are
+the only lists a change can reach, and the only matches a recomputed list
+can hold.
+"""
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from .models import Project, RelatedProject
+
+# Project columns the score reads; changing one of them (or the categories) refreshes the lists
+SIMILARITY_FIELDS = ('design_type', 'interior_or_exterior', 'design_loc')
+
+
+# ------------------ SCORING ------------------
+def load_profiles(project_ids=None):
+    """
+    {id: (design_type, interior_or_exterior, design_loc, frozenset(category ids))}
+    for these projects (default: the catalog); ids that no longer exist are left out.
+    """
+    if project_ids is None:
+        chunks = [None]
+    else:
+        project_ids = sorted(project_ids)
+        size = settings.RELATED_PROJECTS['BATCH_SIZE']
+        chunks = [project_ids[start:start + size] for start in range(0, len(project_ids), size)]
+    Through = Project.categories.through
+    profiles = {}
+    for chunk in chunks:
+        links, projects = Through.objects.all(), Project.objects.all()
+        if chunk is not None:
+            links, projects = links.filter(project_id__in=chunk), projects.filter(pk__in=chunk)
+        categories = defaultdict(set)
+        for project_id, category_id in links.values_list('project_id', 'category_id'):
+            categories[project_id].add(category_id)
+        profiles.update(
+            (pk, (design_type, placement, loc, frozenset(categories.get(pk, ()))))
+            for pk, design_type, placement, loc in projects.values_list(
+                'id', 'design_type', 'interior_or_exterior', 'design_loc',
+            )
+        )
+    return profiles
+
+
+def _column_sets():
+    """Smallest sets of SIMILARITY_FIELDS whose weights alone reach MIN_SCORE."""
+    config = settings.RELATED_PROJECTS
+    found = []
+    for size in range(len(SIMILARITY_FIELDS) + 1):
+        for fields in itertools.combinations(SIMILARITY_FIELDS, size):
+            if any(set(smaller) <= set(fields) for smaller in found):
+                continue
+            if round(sum(config['WEIGHTS'][f] for f in fields), 6) >= config['MIN_SCORE']:
+                found.append(fields)
+    return found
+
+
+def candidate_profiles(profiles):
+    """
+    Profiles of every project that can score MIN_SCORE or more against one
+    of these (a project id -> profile dict); exact, see the module docstring.
+    """
+    if not profiles:
+        return {}
+    column_sets = _column_sets()
+    if () in column_sets:
+        return load_profiles()  # MIN_SCORE <= 0: everything matches
+    match = Q(pk__in=Project.categories.through.objects.filter(
+        category_id__in=set().union(*(p[3] for p in profiles.values())),
+    ).values('project_id'))
+    lookups = set()
+    for fields in column_sets:
+        for profile in profiles.values():
+            values = dict(zip(SIMILARITY_FIELDS, profile[:3]))
+            # design_loc NULL matches nothing (see score())
+            if all(values[f] is not None for f in fields):
+                lookups.add(tuple((f, values[f]) for f in fields))
+    for lookup in sorted(lookups):
+        match |= Q(*lookup)
+    ids = set(Project.objects.filter(match).values_list('id', flat=True))
+    return load_profiles(ids - profiles.keys()) | profiles
+
+
+def score(a, b):
+    weights = settings.RELATED_PROJECTS['WEIGHTS']
+    union = len(a[3] | b[3])
+    jaccard = len(a[3] & b[3]) / union if union else 0.0
+    total = (
+        weights['categories'] * jaccard
+        + weights['design_type'] * (a[0] == b[0])
+        + weights['interior_or_exterior'] * (a[1] == b[1])
+        + weights['design_loc'] * (a[2] is not None and a[2] == b[2])
+    )
+    # Rounded so equal matches tie exactly and the id decides
+    return round(total, 6)
+
+
+def top_matches(project_id, profiles):
+    """[(score, related_id)] best first, for one project against these profiles (its candidates or the catalog)."""
+    config = settings.RELATED_PROJECTS
+    profile = profiles[project_id]
+    scored = (
+        (score(profile, other), other_id)
+        for other_id, other in profiles.items() if other_id != project_id
+    )
+    return heapq.nlargest(config['SIZE'], (m for m in scored if m[0] >= config['MIN_SCORE']))
+
+
+# ------------------ STORAGE ------------------
+def _stored(project_ids, size):
+    """{project_id: {related_id: (row id, score)}} for these lists."""
+    rows = defaultdict(dict)
+    for start in range(0, len(project_ids), size):
+        for pk, project_id, related_id, value in RelatedProject.objects.filter(
+            project_id__in=project_ids[start:start + size],
+        ).values_list('id', 'project_id', 'related_id', 'score'):
+            rows[project_id][related_id] = (pk, value)
+    return rows
+
+
+def _save(lists, stored=None):
+    """
+    Make the stored lists of these projects equal to `lists`
+    ({project_id: [(score, related_id)]}). Only the difference is written:
+    a refresh usually moves one or two entries of a list.
+    """
+    size = settings.RELATED_PROJECTS['BATCH_SIZE']
+    stored = _stored(list(lists), size) if stored is None else stored
+    delete, update, create = [], [], []
+    for project_id, matches in lists.items():
+        old = stored.get(project_id, {})
+        new = {related_id: value for value, related_id in matches}
+        delete.extend(pk for related_id, (pk, _) in old.items() if related_id not in new)
+        for related_id, value in new.items():
+            if related_id not in old:
+                create.append(RelatedProject(project_id=project_id, related_id=related_id, score=value))
+            elif old[related_id][1] != value:
+                update.append(RelatedProject(pk=old[related_id][0], score=value))
+    with transaction.atomic():
+        for start in range(0, len(delete), size):
+            RelatedProject.objects.filter(pk__in=delete[start:start + size]).delete()
+        RelatedProject.objects.bulk_update(update, ['score'], batch_size=size)
+        RelatedProject.objects.bulk_create(create, batch_size=size)
+
+
+def rebuild_related(project_ids=None, profiles=None):
+    """Recompute the lists of these projects (default: all) from scratch."""
+    profiles = load_profiles() if profiles is None else profiles
+    ids = profiles.keys() if project_ids is None else [pk for pk in project_ids if pk in profiles]
+    lists = {pk: top_matches(pk, profiles) for pk in ids}
+    _save(lists)
+    return len(lists)
+
+
+def _bounds(project_ids, size):
+    """{project_id: (entries, weakest score)} of these stored lists."""
+    project_ids = sorted(project_ids)
+    bounds = {}
+    for start in range(0, len(project_ids), size):
+        bounds.update(
+            (row['project_id'], (row['n'], row['low']))
+            for row in RelatedProject.objects.filter(project_id__in=project_ids[start:start + size])
+            .values('project_id').annotate(n=Count('id'), low=Min('score'))
+        )
+    return bounds
+
+
+def refresh_related(*changed_ids):
+    """Bring the stored lists up to date after these projects were added, changed or deleted."""
+    if not changed_ids:
+        return 0
+    config = settings.RELATED_PROJECTS
+    changed = set(changed_ids)
+    # The changed projects and every project they can now score against
+    profiles = candidate_profiles(load_profiles(changed))
+    alive = [pk for pk in changed if pk in profiles]
+
+    # Lists already holding a changed project: (project_id, related_id, score)
+    holders = defaultdict(dict)
+    for project_id, related_id, value in RelatedProject.objects.filter(
+        related_id__in=changed,
+    ).values_list('project_id', 'related_id', 'score'):
+        holders[project_id][related_id] = value
+    # A holder the changed project no longer matches is not a candidate; its profile is still needed
+    profiles.update(load_profiles(holders.keys() - profiles.keys()))
+    affected = profiles.keys() - changed
+    bounds = _bounds(affected, config['BATCH_SIZE'])
+
+    recompute = set(alive)
+    merges = {}  # project_id -> new candidate matches from the changed projects
+    for other_id in affected:
+        profile = profiles[other_id]
+        count, low = bounds.get(other_id, (0, None))
+        full = count >= config['SIZE']
+        held = holders.get(other_id, {})
+        candidates = []
+        lost = dirty = False
+        for pk in changed:
+            new = score(profile, profiles[pk]) if pk in profiles else None
+            if new is not None and new < config['MIN_SCORE']:
+                new = None
+            if pk in held:
+                # Kept as a candidate even if unchanged: a merge drops every changed id first
+                lost = lost or new is None or new < held[pk]
+                dirty = dirty or new != held[pk]
+                if new is not None:
+                    candidates.append((new, pk))
+            elif new is not None and (not full or new >= low):
+                candidates.append((new, pk))
+                dirty = True
+        if lost and full:
+            recompute.add(other_id)
+        elif dirty:
+            merges[other_id] = candidates
+
+    # A recomputed list of another project ranks that project's own candidates
+    profiles.update(candidate_profiles({pk: profiles[pk] for pk in recompute - changed}))
+    lists = {pk: top_matches(pk, profiles) for pk in recompute}
+    stored = _stored(list(recompute | merges.keys()), config['BATCH_SIZE'])
+    for project_id, candidates in merges.items():
+        kept = [(value, related_id) for related_id, (_, value) in stored[project_id].items()
+                if related_id not in changed]
+        lists[project_id] = heapq.nlargest(config['SIZE'], kept + candidates)
+    _save(lists, stored)
+    # Deleted projects' own rows went with them (CASCADE)
+    return len(lists)
+
+
+# ------------------ READ SIDE ------------------
+def related_queryset(project_id, limit):
+    """The top `limit` matches with the related project joined: one index range scan."""
+    return (
+        RelatedProject.objects.filter(project_id=project_id)
+        .select_related('related')
+        .only('score', 'related__id', 'related__title', 'related__image')
+        .order_by('-score', '-related_id')[:limit]
+    )
@@ -0,0 +1,97 @@
+"""
+orjson-based JSON renderer/parser for DRF, with a stdlib fallback.
+
+orjson encodes datetimes, dates, UUIDs and dataclasses natively in C; what
+it can't handle (Decimal, lazy strings, querysets, ...) goes through DRF's
+own JSONEncoder.default, so the output matches JSONRenderer's. Without
+orjson installed both classes behave exactly like DRF's.
+"""
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+# ------------------ FRAGMENTS ------------------
+class _Fragment:
+    """Already-encoded JSON (e.g. a stored snapshot) to embed as-is."""
+
+    def __init__(self, contents):
+        self.contents = contents
+
+
+# orjson.Fragment is 3.9+; older orjson (and stdlib json) decode ours instead (slow path)
+Fragment = getattr(orjson, 'Fragment', None) or _Fragment
+
+
+class _FallbackEncoder(JSONEncoder):
+    def default(self, o):
+        if isinstance(o, _Fragment):
+            # stdlib json can't splice raw text in; decode it instead
+            return json.loads(o.contents)
+        return super().default(o)
+
+
+# ------------------ ENCODING ------------------
+_orjson_default = _FallbackEncoder().default
+_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def dumps(data, indent=None):
+    """Encode to compact UTF-8 JSON bytes, same output shape as DRF's JSONRenderer."""
+    if orjson is None:
+        text = json.dumps(
+            data, cls=_FallbackEncoder, ensure_ascii=False, indent=indent,
+            separators=(',', ': ') if indent else (',', ':'),
+        )
+        return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+    option = _OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+    ret = orjson.dumps(data, default=_orjson_default, option=option)
+    # Like DRF: keep the output a strict JavaScript subset
+    for raw, escaped in _LINE_SEPARATORS:
+        if raw in ret:
+            ret = ret.replace(raw, escaped)
+    return ret
+
+
+def loads(data):
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+# ------------------ DRF CLASSES ------------------
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in JSONRenderer using orjson (OPT_INDENT_2 when an indent is asked for)."""
+    encoder_class = _FallbackEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact:
+            # Settings orjson can't reproduce (UNICODE_JSON/COMPACT_JSON off)
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return dumps(data, indent=indent)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8').lower().replace('_', '-')
+        if orjson is None or encoding not in ('utf-8', 'utf8') or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
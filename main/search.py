@@ -0,0 +1,104 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# ------------------ POSTGRES (tsvector + GIN) ------------------
+# The GIN index in migration 0008 is built on exactly this expression (a
+# frozen copy there), so the planner can match it. Changing it needs a new
+# migration that rebuilds the index.
+PG_DOCUMENT = (
+    "to_tsvector('english', coalesce({t}title, '') || ' ' || "
+    "coalesce({t}description, '') || ' ' || coalesce({t}design_loc, ''))"
+)
+PG_QUERY = "websearch_to_tsquery('english', %s)"
+
+# ------------------ SQLITE (FTS5, used in tests/local dev) ------------------
+# Same statements as migration 0008 (which keeps its own copy)
+SQLITE_FTS_TABLE = 'main_project_fts'
+_SQLITE_COLUMNS = 'title, description, design_loc'
+_SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+    f"{_SQLITE_COLUMNS}, content='main_project', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON main_project BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, {_SQLITE_COLUMNS}) "
+    f"VALUES (new.id, new.title, new.description, new.design_loc); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON main_project BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, {_SQLITE_COLUMNS}) "
+    f"VALUES ('delete', old.id, old.title, old.description, old.design_loc); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE ON main_project BEGIN "
+    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, {_SQLITE_COLUMNS}) "
+    f"VALUES ('delete', old.id, old.title, old.description, old.design_loc); "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, {_SQLITE_COLUMNS}) "
+    f"VALUES (new.id, new.title, new.description, new.design_loc); END",
+]
+
+
+def install_sqlite_fts(connection):
+    """
+    Create the FTS5 table and its sync triggers if they are missing.
+
+    SQLite migrations that rebuild main_project drop its triggers, so this
+    also runs after every migrate (see apps.py) and re-indexes if needed.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f'{SQLITE_FTS_TABLE}_a_'],
+        )
+        if cursor.fetchone()[0] == 3:
+            return
+        for statement in _SQLITE_FTS_SQL:
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _fts5_query(q):
+    # Har word ko quote karke prefix match; user ka FTS syntax pass nahi hota
+    return ' '.join('"%s"*' % token for token in re.findall(r'\w+', q))
+
+
+# ------------------ SEARCH ------------------
+def search_projects(queryset, q):
+    """
+    Full-text match on title/description/design_loc, annotated with `rank`
+    (higher is better). Returns the queryset unchanged for an empty query.
+    """
+    q = (q or '').strip()
+    if not q:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        document = PG_DOCUMENT.format(t='main_project.')
+        # float8 so the rank round-trips exactly through the cursor
+        rank = RawSQL(f"ts_rank({document}, {PG_QUERY})::float8", [q], output_field=FloatField())
+        match = RawSQL(f"{document} @@ {PG_QUERY}", [q], output_field=BooleanField())
+        return queryset.annotate(rank=rank).filter(match)
+
+    if vendor == 'sqlite':
+        fts_query = _fts5_query(q)
+        if not fts_query:
+            # Sirf punctuation: kuch match nahi, par view phir bhi rank se order karta hai
+            return queryset.annotate(rank=Value(0.0, output_field=FloatField())).none()
+        rank = RawSQL(
+            f"SELECT -bm25({SQLITE_FTS_TABLE}) FROM {SQLITE_FTS_TABLE} "
+            f"WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = main_project.id",
+            [fts_query], output_field=FloatField(),
+        )
+        match = RawSQL(
+            f"main_project.id IN (SELECT rowid FROM {SQLITE_FTS_TABLE} "
+            f"WHERE {SQLITE_FTS_TABLE} MATCH %s)",
+            [fts_query], output_field=BooleanField(),
+        )
+        return queryset.annotate(rank=rank).filter(match)
+
+    # Any other backend: unindexed substring match, unranked
+    for token in q.split():
+        queryset = queryset.filter(
+            Q(title__icontains=token) | Q(description__icontains=token) | Q(design_loc__icontains=token)
+        )
+    return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
@@ -1,12 +1,27 @@
 from rest_framework import serializers
 from .models import Project, ProjectImage, Category, Feedback, User
 from django.contrib.auth import authenticate
+from .images import original_url, srcset, variant_urls
 
 # 1. Project Image Serializer
 class ProjectImageSerializer(serializers.ModelSerializer):
+    # DB mein full URL ya sirf public_id ho sakta hai; client ko hamesha URL milta hai
+    image = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProjectImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'variants', 'srcset']
+
+    def get_image(self, obj):
+        return original_url(obj.image)
+
+    def get_variants(self, obj):
+        return variant_urls(obj.image)
+
+    def get_srcset(self, obj):
+        return srcset(obj.image)
 
 # 2. Category Serializer
 class CategorySerializer(serializers.ModelSerializer):
@@ -23,9 +38,22 @@ class FeedbackSerializer(serializers.ModelSerializer):
         fields = ['id', 'user_name', 'message', 'date']
 
 # 4. Project Serializer
-class ProjectSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """fields=[...] kwarg: sirf wahi fields serialize hongi (?fields= / ?exclude= ke liye)."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = ProjectImageSerializer(many=True, read_only=True)
     category_names = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     # ✅ Sirf Contact Number ko custom logic se handle karenge
     contact_number = serializers.SerializerMethodField()
@@ -35,10 +63,20 @@ class ProjectSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'categories', 'description', 
             'plot_size', 'design_loc', 'contact_number', 'whatsapp_number', 
-            'interior_or_exterior', 'design_type', 'image', 
-            'images', 'category_names'
+            'interior_or_exterior', 'design_type', 'image', 'image_variants', 'image_srcset',
+            'images', 'category_names', 'feedback_count', 'last_feedback_at'
         ]
 
+    # ✅ Grid/card ke liye chhote Cloudinary variants (settings.IMAGE_VARIANTS)
+    def get_image(self, obj):
+        return original_url(obj.image)
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image)
+
+    def get_image_srcset(self, obj):
+        return srcset(obj.image)
+
     def get_category_names(self, obj):
         return [c.name for c in obj.categories.all()]
 
@@ -59,6 +97,12 @@ class ProjectSerializer(serializers.ModelSerializer):
         # Agar database khali hai ya kachra hai, toh ye fixed number jayega
         return "+919109231207" # <--- Apna No. yahan daalein
 
+
+# 4b. Grid/list view ke liye halka version (?view=compact)
+class ProjectListSerializer(ProjectSerializer):
+    class Meta(ProjectSerializer.Meta):
+        fields = ['id', 'title', 'image', 'image_variants', 'category_names']
+
 # 5. User Serializers
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,248 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .cache import invalidate_categories, invalidate_projects
+from .changes import record_changes
+from .jobs import enqueue
+from . import metrics, querycheck
+from .models import Category, Feedback, Project, ProjectImage, User
+from .search import install_sqlite_fts
+from .snapshots import drop_snapshots
+
+# Admin panel aur API dono yahin se cache invalidate karte hain, kyunki
+# har ORM write (save/delete/categories.set) ye signals bhejta hai.
+# Snapshot drop, delta-sync log aur jobs write ke transaction ke andar hi
+# likhe jaate hain (sab ek saath commit ya rollback). Sirf cache invalidation
+# on_commit chalti hai, taaki koi reader commit se pehle ka data naye cache
+# version mein na daal de.
+
+_batch = threading.local()
+_commit = threading.local()
+
+
+def _record(project_ids, related_ids=(), image_ids=()):
+    # Request mein sirf wahi jo agla read maangta hai: purana snapshot hatao
+    # (job naya banayega), delta-sync log, jobs. Snapshot render aur related
+    # lists ka refresh job queue mein (main/jobs.py).
+    # savepoint=False: caller ke transaction mein hi, bina extra SAVEPOINT queries
+    with transaction.atomic(savepoint=False):
+        drop_snapshots(*project_ids)
+        live = set(Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True))
+        enqueue({'snapshots.rebuild': live, 'related.refresh': related_ids})
+        # Jo project ab nahi mila uska tombstone. Log sabse aakhir mein: Postgres
+        # par iska lock commit tak rehta hai (main/changes.py)
+        record_changes(project_ids, live, image_ids)
+    _invalidate_on_commit(project_ids)
+
+
+class _CommitInvalidation:
+    """Project ids changed in the current transaction, invalidated once on commit."""
+
+    def __init__(self):
+        self.project_ids = set()
+
+    def __call__(self):
+        if getattr(_commit, 'invalidation', None) is self:
+            _commit.invalidation = None
+        invalidate_projects(*self.project_ids)
+
+
+def _invalidate_on_commit(project_ids):
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        invalidate_projects(*project_ids)
+        return
+    # Ek transaction mein kai signals aate hain (save, categories.set, ...);
+    # sab ids ek hi on_commit callback mein jama karo. Rollback hone par
+    # Django callback hata deta hai, tab naya register hoga.
+    invalidation = getattr(_commit, 'invalidation', None)
+    if invalidation is None or not any(entry[1] is invalidation for entry in connection.run_on_commit):
+        invalidation = _commit.invalidation = _CommitInvalidation()
+        transaction.on_commit(invalidation)
+    invalidation.project_ids.update(project_ids)
+
+
+def touch_projects(*project_ids):
+    """Bump Project.updated_at when a child row changes, so ETags change too."""
+    if project_ids:
+        Project.objects.filter(pk__in=project_ids).update(updated_at=timezone.now())
+
+
+def refresh_feedback_stats(*project_ids):
+    """Recompute feedback_count / last_feedback_at for these projects in one UPDATE."""
+    per_project = Feedback.objects.filter(project=OuterRef('pk')).order_by().values('project')
+    Project.objects.filter(pk__in=project_ids).update(
+        feedback_count=Coalesce(Subquery(per_project.annotate(n=Count('id')).values('n')), 0),
+        last_feedback_at=Subquery(per_project.annotate(last=Max('date')).values('last')),
+        updated_at=timezone.now(),
+    )
+
+
+def _cascade_from_project(kwargs):
+    """True when a child row is being deleted because its Project is."""
+    origin = kwargs.get('origin')
+    return isinstance(origin, Project) or getattr(origin, 'model', None) is Project
+
+
+def projects_changed(*project_ids, touch=True, related=False, images=()):
+    """
+    Record that these projects' payloads changed (touch + cache invalidation).
+    related=True: their similarity inputs (categories, design_type,
+    interior_or_exterior, design_loc) or existence changed too, so the
+    related-projects lists are refreshed as well. images: ids of images
+    saved/deleted on their own, for the delta-sync log.
+    """
+    collected = getattr(_batch, 'project_ids', None)
+    if collected is not None:
+        collected.update(project_ids)
+        if related:
+            _batch.related_ids.update(project_ids)
+        _batch.image_ids.update(images)
+        return
+    if touch:
+        touch_projects(*project_ids)
+    _record(project_ids, project_ids if related else (), images)
+
+
+@contextmanager
+def batch_project_changes():
+    """
+    Used by the batch endpoints (inside their atomic block): receivers only
+    collect project ids, then a single UPDATE + log/jobs write runs for all
+    of them at the end of the block, instead of one per deleted/changed row.
+    """
+    if getattr(_batch, 'project_ids', None) is not None:
+        yield
+        return
+    _batch.project_ids = set()
+    _batch.related_ids = set()
+    _batch.image_ids = set()
+    _batch.feedback_project_ids = set()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        project_ids, _batch.project_ids = _batch.project_ids, None
+        related_ids, _batch.related_ids = _batch.related_ids, None
+        image_ids, _batch.image_ids = _batch.image_ids, None
+        feedback_project_ids, _batch.feedback_project_ids = _batch.feedback_project_ids, None
+        # Error ke baad transaction rollback hoga; bina transaction ke jo likha gaya woh record karo
+        if not (failed and transaction.get_connection().in_atomic_block):
+            if feedback_project_ids:
+                refresh_feedback_stats(*feedback_project_ids)
+            if project_ids:
+                touch_projects(*project_ids)
+                _record(project_ids, related_ids, image_ids)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, instance, **kwargs):
+    # save() ne updated_at already set kar diya hai
+    projects_changed(instance.pk, touch=False, related=True)
+
+
+@receiver([post_save, post_delete], sender=ProjectImage)
+def project_image_changed(sender, instance, **kwargs):
+    if not _cascade_from_project(kwargs):
+        projects_changed(instance.project_id, images=(instance.pk,))
+
+
+@receiver(post_save, sender=Feedback)
+def feedback_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    # Single UPDATE with F(): concurrent posts can't lose an increment
+    Project.objects.filter(pk=instance.project_id).update(
+        feedback_count=F('feedback_count') + 1,
+        last_feedback_at=instance.date,
+        updated_at=timezone.now(),
+    )
+    projects_changed(instance.project_id, touch=False)
+
+
+@receiver(post_delete, sender=Feedback)
+def feedback_deleted(sender, instance, **kwargs):
+    if _cascade_from_project(kwargs):
+        return
+    collected = getattr(_batch, 'feedback_project_ids', None)
+    if collected is not None:
+        collected.add(instance.project_id)
+        projects_changed(instance.project_id, touch=False)
+        return
+    refresh_feedback_stats(instance.project_id)
+    projects_changed(instance.project_id, touch=False)
+
+
+@receiver(m2m_changed, sender=Project.categories.through)
+def project_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # category.project_set.clear(): post_clear ka pk_set None hota hai, isliye projects abhi note karo
+        instance._cleared_project_ids = list(instance.project_set.values_list('pk', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # category.project_set.add(...): instance is a Category, pk_set are projects
+        if action == 'post_clear':
+            pk_set = instance.__dict__.pop('_cleared_project_ids', ())
+        projects_changed(*(pk_set or ()), related=True)
+    else:
+        projects_changed(instance.pk, related=True)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_categories)
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleting(sender, instance, **kwargs):
+    # Cascade se through rows hatenge (m2m_changed nahi aata), isliye pehle touch karo
+    projects_changed(*instance.project_set.values_list('pk', flat=True), related=True)
+
+
+@receiver(post_save, sender=Category)
+def category_renamed(sender, instance, created, **kwargs):
+    if not created:
+        projects_changed(*instance.project_set.values_list('pk', flat=True))
+
+
+# ------------------ AUTH TOKEN CACHE ------------------
+# Password reset, role/staff change, deactivation: har User save par cached
+# tokens hata do. Token delete (logout/rotate) par bhi.
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.user_id)
+
+
+# ------------------ METRICS ------------------
+@receiver(connection_created)
+def track_sql(sender, connection, **kwargs):
+    metrics.install_sql_wrapper(connection)
+    querycheck.install_sql_wrapper(connection)
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, using, **kwargs):
+    # SQLite table rebuilds (AlterField/AddField) drop the FTS triggers
+    if sender.name == 'main':
+        install_sqlite_fts(connections[using])
@@ -0,0 +1,108 @@
+import json
+
+from asgiref.sync import sync_to_async
+
+from .models import Project, ProjectSnapshot
+from .renderers import dumps
+from .serializers import ProjectSerializer
+
+
+def encode_document(data):
+    # Same encoder as the API renderer, so snapshot output matches the
+    # serializer-rendered responses byte for byte
+    return dumps(data).decode()
+
+
+# ------------------ WRITE SIDE ------------------
+def render_payload(project):
+    """Serialize one project (images/categories should be prefetched)."""
+    return encode_document(ProjectSerializer(project).data)
+
+
+def render_snapshots(*project_ids):
+    """{id: payload} rendered from the current rows, nothing stored; deleted ids are left out."""
+    if not project_ids:
+        return {}
+    projects = Project.objects.filter(pk__in=project_ids).prefetch_related('images', 'categories')
+    return {p.pk: render_payload(p) for p in projects}
+
+
+def rebuild_snapshots(*project_ids):
+    """Re-render and upsert snapshots (jobs and commands only); ids of deleted projects are ignored."""
+    if not project_ids:
+        return {}
+    snapshots = [ProjectSnapshot(project_id=pk, payload=payload) for pk, payload in render_snapshots(*project_ids).items()]
+    ProjectSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['project'],
+        update_fields=['payload', 'updated_at'],
+    )
+    return {s.project_id: s.payload for s in snapshots}
+
+
+def drop_snapshots(*project_ids):
+    """Delete stale snapshots; readers render a missing one on the fly until the job stores it."""
+    if project_ids:
+        ProjectSnapshot.objects.filter(project_id__in=project_ids).delete()
+
+
+# ------------------ READ SIDE ------------------
+def snapshot_queryset():
+    """Projects joined to their snapshot; only the id and payload are loaded."""
+    return Project.objects.select_related('snapshot').only('id', 'snapshot__payload')
+
+
+def _stored(project):
+    try:
+        return project.snapshot.payload
+    except ProjectSnapshot.DoesNotExist:
+        return None
+
+
+# A missing snapshot (dropped by a write, its job not run yet) is rendered
+# but never stored here: a GET may run on a replica, or see the rows from
+# just before a commit, and the snapshots.rebuild job stores it anyway.
+def documents_for(projects):
+    """Payloads for rows of snapshot_queryset(), rendering any that are missing."""
+    docs = {p.pk: _stored(p) for p in projects}
+    missing = [pk for pk, doc in docs.items() if doc is None]
+    if missing:
+        docs.update(render_snapshots(*missing))
+    return [docs[p.pk] for p in projects]
+
+
+async def adocuments_for(projects):
+    docs = {p.pk: _stored(p) for p in projects}
+    missing = [pk for pk, doc in docs.items() if doc is None]
+    if missing:
+        docs.update(await sync_to_async(render_snapshots)(*missing))
+    return [docs[p.pk] for p in projects]
+
+
+def project_document(project_id):
+    """Payload for one project, or None if it does not exist."""
+    doc = ProjectSnapshot.objects.filter(project_id=project_id).values_list('payload', flat=True).first()
+    if doc is None:
+        doc = render_snapshots(project_id).get(project_id)
+    return doc
+
+
+async def aproject_document(project_id):
+    doc = await ProjectSnapshot.objects.filter(project_id=project_id).values_list('payload', flat=True).afirst()
+    if doc is None:
+        doc = (await sync_to_async(render_snapshots)(project_id)).get(project_id)
+    return doc
+
+
+def render_list(docs):
+    return '[' + ','.join(docs) + ']'
+
+
+def render_page(docs, next_cursor):
+    """Same shape as pagination.page_payload(), assembled from stored JSON."""
+    return (
+        '{"results":' + render_list(docs)
+        + ',"next_cursor":' + json.dumps(next_cursor)
+        + ',"has_more":' + ('true' if next_cursor else 'false') + '}'
+    )
@@ -1,3 +1,1381 @@
-from django.test import TestCase
+import glob
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.handlers.asgi import ASGIHandler
+from django.db import OperationalError, connection, connections
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import token_cache
+from .cache import drop_response_cache, get_or_build
+from . import async_views, dbrouting, jobs, metrics, queryplans, related, views
+from .models import Category, ChangeLogEntry, Feedback, Job, Project, ProjectImage, ProjectSnapshot, RelatedProject, User
+from .pagination import encode_cursor
+from .images import original_url, srcset, storage_value, variant_urls
+from .middleware import StaticFilesMiddleware
+from .querycheck import NPlusOneError, inspect_queries
+from .related import load_profiles, rebuild_related, refresh_related, top_matches
+from .renderers import FastJSONRenderer, dumps
+from .snapshots import rebuild_snapshots
+from .views import categories_validators
+
+
+def make_catalog(count=30, images=2):
+    """Small catalog with images, categories and feedback, snapshots and related lists built."""
+    categories = [Category.objects.create(name=name) for name in ('Kitchen', 'Bedroom', 'Facade')]
+    projects = []
+    for n in range(count):
+        project = Project.objects.create(
+            title=f'Modern design {n}', description='test row', design_loc='Pune' if n % 2 else 'Delhi',
+            design_type='3D' if n % 3 else '2D', interior_or_exterior='Interior' if n % 4 else 'Exterior',
+        )
+        project.categories.set(categories[:1 + n % 3])
+        ProjectImage.objects.bulk_create(
+            [ProjectImage(project=project, image=f'https://example.com/t/{project.pk}_{i}.jpg') for i in range(images)]
+        )
+        projects.append(project)
+    ids = [p.pk for p in projects]
+    rebuild_snapshots(*ids)
+    rebuild_related()
+    return projects, categories
+
+
+# ------------------ QUERY BUDGETS ------------------
+@override_settings(API_THROTTLES={**settings.API_THROTTLES, 'RATES': {}})
+class QueryBudgetTests(TestCase):
+    """
+    Exact SQL counts per endpoint, on a cold response cache (warm-cache
+    reads are checked separately). A new query here is usually an N+1.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects, cls.categories = make_catalog()
+        cls.project = cls.projects[-1]
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw-12345678', is_staff=True)
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pw-12345678')
+        Feedback.objects.bulk_create([Feedback(project=cls.project, user=cls.user, message=f'm{n}') for n in range(25)])
+        cls.admin_token = Token.objects.create(user=cls.admin).key
+        cls.user_token = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+
+    def auth(self, token=None):
+        return {'HTTP_AUTHORIZATION': f'Token {token or self.admin_token}'}
+
+    def post_json(self, path, data, method='post', token=None):
+        return getattr(self.client, method)(path, dumps(data), content_type='application/json', **self.auth(token))
+
+    # Write counts include the token lookup (cold in-process token cache)
+    def assertQueries(self, count, request):
+        with self.assertNumQueries(count):
+            response = request()
+        self.assertLess(response.status_code, 400, getattr(response, 'content', b'')[:300])
+        return response
+
+    # Reads
+    def test_project_list(self):
+        self.assertQueries(2, lambda: self.client.get('/api/projects/?page_size=10'))
+
+    def test_project_list_does_not_grow_with_page_size(self):
+        self.assertQueries(2, lambda: self.client.get('/api/projects/?page_size=30'))
+
+    def test_project_list_unpaginated(self):
+        self.assertQueries(2, lambda: self.client.get('/api/projects/'))
+
+    def test_project_list_compact(self):
+        self.assertQueries(3, lambda: self.client.get('/api/projects/?view=compact&page_size=30'))
+
+    def test_project_list_warm_cache(self):
+        self.client.get('/api/projects/?page_size=10')
+        # Only the ETag validator
+        self.assertQueries(1, lambda: self.client.get('/api/projects/?page_size=10'))
+
+    def test_search(self):
+        self.assertQueries(2, lambda: self.client.get('/api/projects/search/?q=modern&page_size=10'))
+
+    def test_facets(self):
+        self.assertQueries(2, lambda: self.client.get('/api/projects/facets/'))
+
+    def test_export(self):
+        def request():
+            response = self.client.get('/api/projects/export/?format=ndjson')
+            b''.join(response.streaming_content)
+            return response
+        self.assertQueries(2, request)
+
+    def test_project_detail(self):
+        self.assertQueries(2, lambda: self.client.get(f'/api/projects/{self.project.pk}/'))
+
+    def test_related(self):
+        self.assertQueries(2, lambda: self.client.get(f'/api/projects/{self.project.pk}/related/'))
+
+    def test_categories(self):
+        self.assertQueries(1, lambda: self.client.get('/api/categories/'))
+
+    def test_feedback_list(self):
+        self.assertQueries(3, lambda: self.client.get(f'/api/projects/{self.project.pk}/feedback/?page_size=20'))
+
+    def test_changes(self):
+        cursor = self.client.get('/api/projects/changes/').json()['cursor']
+        self.projects[0].save()
+        # Log page, snapshot join, then the dropped snapshot rendered (3); reads never store it
+        self.assertQueries(5, lambda: self.client.get(f'/api/projects/changes/?since={cursor}'))
+        self.assertFalse(ProjectSnapshot.objects.filter(project=self.projects[0]).exists())
+
+    # Writes
+    def test_add_feedback(self):
+        self.assertQueries(10, lambda: self.post_json(
+            f'/api/projects/{self.project.pk}/feedback/', {'message': 'hello'}, token=self.user_token,
+        ))
+
+    def test_add_project(self):
+        self.assertQueries(13, lambda: self.post_json('/api/projects/add/', {
+            'title': 'New', 'description': 'd', 'design_type': '3D', 'interior_or_exterior': 'Interior',
+            'categories': [c.pk for c in self.categories],
+            'image_urls': [f'https://example.com/new/{n}.jpg' for n in range(4)],
+        }))
+
+    def test_update_project(self):
+        self.assertQueries(12, lambda: self.post_json(f'/api/projects/{self.project.pk}/update/', {
+            'title': 'Renamed', 'categories': [self.categories[0].pk],
+        }, method='patch'))
+
+    def test_delete_project(self):
+        self.assertQueries(14, lambda: self.client.delete(f'/api/projects/{self.project.pk}/delete/', **self.auth()))
+
+    def test_batch_update(self):
+        ids = [p.pk for p in self.projects[:10]]
+        self.assertQueries(12, lambda: self.post_json('/api/projects/batch/update/', {
+            'ids': ids, 'changes': {'design_type': '2D'}, 'add_categories': [self.categories[2].pk],
+        }))
+
+    def test_batch_delete(self):
+        ids = [p.pk for p in self.projects[:10]]
+        self.assertQueries(16, lambda: self.post_json('/api/projects/batch/delete/', {'ids': ids}))
+
+    def test_batch_delete_images(self):
+        ids = list(ProjectImage.objects.values_list('pk', flat=True)[:10])
+        self.assertQueries(11, lambda: self.post_json('/api/images/batch/delete/', {'ids': ids}))
+
+    def test_batch_delete_feedbacks(self):
+        ids = list(Feedback.objects.values_list('pk', flat=True)[:10])
+        self.assertQueries(11, lambda: self.post_json('/api/feedbacks/batch/delete/', {'ids': ids}))
+
+    def test_delete_image(self):
+        pk = ProjectImage.objects.values_list('pk', flat=True).first()
+        self.assertQueries(9, lambda: self.client.delete(f'/api/images/{pk}/delete/', **self.auth()))
+
+    def test_delete_feedback(self):
+        pk = Feedback.objects.values_list('pk', flat=True).first()
+        self.assertQueries(8, lambda: self.client.delete(f'/api/feedbacks/{pk}/delete/', **self.auth()))
+
+    def test_import(self):
+        rows = ['title,description,design_type,interior_or_exterior,image_urls']
+        rows += [f'Imported {n},d,2D,Interior,https://example.com/i/{n}.jpg' for n in range(10)]
+        upload = SimpleUploadedFile('rows.csv', '\n'.join(rows).encode())
+        self.assertQueries(10, lambda: self.client.post('/api/projects/import/', {'file': upload}, **self.auth()))
+
+
+# ------------------ CURSORS ------------------
+class CursorTests(TestCase):
+    """Tampered cursors are a 400 on every keyset-paginated endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects, _ = make_catalog(count=5, images=1)
+        cls.project = cls.projects[0]
+        user = User.objects.create_user('reader', 'reader@example.com', 'pw-12345678')
+        Feedback.objects.bulk_create([Feedback(project=cls.project, user=user, message=f'm{n}') for n in range(5)])
+
+    def setUp(self):
+        cache.clear()
+
+    def paths(self):
+        return ['/api/projects/', '/api/projects/search/?q=modern', f'/api/projects/{self.project.pk}/feedback/']
+
+    def test_issued_cursor_pages_on(self):
+        for path in self.paths():
+            first = self.client.get(path, {'page_size': 2}).json()
+            second = self.client.get(path, {'page_size': 2, 'cursor': first['next_cursor']})
+            self.assertEqual(second.status_code, 200, path)
+            self.assertEqual(len(second.json()['results']), 2, path)
+
+    def test_tampered_cursor_is_rejected(self):
+        tampered = [['a'], ['a', 'b'], [1, 2, 3], [None, None], [[1], 2], [10 ** 30, 1], {'id': 1}]
+        for path in self.paths():
+            for values in tampered:
+                response = self.client.get(path, {'page_size': 2, 'cursor': encode_cursor(values)})
+                self.assertEqual(response.status_code, 400, (path, values))
+            self.assertEqual(self.client.get(path, {'cursor': '%%%'}).status_code, 400, path)
+
+
+# ------------------ BATCH VALIDATION ------------------
+class BatchUpdateValidationTests(TestCase):
+    """Bad batch updates are a 400 and change nothing, never a database error."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(title='P', description='d', design_type='3D', interior_or_exterior='Interior')
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw-12345678', is_staff=True)
+        cls.token = Token.objects.create(user=cls.admin).key
+
+    def batch_update(self, data):
+        return self.client.post('/api/projects/batch/update/', dumps(data), content_type='application/json',
+                                HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def assertRejected(self, data, message):
+        response = self.batch_update(data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(message, response.json()['error'])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.title, 'P')
+
+    def test_null_in_items(self):
+        self.assertRejected({'items': [{'id': self.project.pk, 'title': None}]}, 'title')
+
+    def test_null_in_changes(self):
+        self.assertRejected({'ids': [self.project.pk], 'changes': {'title': None}}, 'title')
+
+    def test_too_long_and_bad_choice(self):
+        self.assertRejected({'ids': [self.project.pk], 'changes': {'title': 'x' * 201}}, 'title')
+        self.assertRejected({'items': [{'id': self.project.pk, 'title': 'ok'}, {'id': self.project.pk, 'design_type': '4D'}]},
+                            'design_type')
+
+    def test_unknown_category(self):
+        self.assertRejected({'ids': [self.project.pk], 'changes': {'title': 'New'}, 'add_categories': [99999]}, '99999')
+
+    @override_settings(API_BATCH_MAX_ITEMS=2)
+    def test_items_respect_batch_limit(self):
+        self.assertRejected({'items': [{'id': self.project.pk, 'title': 'x'}] * 3}, 'At most 2 items')
+        self.assertRejected({'items': {'id': self.project.pk, 'title': 'x'}}, 'items must be a non-empty list')
+
+    def test_batch_delete_counts_only_requested_rows(self):
+        ProjectImage.objects.create(project=self.project, image='a.jpg')
+        Feedback.objects.create(project=self.project, user=self.admin, message='m')
+        response = self.client.post('/api/projects/batch/delete/', dumps({'ids': [self.project.pk, 99999]}),
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.assertEqual(response.json()['deleted'], 1)
+
+    def test_valid_update_still_applies(self):
+        category = Category.objects.create(name='Kitchen')
+        response = self.batch_update({'ids': [self.project.pk], 'changes': {'title': 'New'}, 'add_categories': [category.pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.project.categories.all()), [category])
+
+
+# ------------------ IMPORT ------------------
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw-12345678', is_staff=True)
+        cls.token = Token.objects.create(user=admin).key
+
+    def upload(self, name, content):
+        return self.client.post('/api/projects/import/', {'file': SimpleUploadedFile(name, content)},
+                                HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_undecodable_csv_line_is_a_row_error(self):
+        rows = ['title,description,design_type,interior_or_exterior', 'Villa,d,2D,Interior',
+                'Caf\xe9 front,d,3D,Exterior', 'Flat,d,3D,Interior']
+        response = self.upload('rows.csv', '\n'.join(rows).encode('latin-1'))
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (2, 1))
+        self.assertEqual(report['errors'][0]['row'], 3)
+        self.assertIn('UTF-8', report['errors'][0]['error'])
+
+    def test_bad_ndjson_values_fail_only_their_row(self):
+        good = {'title': 'Villa', 'description': 'd', 'design_type': '3D', 'interior_or_exterior': 'Interior',
+                'contact_number': 9876543210}
+        rows = [
+            good,
+            {**good, 'title': 123},
+            {**good, 'design_type': ['3D']},
+            {**good, 'description': {'text': 'x'}},
+            {**good, 'title': 'x' * 201},
+            {**good, 'plot_size': 'x' * 51},
+            {**good, 'image_urls': ['https://example.com/' + 'x' * 500]},
+            {**good, 'categories': [{'id': 1}]},
+        ]
+        response = self.upload('rows.ndjson', '\n'.join(json.dumps(row) for row in rows).encode())
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (2, 6))
+        self.assertEqual([e['row'] for e in report['errors']], list(range(3, 9)))
+        # Numbers are fine (phone numbers, plot sizes); nothing is truncated
+        self.assertEqual(sorted(Project.objects.values_list('title', flat=True)), ['123', 'Villa'])
+        self.assertEqual(set(Project.objects.values_list('contact_number', flat=True)), {'9876543210'})
+
+    def test_undecodable_file_is_a_400(self):
+        response = self.upload('rows.ndjson', '{"title": "Caf\xe9"}\n'.encode('latin-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['failed'], 1)
+
+
+# ------------------ TOKEN CACHE ------------------
+class TokenCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pw-12345678')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        token_cache.clear()
+
+    def test_off_on_a_per_process_cache(self):
+        # Tests run on locmem: a revoke in one worker would not reach the others
+        token_cache.set(self.token.key, self.user, self.token)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    @override_settings(AUTH_TOKEN_CACHE={**settings.AUTH_TOKEN_CACHE, 'ENABLED': True})
+    def test_hits_are_copies(self):
+        token_cache.set(self.token.key, self.user, self.token)
+        user, token = token_cache.get(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertIs(token.user, user)
+        user.first_name = 'changed by a view'
+        self.assertEqual(token_cache.get(self.token.key)[0].first_name, '')
+
+    @override_settings(AUTH_TOKEN_CACHE={**settings.AUTH_TOKEN_CACHE, 'ENABLED': True})
+    def test_invalidated_on_user_change(self):
+        token_cache.set(self.token.key, self.user, self.token)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+
+
+# ------------------ METRICS ------------------
+class MultiprocessMetricsTests(TestCase):
+    """Worker files in METRICS['MULTIPROC_DIR'] and their archive when a worker exits."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(METRICS={**settings.METRICS, 'MULTIPROC_DIR': self.directory})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def worker_file(self, pid, requests, token_hits=0, token_size=0):
+        entry = metrics._new_entry()
+        entry[0] = requests
+        metrics._write(self.directory, f'{pid}.json', {
+            'requests': {('multiproc-test', 'GET', '200'): entry},
+            'token_cache': {'hits': token_hits, 'size': token_size},
+        })
+
+    def requests(self):
+        return sum(entry[0] for key, entry in metrics.collect()['requests'].items() if key[0] == 'multiproc-test')
+
+    def test_dead_workers_fold_into_the_archive(self):
+        self.worker_file(101, 5)
+        self.worker_file(102, 7)
+        self.assertEqual(self.requests(), 12)
+
+        metrics.mark_process_dead(101, self.directory)
+        self.assertEqual(self.requests(), 12)
+        # A new worker reusing the pid starts from zero
+        self.worker_file(101, 1)
+        metrics.mark_process_dead(102, self.directory)
+        self.assertEqual(self.requests(), 13)
+        files = sorted(os.path.basename(p) for p in glob.glob(os.path.join(self.directory, '*.json')))
+        self.assertEqual(files, ['101.json', f'{os.getpid()}.json', metrics.ARCHIVE])
+
+    def test_token_cache_counters_are_summed_and_archived(self):
+        token_cache.clear()
+        self.worker_file(101, 1, token_hits=3, token_size=2)
+        self.worker_file(102, 1, token_hits=4, token_size=5)
+        metrics.mark_process_dead(101, self.directory)
+        own = token_cache.stats()
+        stats = metrics.collect()['token_cache']
+        # Hits of the exited worker stay; its cached tokens are gone with it
+        self.assertEqual((stats['hits'], stats['size']), (7 + own['hits'], 5 + own['size']))
+        text = metrics.render(metrics.collect())
+        self.assertIn(f'auth_token_cache_lookups_total{{result="hit"}} {7 + own["hits"]}', text)
+
+    def test_unknown_pid_is_ignored(self):
+        metrics.mark_process_dead(999999, self.directory)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, metrics.ARCHIVE)))
+
+
+# ------------------ SINGLE-FLIGHT CACHE ------------------
+class GetOrBuildTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def in_threads(self, *calls):
+        threads = [threading.Thread(target=call) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_misses_build_once(self):
+        builds, results = [], []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return 'payload'
+
+        self.in_threads(*[lambda: results.append(get_or_build('sf:key', build))] * 6)
+        self.assertEqual((len(builds), results), (1, ['payload'] * 6))
+
+    def test_slow_build_does_not_block_its_stripe(self):
+        # Two keys on the same striped lock
+        other = next(f'sf:other:{n}' for n in range(10000) if hash(f'sf:other:{n}') % 64 == hash('sf:slow') % 64)
+        release = threading.Event()
+        finished = []
+
+        def slow():
+            # Released by the other key's request, which must not queue behind this build
+            return 'slow' if release.wait(2) else 'blocked'
+
+        def fast():
+            get_or_build(other, lambda: 'fast')
+            finished.append(other)
+            release.set()
+
+        self.in_threads(lambda: get_or_build('sf:slow', slow), fast)
+        self.assertEqual(finished, [other])
+        self.assertEqual(cache.get('sf:slow'), 'slow')
+
+
+# ------------------ RELATED PROJECTS ------------------
+class RefreshRelatedTests(TestCase):
+    """An incremental refresh leaves every list as a full rebuild would."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects, cls.categories = make_catalog(count=40, images=0)
+
+    def assertMatchesRebuild(self):
+        profiles = load_profiles()
+        expected = {pk: sorted((round(v, 6), r) for v, r in top_matches(pk, profiles)) for pk in profiles}
+        stored = defaultdict(list)
+        for project_id, related_id, value in RelatedProject.objects.values_list('project_id', 'related_id', 'score'):
+            stored[project_id].append((value, related_id))
+        self.assertEqual({pk: sorted(stored[pk]) for pk in profiles}, expected)
+
+    def test_changes_match_a_rebuild(self):
+        rng = random.Random(7)
+        projects = list(self.projects)
+        for _ in range(6):
+            changed = set()
+            for project in rng.sample(projects, 4):
+                project.design_type = rng.choice(['2D', '3D'])
+                project.design_loc = rng.choice(['Pune', 'Delhi', 'Goa', None])
+                project.save()
+                project.categories.set(rng.sample(self.categories, rng.randint(0, 3)))
+                changed.add(project.pk)
+            gone = projects.pop(rng.randrange(len(projects)))
+            changed.add(gone.pk)
+            gone.delete()
+            new = Project.objects.create(title='New', description='d', design_type='2D',
+                                         interior_or_exterior=rng.choice(['Interior', 'Exterior']), design_loc='Goa')
+            new.categories.set(rng.sample(self.categories, 2))
+            projects.append(new)
+            changed.add(new.pk)
+            refresh_related(*changed)
+            self.assertMatchesRebuild()
+
+    def test_does_not_load_the_catalog(self):
+        project = self.projects[0]
+        project.design_loc = 'Goa'
+        project.save()
+        with mock.patch('main.related.load_profiles', wraps=related.load_profiles) as load:
+            refresh_related(project.pk)
+        self.assertNotIn(mock.call(), load.call_args_list)
+
+
+# ------------------ SIGNALS ------------------
+class CategorySignalTests(TestCase):
+    def test_reverse_clear_records_the_projects(self):
+        projects, categories = make_catalog(count=4, images=0)
+        kitchen = categories[0]
+        ChangeLogEntry.objects.all().delete()
+        Job.objects.all().delete()
+        kitchen.project_set.clear()
+        changed = set(ChangeLogEntry.objects.filter(kind='project').values_list('object_id', flat=True))
+        self.assertEqual(changed, {p.pk for p in projects})
+        self.assertTrue(Job.objects.filter(task='related.refresh').exists())
+
+
+# ------------------ SEARCH ------------------
+class SearchTests(TestCase):
+    """/api/projects/search/: full-text match, rank order and the catalog filters combined."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kitchen = Category.objects.create(name='Kitchen')
+        cls.facade = Category.objects.create(name='Facade')
+
+        def add(title, description, design_type='3D', placement='Interior', loc=None, categories=()):
+            project = Project.objects.create(title=title, description=description, design_type=design_type,
+                                             interior_or_exterior=placement, design_loc=loc)
+            project.categories.set(categories)
+            return project
+
+        cls.title_hit = add('Marble marble kitchen', 'white', categories=[cls.kitchen])
+        cls.description_hit = add('Open plan', 'A long description of a large open plan home, with one marble '
+                                  'counter among many other finishes and materials', categories=[cls.kitchen])
+        cls.exterior_hit = add('Marble facade', 'stone', design_type='2D', placement='Exterior', categories=[cls.facade])
+        cls.location_hit = add('Villa', 'plain', loc='Marblehead')
+        cls.miss = add('Wooden deck', 'teak', categories=[cls.kitchen])
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        response = self.client.get('/api/projects/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [doc['id'] for doc in response.json()['results']]
+
+    def test_ranked_by_relevance(self):
+        ids = self.search(q='marble')
+        self.assertEqual(set(ids), {self.title_hit.pk, self.description_hit.pk, self.exterior_hit.pk, self.location_hit.pk})
+        # Two title hits in a short row beat one word in a long description
+        self.assertLess(ids.index(self.title_hit.pk), ids.index(self.description_hit.pk))
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search(q='marble kitchen'), [self.title_hit.pk])
+
+    def test_filters_combine_with_the_query(self):
+        self.assertEqual(set(self.search(q='marble', categories=self.kitchen.pk)),
+                         {self.title_hit.pk, self.description_hit.pk})
+        self.assertEqual(self.search(q='marble', design_type='2D'), [self.exterior_hit.pk])
+        self.assertEqual(self.search(q='marble', categories=self.kitchen.pk, interior_or_exterior='Exterior'), [])
+        # Any-of within one filter, all-of across filters
+        self.assertEqual(set(self.search(categories=f'{self.kitchen.pk},{self.facade.pk}', design_type='3D')),
+                         {self.title_hit.pk, self.description_hit.pk, self.miss.pk})
+
+    def test_no_query_lists_newest_first(self):
+        self.assertEqual(self.search(), sorted(Project.objects.values_list('id', flat=True), reverse=True))
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self.search(q='marble*" ^('), self.search(q='marble'))
+        self.assertEqual(self.search(q='!!!'), [])
+
+    def test_pages_follow_the_rank(self):
+        ranked = self.search(q='marble', page_size=10)
+        walked, cursor = [], None
+        while True:
+            params = {'q': 'marble', 'page_size': 1, **({'cursor': cursor} if cursor else {})}
+            page = self.client.get('/api/projects/search/', params).json()
+            walked += [doc['id'] for doc in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(walked, ranked)
+
+
+# ------------------ FEEDBACK COUNTERS ------------------
+@override_settings(API_THROTTLES={**settings.API_THROTTLES, 'RATES': {}})
+class FeedbackCounterTests(TestCase):
+    """Project.feedback_count / last_feedback_at follow every create and delete path."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(title='P', description='d', design_type='3D', interior_or_exterior='Interior')
+        cls.other = Project.objects.create(title='O', description='d', design_type='3D', interior_or_exterior='Interior')
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw-12345678', is_staff=True)
+        cls.token = Token.objects.create(user=cls.admin).key
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, path, data=None, method='post'):
+        return getattr(self.client, method)(path, dumps(data or {}), content_type='application/json',
+                                            HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def counters(self, project=None):
+        project = project or self.project
+        project.refresh_from_db()
+        return project.feedback_count, project.last_feedback_at
+
+    def add(self, message):
+        response = self.post(f'/api/projects/{self.project.pk}/feedback/', {'message': message})
+        self.assertEqual(response.status_code, 201)
+        return Feedback.objects.get(message=message)
+
+    def test_create_counts_up(self):
+        first = self.add('one')
+        self.assertEqual(self.counters(), (1, first.date))
+        second = self.add('two')
+        self.assertEqual(self.counters(), (2, second.date))
+        self.assertEqual(self.counters(self.other), (0, None))
+
+    def test_delete_recomputes_count_and_latest(self):
+        first, second = self.add('one'), self.add('two')
+        self.assertEqual(self.post(f'/api/feedbacks/{second.pk}/delete/', method='delete').status_code, 200)
+        self.assertEqual(self.counters(), (1, first.date))
+        first.delete()
+        self.assertEqual(self.counters(), (0, None))
+
+    def test_batch_delete(self):
+        feedbacks = [self.add(f'm{n}') for n in range(3)]
+        response = self.post('/api/feedbacks/batch/delete/', {'ids': [f.pk for f in feedbacks[1:]]})
+        self.assertEqual(response.json()['deleted'], 2)
+        self.assertEqual(self.counters(), (1, feedbacks[0].date))
+
+    def test_project_payload_shows_the_counters(self):
+        self.add('one')
+        doc = self.client.get(f'/api/projects/{self.project.pk}/').json()
+        self.assertEqual(doc['feedback_count'], 1)
+        self.assertIsNotNone(doc['last_feedback_at'])
+
+
+# ------------------ EXPORT ------------------
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    """/api/projects/export/: streamed JSON array or NDJSON, one stored snapshot per project."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects, _ = make_catalog(count=5, images=1)
+        # One snapshot missing: rendered for the export like on any read
+        ProjectSnapshot.objects.filter(project=cls.projects[2]).delete()
+
+    def setUp(self):
+        cache.clear()
+
+    def export(self, **params):
+        response = self.client.get('/api/projects/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        return response, chunks, b''.join(chunks).decode()
+
+    def detail(self, project):
+        return self.client.get(f'/api/projects/{project.pk}/').json()
+
+    def test_json_array(self):
+        response, chunks, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertFalse(response.has_header('Content-Disposition'))
+        docs = json.loads(body)
+        self.assertEqual([doc['id'] for doc in docs], [p.pk for p in self.projects])
+        self.assertEqual(docs[2], self.detail(self.projects[2]))
+        # Streamed one document at a time, not built up in memory
+        self.assertEqual(len(chunks), len(self.projects) + 2)
+
+    def test_ndjson_lines(self):
+        response, chunks, body = self.export(format='ndjson', download=1)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="projects.ndjson"')
+        self.assertTrue(body.endswith('\n'))
+        docs = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([doc['id'] for doc in docs], [p.pk for p in self.projects])
+        self.assertEqual(len(chunks), len(self.projects))
+
+    def test_empty_catalog(self):
+        Project.objects.all().delete()
+        self.assertEqual(self.export()[2], '[]')
+        self.assertEqual(self.export(format='ndjson')[2], '')
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/projects/export/', {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format must be one of', response.json()['error'])
+
+
+# ------------------ IMAGE VARIANTS ------------------
+@override_settings(CLOUDINARY_STORAGE={'CLOUD_NAME': 'demo', 'API_KEY': '', 'API_SECRET': ''},
+                   IMAGE_VARIANTS={'thumbnail': 320, 'full': 1600})
+class ImageVariantTests(TestCase):
+    UPLOAD = 'https://res.cloudinary.com/demo/image/upload/w_500,c_fill/v1712/projects/kitchen.jpg'
+
+    def url(self, width, rest='v1712/projects/kitchen.jpg', cloud='demo'):
+        return f'https://res.cloudinary.com/{cloud}/image/upload/c_limit,w_{width},q_auto,f_auto/{rest}'
+
+    def test_transformation_replaced_version_and_folders_kept(self):
+        self.assertEqual(variant_urls(self.UPLOAD + '?_a=1'), {'thumbnail': self.url(320), 'full': self.url(1600)})
+        self.assertEqual(srcset(self.UPLOAD), f'{self.url(320)} 320w, {self.url(1600)} 1600w')
+
+    def test_url_without_version(self):
+        upload = 'https://res.cloudinary.com/other/image/upload/projects/kitchen.jpg'
+        self.assertEqual(variant_urls(upload)['full'], self.url(1600, 'projects/kitchen.jpg', cloud='other'))
+
+    @override_settings(IMAGE_STORE_PUBLIC_ID=True)
+    def test_stored_public_id_round_trips(self):
+        stored = storage_value(self.UPLOAD)
+        self.assertEqual(stored, 'v1712/projects/kitchen.jpg')
+        self.assertEqual(variant_urls(stored), variant_urls(self.UPLOAD))
+        self.assertEqual(original_url('projects/kitchen.jpg'),
+                         'https://res.cloudinary.com/demo/image/upload/projects/kitchen.jpg')
+        # Another cloud's URL can't be rebuilt from a public_id: kept whole
+        other = self.UPLOAD.replace('/demo/', '/other/')
+        self.assertEqual(storage_value(other), other)
+
+    def test_external_and_empty_images(self):
+        external = 'https://example.com/photos/kitchen.jpg'
+        self.assertEqual(variant_urls(external), {'thumbnail': external, 'full': external})
+        self.assertEqual(srcset(external), '')
+        self.assertEqual(variant_urls(None), {})
+
+    def test_api_payload(self):
+        project = Project.objects.create(title='P', description='d', design_type='3D', interior_or_exterior='Interior',
+                                         image=self.UPLOAD)
+        ProjectImage.objects.create(project=project, image=self.UPLOAD)
+        cache.clear()
+        doc = self.client.get(f'/api/projects/{project.pk}/').json()
+        self.assertEqual(doc['image_variants']['thumbnail'], self.url(320))
+        self.assertEqual(doc['images'][0]['variants']['full'], self.url(1600))
+        self.assertEqual(doc['images'][0]['srcset'], srcset(self.UPLOAD))
+
+
+# ------------------ SPARSE FIELDSETS ------------------
+class SparseFieldsTests(TestCase):
+    """?fields= / ?exclude= / ?view= on the project read endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects, _ = make_catalog(count=3, images=2)
+        cls.project = cls.projects[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def paths(self):
+        # (path, params): the test client drops a query string in the path when params are given
+        return [('/api/projects/', {}), ('/api/projects/', {'page_size': 2}),
+                ('/api/projects/search/', {'q': 'modern'}), (f'/api/projects/{self.project.pk}/', {})]
+
+    def docs(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, path)
+        data = response.json()
+        if isinstance(data, dict) and 'results' in data:
+            return data['results']
+        return data if isinstance(data, list) else [data]
+
+    def test_fields_pick_columns_in_payload_order(self):
+        full = {doc['id']: doc for doc in self.docs('/api/projects/')}
+        for path, params in self.paths():
+            with self.subTest(path, **params):
+                docs = self.docs(path, **params, fields='title,id,category_names')
+                self.assertEqual([list(doc) for doc in docs], [['id', 'title', 'category_names']] * len(docs))
+                for doc in docs:
+                    self.assertEqual(doc['category_names'], full[doc['id']]['category_names'])
+
+    def test_exclude(self):
+        full = self.docs(f'/api/projects/{self.project.pk}/')[0]
+        doc = self.docs(f'/api/projects/{self.project.pk}/', exclude='description,images')[0]
+        self.assertEqual(list(doc), [name for name in full if name not in ('description', 'images')])
+        doc = self.docs(f'/api/projects/{self.project.pk}/', fields='id,title,images', exclude='images')[0]
+        self.assertEqual(list(doc), ['id', 'title'])
+
+    def test_compact_view(self):
+        doc = self.docs(f'/api/projects/{self.project.pk}/', view='compact')[0]
+        self.assertEqual(list(doc), ['id', 'title', 'image', 'image_variants', 'category_names'])
+        # fields= is not limited to the view's default set
+        doc = self.docs(f'/api/projects/{self.project.pk}/', view='compact', fields='id,feedback_count')[0]
+        self.assertEqual(list(doc), ['id', 'feedback_count'])
+
+    def test_invalid_names_are_a_400(self):
+        for path, base in self.paths():
+            for params, message in [({'fields': 'id,secret'}, 'Unknown fields: secret'),
+                                    ({'exclude': 'nope'}, 'Unknown fields: nope'),
+                                    ({'view': 'tiny'}, 'view must be one of')]:
+                with self.subTest(path, **base, **params):
+                    response = self.client.get(path, {**base, **params})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(message, response.json()['error'])
+
+
+# ------------------ RENDERERS ------------------
+class RendererTests(TestCase):
+    """Content negotiation and byte output of the orjson renderer/parser against DRF's own."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(name='Kitchen \u2028 line')
+        cls.project = Project.objects.create(title='P', description='d', design_type='3D', interior_or_exterior='Interior')
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pw-12345678')
+        cls.token = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        cache.clear()
+
+    def test_json_by_default_and_on_request(self):
+        for headers in ({}, {'HTTP_ACCEPT': 'application/json'}, {'HTTP_ACCEPT': '*/*'}):
+            response = self.client.get('/api/categories/', **headers)
+            self.assertEqual(response['Content-Type'], 'application/json', headers)
+            self.assertEqual(response.content, JSONRenderer().render(response.json()))
+
+    def test_browsable_api_and_unsupported_types(self):
+        response = self.client.get('/api/categories/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertEqual(self.client.get('/api/categories/', HTTP_ACCEPT='application/xml').status_code, 406)
+
+    def test_indent_parameter(self):
+        response = self.client.get('/api/categories/', HTTP_ACCEPT='application/json; indent=2')
+        self.assertEqual(response.content, JSONRenderer().render(response.json(), 'application/json; indent=2'))
+        self.assertIn(b'\n  ', response.content)
+
+    def test_stored_snapshot_responses_are_json(self):
+        for path in ('/api/projects/', '/api/projects/search/', '/api/projects/export/'):
+            response = self.client.get(path)
+            self.assertEqual(response['Content-Type'], 'application/json', path)
+
+    def test_same_bytes_as_drf(self):
+        data = {'when': timezone.now(), 'price': Decimal('12.50'), 'id': uuid.UUID(int=1),
+                'text': 'caf\u00e9 \u2028', 'nested': [1, 2.5, None, True]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_bad_json_body_is_a_400(self):
+        response = self.client.post(f'/api/projects/{self.project.pk}/feedback/', b'{"message": ',
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+
+# ------------------ DELTA SYNC ------------------
+class DeltaSyncTests(TestCase):
+    """/api/projects/changes/: upserts and tombstones since a cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects, _ = make_catalog(count=4, images=2)
+
+    def cursor(self):
+        return self.client.get('/api/projects/changes/').json()['cursor']
+
+    def changes(self, cursor):
+        response = self.client.get('/api/projects/changes/', {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_deletes_are_tombstones(self):
+        kept, edited, deleted, edited_then_deleted = self.projects
+        gone = [deleted.pk, edited_then_deleted.pk]
+        cursor = self.cursor()
+        image = kept.images.first()
+        image_id = image.pk
+        image.delete()
+        edited.title = 'Renamed'
+        edited.save()
+        edited_then_deleted.save()
+        deleted_images = list(deleted.images.values_list('pk', flat=True))
+        deleted.delete()
+        edited_then_deleted.delete()
+
+        page = self.changes(cursor)
+        # The image's own delete upserts its project too (its images list changed)
+        self.assertEqual([doc['id'] for doc in page['projects']], [kept.pk, edited.pk])
+        self.assertEqual(page['projects'][1]['title'], 'Renamed')
+        # Latest entry wins; a deleted project's images ride on its tombstone
+        self.assertEqual(page['deleted'], {'projects': gone, 'images': [image_id]})
+        self.assertFalse(set(deleted_images) & set(page['deleted']['images']))
+        self.assertEqual(page['images'], [])
+
+        # Replaying from the new cursor: nothing left
+        again = self.changes(page['cursor'])
+        self.assertEqual((again['projects'], again['deleted'], again['has_more']),
+                         ([], {'projects': [], 'images': []}, False))
+
+    def test_recreated_after_delete_is_an_upsert(self):
+        cursor = self.cursor()
+        gone = self.projects[0].pk
+        self.projects[0].delete()
+        project = Project.objects.create(title='New', description='d', design_type='3D', interior_or_exterior='Interior')
+        page = self.changes(cursor)
+        self.assertEqual(page['deleted']['projects'], [gone])
+        self.assertEqual([doc['id'] for doc in page['projects']], [project.pk])
+
+    @override_settings(DELTA_SYNC={**settings.DELTA_SYNC, 'PAGE_SIZE': 2})
+    def test_tombstones_across_pages(self):
+        cursor = self.cursor()
+        ids = [p.pk for p in self.projects]
+        for project in self.projects:
+            project.delete()
+        deleted, has_more = [], True
+        while has_more:
+            page = self.changes(cursor)
+            deleted += page['deleted']['projects']
+            cursor, has_more = page['cursor'], page['has_more']
+        self.assertEqual(deleted, ids)
+
+    def test_expired_cursor_is_a_410(self):
+        stale = encode_cursor([0, int(time.time()) - (settings.DELTA_SYNC['RETENTION_DAYS'] + 1) * 86400])
+        self.assertEqual(self.client.get('/api/projects/changes/', {'since': stale}).status_code, 410)
+
+
+# ------------------ JOBS ------------------
+@override_settings(JOBS={**settings.JOBS, 'EAGER': False, 'MAX_ATTEMPTS': 3, 'RETRY_BACKOFF': 10, 'LEASE_SECONDS': 300})
+class JobQueueTests(TransactionTestCase):
+    """
+    main/jobs.py with a stand-in task: dedup, leases, retries with backoff,
+    failure and requeue. Batches run on pool threads, so data is committed.
+    """
+
+    def setUp(self):
+        self.calls = []
+        self.fail = False
+        patcher = mock.patch.dict(jobs.TASKS, {'test.task': jobs.Task('test.task', self.handler, exclusive=False)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def handler(self, keys):
+        self.calls.append(sorted(keys))
+        if self.fail:
+            raise RuntimeError('boom')
+
+    def rows(self):
+        return list(Job.objects.filter(task='test.task').order_by('id').values_list('key', 'status', 'attempts'))
+
+    def expire(self, **filters):
+        Job.objects.filter(task='test.task', **filters).update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_pending_duplicates_collapse(self):
+        jobs.enqueue({'test.task': [1, 2]})
+        jobs.enqueue({'test.task': [2, '1', 3]})
+        self.assertEqual(self.rows(), [('1', 'pending', 0), ('2', 'pending', 0), ('3', 'pending', 0)])
+
+    def test_key_never_runs_twice_at_once(self):
+        jobs.enqueue({'test.task': [1]})
+        self.assertEqual([key for _, key, _ in jobs.claim('test.task', 10)], ['1'])
+        # Enqueued again while running: a new pending row, held back until the running one is done
+        jobs.enqueue({'test.task': [1]})
+        self.assertEqual(self.rows(), [('1', 'running', 1), ('1', 'pending', 0)])
+        self.assertEqual(jobs.claim('test.task', 10), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        jobs.enqueue({'test.task': [1]})
+        jobs.claim('test.task', 10)
+        self.assertEqual(jobs.claim('test.task', 10), [])
+        self.expire(status='running')  # the worker died mid-batch
+        claimed = jobs.claim('test.task', 10)
+        self.assertEqual([(key, attempts) for _, key, attempts in claimed], [('1', 2)])
+
+    def test_failures_back_off_then_fail_then_requeue(self):
+        self.fail = True
+        jobs.enqueue({'test.task': [1]})
+        logs = self.enterContext(self.assertLogs('main.jobs', level='ERROR'))
+        for attempt in (1, 2):
+            before = timezone.now()
+            self.assertFalse(jobs.run_batch('test.task', jobs.claim('test.task', 10)))
+            job = Job.objects.get(task='test.task')
+            self.assertEqual((job.status, job.attempts, job.last_error), ('pending', attempt, 'RuntimeError: boom'))
+            # RETRY_BACKOFF doubled per attempt
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=10 * 2 ** (attempt - 1)))
+            self.assertEqual(jobs.claim('test.task', 10), [])
+            self.expire()
+        self.assertFalse(jobs.run_batch('test.task', jobs.claim('test.task', 10)))
+        self.assertEqual(self.rows(), [('1', 'failed', 3)])
+        self.assertEqual(jobs.claim('test.task', 10), [])
+        self.assertEqual(len(logs.records), 3)
+
+        self.assertEqual(jobs.retry_failed(), 1)
+        self.assertEqual(self.rows(), [('1', 'pending', 0)])
+        self.fail = False
+        self.assertEqual(jobs.work(threads=1, once=True), (1, 0))
+        self.assertEqual(self.rows(), [])
+
+    def test_requeue_with_a_pending_duplicate_drops_the_failed_one(self):
+        jobs.enqueue({'test.task': [1]})
+        Job.objects.filter(task='test.task').update(status='failed', attempts=3)
+        jobs.enqueue({'test.task': [1]})
+        jobs.retry_failed()
+        self.assertEqual(self.rows(), [('1', 'pending', 0)])
+
+    def test_work_runs_batches_and_deletes_them(self):
+        jobs.enqueue({'test.task': [1, 2, 3]})
+        self.assertEqual(jobs.work(threads=2, once=True), (1, 0))
+        self.assertEqual(self.calls, [['1', '2', '3']])
+        self.assertEqual(self.rows(), [])
+
+
+# ------------------ FACETS ------------------
+class FacetTests(TestCase):
+    """/api/projects/facets/ counts, narrowed by the same filters and query as search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kitchen = Category.objects.create(name='Kitchen')
+        cls.bedroom = Category.objects.create(name='Bedroom')
+        Category.objects.create(name='Unused')
+        rows = [
+            ('Modern kitchen', '3D', 'Interior', [cls.kitchen]),
+            ('Modern suite', '3D', 'Interior', [cls.kitchen, cls.bedroom]),
+            ('Classic bedroom', '2D', 'Interior', [cls.bedroom]),
+            ('Modern porch', '2D', 'Exterior', []),
+        ]
+        for title, design_type, placement, categories in rows:
+            project = Project.objects.create(title=title, description='d', design_type=design_type,
+                                             interior_or_exterior=placement)
+            project.categories.set(categories)
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, **params):
+        response = self.client.get('/api/projects/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        data['categories'] = [(c['name'], c['count']) for c in data['categories']]
+        return data
+
+    def test_unfiltered(self):
+        data = self.facets()
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(data['design_type'], {'2D': 2, '3D': 2})
+        self.assertEqual(data['interior_or_exterior'], {'Interior': 3, 'Exterior': 1})
+        # A project in two categories counts once in the totals and once per category; empty ones are left out
+        self.assertEqual(data['categories'], [('Bedroom', 2), ('Kitchen', 2)])
+
+    def test_narrowed_by_filters(self):
+        data = self.facets(categories=self.kitchen.pk)
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['design_type'], {'2D': 0, '3D': 2})
+        self.assertEqual(data['categories'], [('Kitchen', 2), ('Bedroom', 1)])
+
+        data = self.facets(design_type='2D', interior_or_exterior='Interior')
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['categories'], [('Bedroom', 1)])
+
+    def test_narrowed_by_query(self):
+        data = self.facets(q='modern', interior_or_exterior='Interior')
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['interior_or_exterior'], {'Interior': 2, 'Exterior': 0})
+        self.assertEqual(data['categories'], [('Kitchen', 2), ('Bedroom', 1)])
+
+    def test_nothing_matches(self):
+        data = self.facets(q='nothing-like-this')
+        self.assertEqual((data['total'], data['categories']), (0, []))
+        self.assertEqual(data['design_type'], {'2D': 0, '3D': 0})
+
+
+# ------------------ CONDITIONAL GET ------------------
+class ConditionalGetTests(TestCase):
+    """List ETags follow the change log (deletes included); no Last-Modified to go backwards."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.projects, _ = make_catalog(count=3, images=0)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_delete_changes_the_list_etag(self):
+        first = self.client.get('/api/projects/')
+        self.assertFalse(first.has_header('Last-Modified'))
+        self.projects[0].delete()
+        drop_response_cache()  # the commit's invalidation; the ETag changed already, in the transaction
+        again = self.client.get('/api/projects/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(len(again.json()), 2)
+
+    def test_feedback_of_a_missing_project_is_a_404(self):
+        response = self.client.get('/api/projects/99999/feedback/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_async_validators_match(self):
+        request = RequestFactory().get('/', {'page_size': 10})
+        project_id = self.projects[0].pk
+        for name, args in [('projects_validators', ()), ('categories_validators', ()),
+                           ('feedback_validators', (project_id,)), ('project_detail_validators', (project_id,))]:
+            with self.subTest(name):
+                expected = getattr(views, name)(request, *args)
+                self.assertEqual(async_to_sync(getattr(async_views, name))(request, *args), expected)
+        self.assertIsNone(async_to_sync(async_views.feedback_validators)(request, 99999))
+
+
+# ------------------ THROTTLING ------------------
+@override_settings(API_THROTTLES={'BACKEND': 'cache', 'RATES': {'login': {'ip': '2/min'}}})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def login(self, forwarded_for):
+        return self.client.post('/api/login/', dumps({'username': 'nobody', 'password': 'x'}),
+                                content_type='application/json', HTTP_X_FORWARDED_FOR=forwarded_for)
+
+    def test_forwarded_for_does_not_reset_the_limit(self):
+        self.assertNotEqual(self.login('10.0.0.1').status_code, 429)
+        self.assertNotEqual(self.login('10.0.0.2').status_code, 429)
+        response = self.login('10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+
+# ------------------ COMPRESSION ------------------
+class CompressedETagTests(TestCase):
+    """A 304 carries the ETag form (weak when compressed) of the 200 it stands for."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(count=10, images=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_304_matches_the_compressed_200(self):
+        first = self.client.get('/api/projects/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        again = self.client.get('/api/projects/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertIn('Accept-Encoding', again['Vary'])
+
+    def test_304_matches_the_uncompressed_200(self):
+        first = self.client.get('/api/projects/')
+        self.assertFalse(first.has_header('Content-Encoding'))
+        again = self.client.get('/api/projects/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+
+
+# ------------------ ASGI STACK ------------------
+class AsgiStackTests(SimpleTestCase):
+    @override_settings(DEBUG=True)  # Django only logs adaptations in DEBUG
+    def test_no_middleware_is_adapted(self):
+        with self.assertLogs('django.request', level='DEBUG') as logs:
+            handler = ASGIHandler()
+            logging.getLogger('django.request').debug('stack loaded')
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    def test_static_files_served_on_the_async_path(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(os.path.join(root, 'site.css'), 'w') as f:
+            f.write('body{}')
+
+        async def view(request):
+            return HttpResponse('view')
+
+        with override_settings(STATIC_ROOT=root):
+            middleware = StaticFilesMiddleware(view)
+        request = RequestFactory()
+        static = async_to_sync(middleware)(request.get(f"/{settings.STATIC_URL.strip('/')}/site.css"))
+        self.assertEqual((static.status_code, b''.join(static.streaming_content)), (200, b'body{}'))
+        self.assertEqual(async_to_sync(middleware)(request.get('/api/projects/')).content, b'view')
+
+
+# ------------------ BENCHMARK ------------------
+class BenchCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(count=3, images=1)
+        cls.existing = [User.objects.create_user(name, f'{name}@example.com', 'pw-12345678')
+                        for name in ('bench_admin', 'bench_reg_someone')]
+
+    def test_refuses_to_run_without_debug(self):
+        with self.assertRaisesMessage(CommandError, '--i-know-this-is-not-prod'):
+            call_command('bench_api', iterations=1, stdout=io.StringIO())
+
+    def test_run_creates_and_removes_only_its_own_users(self):
+        out = io.StringIO()
+        call_command('bench_api', '--i-know-this-is-not-prod', iterations=1, warmup=0, stdout=out, stderr=io.StringIO(),
+                     endpoints=['register_api', 'login_api', 'reset_password_api'])
+        self.assertIn("{'200': 1}", out.getvalue())
+        self.assertEqual(list(User.objects.order_by('id')), self.existing)
+
+
+# ------------------ QUERY PLANS ------------------
+class QueryPlanTests(TestCase):
+    """EXPLAIN checks from main/queryplans.py on a catalog big enough for the planner to prefer indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cities = [f'City {n}' for n in range(40)]
+        projects = Project.objects.bulk_create([
+            Project(
+                title=f'Plan row {n}', description='d', design_loc=cities[n % len(cities)],
+                design_type='Walkthrough' if n % 97 == 0 else ('3D' if n % 2 else '2D'),
+                interior_or_exterior='Exterior' if n % 9 == 0 else 'Interior',
+            )
+            for n in range(1200)
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'planner{n}', email=f'planner{n}@example.com') for n in range(300)
+        ])
+        busiest = projects[0]
+        Feedback.objects.bulk_create(
+            [Feedback(project=busiest, user=users[n % len(users)], message='m') for n in range(60)]
+            + [Feedback(project=p, user=users[0], message='m') for p in projects[1:200]]
+        )
+        RelatedProject.objects.bulk_create(
+            [RelatedProject(project=p, related=projects[(i + k) % len(projects)], score=0.5 + k / 100)
+             for i, p in enumerate(projects) for k in range(1, 7)]
+        )
+        queryplans.analyze()
+        cls.sample = queryplans.sample_values()
+
+    def test_hot_queries_use_their_indexes(self):
+        results = [r for r in queryplans.run_checks(self.sample) if r[1] is not None]
+        self.assertGreaterEqual(len(results), 6)
+        for check, plan, problems in results:
+            with self.subTest(check.name):
+                self.assertEqual(problems, [], plan)
+
+    def test_dropped_index_is_reported(self):
+        check = next(c for c in queryplans.CHECKS if c.name == 'catalog_type_placement')
+        # Rolled back with the test's transaction (DDL is transactional on SQLite and PostgreSQL)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX ' + connection.ops.quote_name(check.index))
+        [(_, plan, problems)] = queryplans.run_checks(self.sample, [check])
+        self.assertIn('project_type_placement_idx not used', problems, plan)
+
+
+# ------------------ N+1 DETECTOR ------------------
+@override_settings(QUERY_INSPECTOR={**settings.QUERY_INSPECTOR, 'ENABLED': True, 'RAISE': True, 'REPEAT_THRESHOLD': 5})
+class QueryInspectorTests(TestCase):
+    """main/querycheck.py with RAISE on, as a test settings file would run it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(title='P', description='d', design_type='3D', interior_or_exterior='Interior')
+        user = User.objects.create_user('reader', 'reader@example.com', 'pw-12345678')
+        Feedback.objects.bulk_create([Feedback(project=cls.project, user=user, message=f'm{n}') for n in range(10)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_shape_raises(self):
+        with self.assertRaises(NPlusOneError) as raised:
+            with inspect_queries('feedback loop'):
+                for feedback in Feedback.objects.all():
+                    feedback.user.username
+        self.assertIn('10x SELECT', str(raised.exception))
+
+    def test_shapes_under_the_threshold_pass(self):
+        with inspect_queries('few lookups') as inspector:
+            for feedback in Feedback.objects.all()[:4]:
+                feedback.user.username
+        self.assertEqual(inspector.repeated(), [])
+
+    def test_endpoint_regression_fails_the_request(self):
+        path = f'/api/projects/{self.project.pk}/feedback/'
+        self.assertEqual(self.client.get(path).status_code, 200)
+        # Without its select_related the feedback list looks up each row's user
+        with mock.patch.object(QuerySet, 'select_related', lambda qs, *fields: qs):
+            with self.assertRaises(NPlusOneError):
+                self.client.get(path)
+
+
+# ------------------ REPLICA ROUTING ------------------
+REPLICA = 'replica_test'
+
+
+@override_settings(
+    DATABASE_REPLICAS={**settings.DATABASE_REPLICAS, 'ALIASES': [REPLICA]},
+    API_THROTTLES={**settings.API_THROTTLES, 'RATES': {}},
+)
+class ReplicaRoutingTests(TestCase):
+    """
+    main/dbrouting.py against two SQLite databases: the test database as
+    the primary and a second file as the replica, holding different
+    categories, so a response shows which one it was read from.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registered after the test databases exist, so the runner neither creates nor migrates it
+        cls.replica_dir = tempfile.mkdtemp()
+        default = connections.settings['default']
+        connections.settings[REPLICA] = {
+            **default, 'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {},
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+            'TEST': {**default['TEST'], 'NAME': None, 'MIRROR': None},
+        }
+        cls.databases = cls.databases | {REPLICA}
+        # Replicas never migrate (PrimaryReplicaRouter.allow_migrate); create the one table read here
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(Category)
+        Category.objects.using(REPLICA).create(name='Replica copy')
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.replica_dir)
+        cls.databases = cls.databases - {REPLICA}
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(name='Kitchen')
+        Category.objects.create(name='Bedroom')
+        cls.project = Project.objects.create(title='P', description='d', design_type='3D', interior_or_exterior='Interior')
+        cls.user = User.objects.create_user('writer', 'writer@example.com', 'pw-12345678')
+        cls.token = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        dbrouting._health.clear()
+
+    def categories(self, client=None, **headers):
+        response = (client or self.client).get('/api/categories/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, sorted(c['name'] for c in response.json())
+
+    def write(self, client=None):
+        response = (client or self.client).post(
+            f'/api/projects/{self.project.pk}/feedback/', dumps({'message': 'hi'}),
+            content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token}',
+        )
+        self.assertEqual(response.status_code, 201)
+        # Responses cached before the write; a real write bumps these on commit
+        drop_response_cache()
+        return response
+
+    def test_reads_go_to_the_healthy_replica(self):
+        self.assertEqual(self.categories()[1], ['Replica copy'])
+
+    def test_write_sets_the_sticky_cookie(self):
+        response = self.write()
+        self.assertIn(settings.DATABASE_REPLICAS['COOKIE'], response.cookies)
+        # Same client, cookie sent back, no token
+        self.assertEqual(self.categories()[1], ['Bedroom', 'Kitchen'])
+
+    def test_write_marks_the_token_sticky(self):
+        self.write(Client())
+        # Cross-origin frontend: no cookies, only the token
+        self.assertEqual(self.categories(HTTP_AUTHORIZATION=f'Token {self.token}')[1], ['Bedroom', 'Kitchen'])
+        drop_response_cache()  # else the anonymous read is served the cached primary body
+        self.assertEqual(self.categories(Client())[1], ['Replica copy'])
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        replica = connections[REPLICA]
+        with mock.patch.object(replica, 'cursor', side_effect=OperationalError('replica down')), \
+                mock.patch.object(replica, 'close'):
+            self.assertEqual(self.categories()[1], ['Bedroom', 'Kitchen'])
+        self.assertEqual(dbrouting.healthy_replicas(), [])
+
+    def test_etag_matches_the_body_right_after_a_write(self):
+        dbrouting.note_write()
+        response, names = self.categories()
+        self.assertEqual(names, ['Bedroom', 'Kitchen'])
+        etag, _ = categories_validators(None)  # on the primary
+        self.assertEqual(response['ETag'], etag)
@@ -0,0 +1,134 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+_DURATIONS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60). Same format as DRF's DEFAULT_THROTTLE_RATES."""
+    num, period = rate.split('/')
+    return int(num), _DURATIONS[period.strip().lower()]
+
+
+# ------------------ BACKENDS ------------------
+class LocalBackend:
+    """
+    In-process token bucket. No network hop at all, but limits are per
+    worker, so the effective limit is rate x number of workers.
+    """
+
+    def __init__(self, max_keys=100000):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def hit(self, key, limit, duration):
+        """Take one token; return seconds to wait if the bucket is empty, else None."""
+        refill = limit / duration
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (limit, now))
+            tokens = min(limit, tokens + (now - last) * refill)
+            if tokens >= 1:
+                tokens -= 1
+                wait = None
+            else:
+                wait = (1 - tokens) / refill
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheBackend:
+    """
+    Sliding-window counter on the shared Django cache (Redis/Memcached in
+    production): the previous window's count is weighted by how much of it
+    still overlaps the sliding window. Two cache ops per check.
+    """
+
+    def hit(self, key, limit, duration):
+        now = time.time()
+        window = int(now // duration)
+        current_key = f'{key}:{window}'
+        previous_key = f'{key}:{window - 1}'
+
+        counts = cache.get_many([current_key, previous_key])
+        elapsed = (now % duration) / duration
+        estimated = counts.get(previous_key, 0) * (1 - elapsed) + counts.get(current_key, 0)
+        if estimated >= limit:
+            return max(1, math.ceil((1 - elapsed) * duration))
+
+        if not cache.add(current_key, 1, duration * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, duration * 2)
+        return None
+
+
+_BACKENDS = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    name = settings.API_THROTTLES['BACKEND']
+    with _backends_lock:
+        if name not in _BACKENDS:
+            _BACKENDS[name] = {'local': LocalBackend, 'cache': CacheBackend}[name]()
+        return _BACKENDS[name]
+
+
+# ------------------ DRF THROTTLE ------------------
+class EndpointThrottle(BaseThrottle):
+    """
+    Limits one endpoint (`scope`) per client IP and, where the request body
+    carries one, per username/email. Rates come from
+    settings.API_THROTTLES['RATES'][scope]. Never touches the database.
+    The IP is DRF's get_ident(): REMOTE_ADDR with NUM_PROXIES = 0, so a
+    client-sent X-Forwarded-For does not change it.
+    """
+    scope = None
+
+    def _identity(self, request):
+        data = getattr(request, 'data', None)
+        if not hasattr(data, 'get'):
+            return None
+        value = data.get('username') or data.get('email')
+        if not value:
+            return None
+        value = str(value).strip().lower()
+        return hashlib.sha1(value.encode()).hexdigest()
+
+    def allow_request(self, request, view):
+        rates = settings.API_THROTTLES['RATES'].get(self.scope)
+        if not rates:
+            return True
+
+        keys = {'ip': self.get_ident(request), 'identity': self._identity(request)}
+        backend = get_backend()
+        self.wait_seconds = None
+        for kind, rate in rates.items():
+            value = keys.get(kind)
+            if value is None:
+                continue
+            limit, duration = parse_rate(rate)
+            wait = backend.hit(f'main:throttle:{self.scope}:{kind}:{value}', limit, duration)
+            if wait is not None:
+                self.wait_seconds = max(wait, self.wait_seconds or 0)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def scoped_throttle(scope):
+    """EndpointThrottle subclass for one endpoint, for use in @throttle_classes."""
+    return type(f'{scope.title().replace("_", "")}Throttle', (EndpointThrottle,), {'scope': scope})
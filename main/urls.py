@@ -1,20 +1,38 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from .views import google_check  # Import the new view
 
+# ASGI par native async read views (ASYNC_READ_VIEWS), WSGI par DRF wale sync views
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
     # GET
-    path('projects/', views.projects_api, name='projects_api'),
-    path('projects/<int:id>/', views.project_detail_api, name='project_detail_api'),
-    path('categories/', views.categories_list, name='categories_list'),
-    path('projects/<int:project_id>/feedback/', views.add_feedback_api, name='add_feedback_api'),
+    path('projects/', read_views.projects_api, name='projects_api'),
+    path('projects/search/', views.search_projects_api, name='search_projects_api'),
+    path('projects/export/', views.export_projects_api, name='export_projects_api'),
+    path('projects/facets/', views.project_facets_api, name='project_facets_api'),
+    path('projects/changes/', views.project_changes_api, name='project_changes_api'),
+    path('projects/<int:id>/', read_views.project_detail_api, name='project_detail_api'),
+    path('projects/<int:id>/related/', views.related_projects_api, name='related_projects_api'),
+    path('categories/', read_views.categories_list, name='categories_list'),
+    path('projects/<int:project_id>/feedback/', read_views.add_feedback_api, name='add_feedback_api'),
 
     # ADMIN
     path('projects/add/', views.add_project_api, name='add_project_api'),
+    path('projects/import/', views.import_projects_api, name='import_projects_api'),
     path('projects/<int:pk>/delete/', views.delete_project_api, name='delete_project_api'),
     path('projects/<int:pk>/update/', views.update_project_api, name='update_project_api'),
     path('feedbacks/<int:pk>/delete/', views.delete_feedback_api, name='delete_feedback_api'),
     path('images/<int:pk>/delete/', views.delete_image_api, name='delete_image_api'),
+    path('projects/batch/update/', views.batch_update_projects_api, name='batch_update_projects_api'),
+    path('projects/batch/delete/', views.batch_delete_projects_api, name='batch_delete_projects_api'),
+    path('images/batch/delete/', views.batch_delete_images_api, name='batch_delete_images_api'),
+    path('feedbacks/batch/delete/', views.batch_delete_feedbacks_api, name='batch_delete_feedbacks_api'),
+    path('metrics/', views.metrics_api, name='metrics_api'),
 
     # AUTH
     path('register/', views.register_api),
@@ -1,49 +1,259 @@
 import uuid
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework import status
+from django.db.models import Count, Max
 
 # Models & Serializers
 from .models import Project, ProjectImage, Category, Feedback, User 
-from .serializers import ProjectSerializer, FeedbackSerializer
+from .serializers import FeedbackSerializer, ProjectSerializer
+from .cache import categories_key, get_or_build, list_key, project_key, related_version
+from .changes import ExpiredCursor, changes_since, head_cursor, head_id
+from .conditional import conditional, make_etag, query_string
+from .export import CONTENT_TYPES as EXPORT_CONTENT_TYPES, stream_export
+from .facets import compute_facets
+from .fieldsets import InvalidFields, project_documents, project_queryset, requested_fields
+from .filters import filter_projects
+from .images import storage_value
+from .importer import FORMATS, detect_format, import_projects, iter_rows
+from .metrics import collect as collect_metrics, render as render_metrics
+from .pagination import InvalidCursor, get_page_size, page_payload, paginate_queryset, wants_pagination
+from .renderers import dumps
+from .related import SIMILARITY_FIELDS, related_queryset
+from .search import search_projects
+from .signals import batch_project_changes, projects_changed
+from .throttling import scoped_throttle
+from .snapshots import project_document, render_list, render_page
 
 # ------------------ HELPER FUNCTIONS ------------------
+# Fields the admin update endpoints may write
+UPDATABLE_PROJECT_FIELDS = (
+    'title', 'description', 'plot_size', 'design_loc', 'contact_number',
+    'whatsapp_number', 'design_type', 'interior_or_exterior',
+)
+
+# Related strip ke cards: sirf wahi columns jo related_queryset() join karta hai
+RELATED_FIELDS = ['id', 'title', 'image', 'image_variants']
+
 def is_admin_user(user):
     """Check if user is superuser, staff, or has admin role."""
     return user.is_superuser or user.is_staff or getattr(user, 'role', '').lower() == "admin"
 
+# ------------------ CONDITIONAL GET VALIDATORS ------------------
+# Lists ka ETag change-log head (har project write/delete ek entry likhta hai,
+# usi transaction mein) aur categories version se banta hai: koi aggregate nahi.
+# Lists par Last-Modified nahi bhejte: MAX(updated_at) delete par peeche ja
+# sakta hai, phir If-Modified-Since galat 304 deta.
+def projects_validators(request):
+    return make_etag('projects', head_id(), categories_key(), query_string(request)), None
+
+def project_detail_validators(request, id):
+    last = Project.objects.filter(id=id).values_list('updated_at', flat=True).first()
+    if last is None:
+        return None
+    return make_etag('project', id, last, query_string(request)), last
+
+def related_validators(request, id):
+    # Kisi bhi project ke badalne se yeh list badal sakti hai; lists job mein
+    # baad mein refresh hoti hain, isliye related version bhi ETag mein hai.
+    return make_etag('related', id, related_version(), head_id(), categories_key(), query_string(request)), None
+
+def categories_validators(request):
+    # Category save/delete commit par version badhata hai (signals.category_changed)
+    return make_etag(categories_key()), None
+
+def feedback_state(project_id):
+    """Feedback aggregate per project; project missing ho to pehle hi pata chale (404, ETag nahi)."""
+    return (
+        Project.objects.filter(id=project_id)
+        .annotate(last=Max('feedback__updated_at'), count=Count('feedback'))
+        .values_list('last', 'count')
+    )
+
+def feedback_validators(request, project_id):
+    state = feedback_state(project_id).first()
+    if state is None:
+        return None
+    return make_etag('feedback', project_id, *state, query_string(request)), None
+
 # ------------------ PUBLIC GET VIEWS ------------------
+def raw_json_response(body):
+    """Response for JSON we assembled ourselves from stored snapshot documents."""
+    return HttpResponse(body, content_type='application/json')
+
 @api_view(['GET'])
+@conditional(projects_validators)
 def projects_api(request):
-    projects = Project.objects.all().order_by('-id') 
-    serializer = ProjectSerializer(projects, many=True, context={'request': request})
-    return Response(serializer.data)
+    try:
+        fields = requested_fields(request.query_params)
+    except InvalidFields as e:
+        return Response({"error": str(e)}, status=400)
+
+    def build():
+        projects = project_queryset(fields).order_by('-id')
+
+        # Compatibility mode: bina cursor/page_size ke poori list (old frontend contract)
+        if not wants_pagination(request):
+            return render_list(project_documents(list(projects), fields))
+
+        rows, next_cursor = paginate_queryset(
+            projects, ['-id'], request.query_params.get('cursor'), get_page_size(request)
+        )
+        return render_page(project_documents(rows, fields), next_cursor)
+
+    try:
+        return raw_json_response(get_or_build(list_key('projects-doc', request.query_params), build))
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=400)
+
+@api_view(['GET'])
+@conditional(projects_validators)
+def search_projects_api(request):
+    """?q= full-text (title/description/design_loc) + filters, ranked and cursor-paginated."""
+    try:
+        fields = requested_fields(request.query_params)
+    except InvalidFields as e:
+        return Response({"error": str(e)}, status=400)
+
+    def build():
+        projects = filter_projects(project_queryset(fields), request.query_params)
+        q = request.query_params.get('q', '').strip()
+        ordering = ['-id']
+        if q:
+            projects = search_projects(projects, q)
+            ordering = ['-rank', '-id']
+        rows, next_cursor = paginate_queryset(
+            projects, ordering, request.query_params.get('cursor'), get_page_size(request)
+        )
+        return render_page(project_documents(rows, fields), next_cursor)
+
+    try:
+        return raw_json_response(get_or_build(list_key('search-doc', request.query_params), build))
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=400)
+
+@api_view(['GET'])
+@conditional(projects_validators)
+def project_facets_api(request):
+    """Counts per category / design_type / interior_or_exterior, narrowed by the same filters as search."""
+    def build():
+        projects = filter_projects(Project.objects.all(), request.query_params)
+        projects = search_projects(projects, request.query_params.get('q'))
+        return compute_facets(projects)
+
+    return Response(get_or_build(list_key('facets', request.query_params), build))
+
+# Plain Django view: DRF would treat ?format= as renderer negotiation
+@require_safe
+@conditional(projects_validators)
+def export_projects_api(request):
+    """Full catalog dump (?format=json|ndjson), streamed so memory stays flat."""
+    fmt = request.GET.get('format', 'json')
+    if fmt not in EXPORT_CONTENT_TYPES:
+        return JsonResponse({"error": f"format must be one of {list(EXPORT_CONTENT_TYPES)}"}, status=400)
+
+    response = StreamingHttpResponse(stream_export(fmt), content_type=EXPORT_CONTENT_TYPES[fmt])
+    if request.GET.get('download'):
+        response['Content-Disposition'] = f'attachment; filename="projects.{fmt}"'
+    return response
 
 @api_view(['GET'])
+@conditional(project_detail_validators)
 def project_detail_api(request, id):
-    project = get_object_or_404(Project, id=id)
-    serializer = ProjectSerializer(project, context={'request': request})
-    return Response(serializer.data)
+    try:
+        fields = requested_fields(request.query_params)
+    except InvalidFields as e:
+        return Response({"error": str(e)}, status=400)
+
+    def build():
+        if fields is None:
+            doc = project_document(id)
+        else:
+            docs = project_documents(project_queryset(fields).filter(id=id), fields)
+            doc = docs[0] if docs else None
+        if doc is None:
+            raise Http404("No Project matches the given query.")
+        return doc
+
+    return raw_json_response(get_or_build(project_key(id, request.query_params), build))
 
 @api_view(['GET'])
+def project_changes_api(request):
+    """
+    Delta sync: ?since=<cursor> returns projects/images changed since then,
+    tombstones for deleted ones and the next cursor (see main/changes.py).
+    Bina since ke sirf abhi ka cursor milta hai (full download se pehle lein).
+    """
+    since = request.query_params.get('since')
+    if not since:
+        return Response({"cursor": head_cursor()})
+    try:
+        payload = changes_since(since)
+    except ExpiredCursor:
+        return Response({"error": "Cursor expired, download the catalog again"}, status=410)
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=400)
+    # Project documents are stored JSON, spliced in as-is
+    return raw_json_response(dumps(payload))
+
+@api_view(['GET'])
+@conditional(related_validators)
+def related_projects_api(request, id):
+    """Top-K "similar designs" from the precomputed RelatedProject table (?limit=)."""
+    config = settings.RELATED_PROJECTS
+    try:
+        limit = int(request.query_params.get('limit', config['DEFAULT_LIMIT']))
+    except ValueError:
+        return Response({"error": "limit must be a number"}, status=400)
+    limit = max(1, min(limit, config['SIZE']))
+
+    def build():
+        rows = list(related_queryset(id, limit))
+        if not rows and not Project.objects.filter(id=id).exists():
+            raise Http404("No Project matches the given query.")
+        return [
+            {**ProjectSerializer(row.related, fields=RELATED_FIELDS).data, "score": row.score}
+            for row in rows
+        ]
+
+    return Response(get_or_build(list_key(f'related:{id}:{related_version()}', request.query_params), build))
+
+@api_view(['GET'])
+@conditional(categories_validators)
 def categories_list(request):
-    categories = Category.objects.all()
-    data = [{"id": c.id, "name": c.name} for c in categories]
-    return Response(data)
+    def build():
+        return [{"id": c.id, "name": c.name} for c in Category.objects.all()]
+
+    return Response(get_or_build(categories_key(), build))
 
 # ------------------ FEEDBACK ACTIONS ------------------
 @api_view(['GET', 'POST'])
+@conditional(feedback_validators)
 def add_feedback_api(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     
     if request.method == 'GET':
-        feedbacks = Feedback.objects.filter(project=project).order_by('-date')
-        serializer = FeedbackSerializer(feedbacks, many=True)
-        return Response(serializer.data)
+        # select_related: user_name ke liye har row par alag query nahi
+        feedbacks = Feedback.objects.filter(project=project).select_related('user').order_by('-date', '-id')
+        if not wants_pagination(request):
+            return Response(FeedbackSerializer(feedbacks, many=True).data)
+        try:
+            rows, next_cursor = paginate_queryset(
+                feedbacks, ['-date', '-id'], request.query_params.get('cursor'), get_page_size(request)
+            )
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=400)
+        return Response(page_payload(FeedbackSerializer(rows, many=True).data, next_cursor))
 
     if not request.user.is_authenticated:
         return Response({"error": "Authentication required"}, status=401)
@@ -52,7 +262,9 @@ def add_feedback_api(request, project_id):
     if not message:
         return Response({"error": "Message cannot be empty"}, status=400)
 
-    Feedback.objects.create(project=project, user=request.user, message=message)
+    # Feedback row aur project ka counter ek saath commit honge
+    with transaction.atomic():
+        Feedback.objects.create(project=project, user=request.user, message=message)
     return Response({"success": "Feedback submitted successfully"}, status=201)
 
 # ------------------ ADMIN: ADD PROJECT (FAST VERSION) ------------------
@@ -67,34 +279,53 @@ def add_project_api(request):
         # Frontend ab 'image_urls' (List) bhej raha hai
         image_urls = data.get("image_urls", []) 
         contact=data.get("contact_number")
-        # 1. Main Project Create karein
-        project = Project.objects.create(
-            title=data.get("title"),
-            description=data.get("description"),
-            plot_size=data.get("plot_size"),
-            design_loc=data.get("design_loc"),
-           
-            contact_number=contact if contact else None,
-            whatsapp_number=data.get("whatsapp_number"),
-            design_type=data.get("design_type"),
-            interior_or_exterior=data.get("interior_or_exterior"),
-            # Pehla image main image ban jayega
-            image=image_urls[0] if image_urls else None 
-        )
-
-        # 2. Categories handle karein
-        category_ids = data.get("categories", [])
-        if category_ids:
-            project.categories.set(category_ids)
-
-        # 3. Multiple Images (ProjectImage Model)
-        for url in image_urls:
-            ProjectImage.objects.create(project=project, image=url)
+        # Ek hi transaction: beech mein fail hua toh aadha project nahi bachega.
+        # batch_project_changes: save + categories.set ka log/jobs ek hi baar likha jaye
+        with transaction.atomic(), batch_project_changes():
+            # 1. Main Project Create karein
+            project = Project.objects.create(
+                title=data.get("title"),
+                description=data.get("description"),
+                plot_size=data.get("plot_size"),
+                design_loc=data.get("design_loc"),
+                contact_number=contact if contact else None,
+                whatsapp_number=data.get("whatsapp_number"),
+                design_type=data.get("design_type"),
+                interior_or_exterior=data.get("interior_or_exterior"),
+                # Pehla image main image ban jayega
+                image=storage_value(image_urls[0]) if image_urls else None
+            )
+
+            # 2. Categories handle karein
+            category_ids = data.get("categories", [])
+            if category_ids:
+                project.categories.set(category_ids)
+
+            # 3. Multiple Images (ProjectImage Model) - ek INSERT mein
+            ProjectImage.objects.bulk_create([ProjectImage(project=project, image=storage_value(url)) for url in image_urls])
 
         return Response({"message": "Project created successfully", "id": project.id}, status=201)
     except Exception as e:
         return Response({"error": str(e)}, status=400)
 
+# ------------------ ADMIN: BULK IMPORT ------------------
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_projects_api(request):
+    """Multipart upload 'file' (CSV or NDJSON); rows are streamed and inserted in batches."""
+    if not is_admin_user(request.user):
+        return Response({"error": "Admin access required"}, status=403)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({"error": "file is required"}, status=400)
+    fmt = request.data.get('format') or detect_format(upload.name)
+    if fmt not in FORMATS:
+        return Response({"error": f"format must be one of {list(FORMATS)}"}, status=400)
+
+    report = import_projects(iter_rows(upload, fmt))
+    return Response(report, status=201 if report['created'] else 400)
+
 # ------------------ ADMIN: UPDATE PROJECT ------------------
 @api_view(['PATCH', 'POST'])
 @permission_classes([IsAuthenticated])
@@ -105,31 +336,30 @@ def update_project_api(request, pk):
     try:
         project = get_object_or_404(Project, pk=pk)
         data = request.data
-        
-        # Update fields
-        project.title = data.get("title", project.title)
-        project.description = data.get("description", project.description)
-        project.plot_size = data.get("plot_size", project.plot_size)
-        project.design_loc = data.get("design_loc", project.design_loc)
-        project.contact_number = data.get("contact_number", project.contact_number)
-        project.whatsapp_number = data.get("whatsapp_number", project.whatsapp_number)
-        project.design_type = data.get("design_type", project.design_type)
-        project.interior_or_exterior = data.get("interior_or_exterior", project.interior_or_exterior)
-        
-        # Agar nayi images aayi hain (Cloudinary URLs)
-        new_image_urls = data.get("new_image_urls", [])
-        if new_image_urls:
-            if not project.image: # Agar pehle se main image nahi hai
-                project.image = new_image_urls[0]
-            for url in new_image_urls:
-                ProjectImage.objects.create(project=project, image=url)
-        
-        project.save()
-
-        # Categories update
-        category_ids = data.get("categories")
-        if category_ids is not None:
-            project.categories.set(category_ids)
+
+        with transaction.atomic(), batch_project_changes():
+            # Sirf badle hue fields UPDATE mein jayenge
+            changed = []
+            for field in UPDATABLE_PROJECT_FIELDS:
+                if field in data and data.get(field) != getattr(project, field):
+                    setattr(project, field, data.get(field))
+                    changed.append(field)
+
+            # Agar nayi images aayi hain (Cloudinary URLs)
+            new_image_urls = data.get("new_image_urls", [])
+            if new_image_urls:
+                if not project.image: # Agar pehle se main image nahi hai
+                    project.image = storage_value(new_image_urls[0])
+                    changed.append('image')
+                ProjectImage.objects.bulk_create([ProjectImage(project=project, image=storage_value(url)) for url in new_image_urls])
+
+            if changed or new_image_urls:
+                project.save(update_fields=changed + ['updated_at'])
+
+            # Categories update
+            category_ids = data.get("categories")
+            if category_ids is not None:
+                project.categories.set(category_ids)
 
         return Response({"message": "Project updated successfully"})
     except Exception as e:
@@ -166,9 +396,140 @@ def delete_image_api(request, pk):
     img.delete()
     return Response({"success": "Image removed"})
 
+# ------------------ ADMIN: BATCH ACTIONS ------------------
+# N alag delete/update calls ki jagah ek request, set-based queries ke saath
+def _batch_list(data, key):
+    values = data.get(key)
+    if not isinstance(values, list) or not values:
+        raise ValueError(f"{key} must be a non-empty list")
+    if len(values) > settings.API_BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {settings.API_BATCH_MAX_ITEMS} {key} per request")
+    return values
+
+def _batch_ids(data):
+    return [int(i) for i in _batch_list(data, "ids")]
+
+def _validate_project_changes(changes):
+    """Model field validation (NOT NULL, max_length, choices); returns the cleaned values."""
+    unknown = set(changes) - set(UPDATABLE_PROJECT_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot update: {', '.join(sorted(unknown))}")
+    cleaned = {}
+    for field, value in changes.items():
+        try:
+            cleaned[field] = Project._meta.get_field(field).clean(value, None)
+        except ValidationError as e:
+            raise ValueError(f"{field}: {' '.join(e.messages)}")
+    return cleaned
+
+def _category_ids(data, key):
+    ids = data.get(key) or []
+    if not isinstance(ids, list):
+        raise ValueError(f"{key} must be a list")
+    return [int(i) for i in ids]
+
+@api_view(['POST', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def batch_update_projects_api(request):
+    """
+    {"ids": [...], "changes": {...}, "add_categories": [...], "remove_categories": [...]}
+    applies the same change to every id; {"items": [{"id": 1, ...}, ...]} sets
+    per-project values with one bulk_update.
+    """
+    if not is_admin_user(request.user):
+        return Response({"error": "Admin access required"}, status=403)
+
+    data = request.data
+    try:
+        with transaction.atomic(), batch_project_changes():
+            if "items" in data:
+                items = _batch_list(data, "items")
+                by_id = {
+                    int(item["id"]): _validate_project_changes({k: v for k, v in item.items() if k != "id"})
+                    for item in items
+                }
+                fields = sorted({k for changes in by_id.values() for k in changes})
+                projects = list(Project.objects.filter(id__in=by_id).only('id', *fields))
+                now = timezone.now()
+                for project in projects:
+                    for field, value in by_id[project.id].items():
+                        setattr(project, field, value)
+                    project.updated_at = now
+                Project.objects.bulk_update(projects, fields + ['updated_at'])
+                projects_changed(*(p.id for p in projects), touch=False,
+                                 related=bool(set(fields) & set(SIMILARITY_FIELDS)))
+                return Response({"success": "Projects updated", "updated": len(projects)})
+
+            ids = _batch_ids(data)
+            changes = _validate_project_changes(data.get("changes") or {})
+            add_categories = _category_ids(data, "add_categories")
+            remove_categories = _category_ids(data, "remove_categories")
+            if add_categories:
+                missing = set(add_categories) - set(Category.objects.filter(id__in=add_categories).values_list('id', flat=True))
+                if missing:
+                    raise ValueError(f"Unknown categories: {', '.join(map(str, sorted(missing)))}")
+
+            updated = Project.objects.filter(id__in=ids).update(**changes, updated_at=timezone.now())
+            Through = Project.categories.through
+            if add_categories:
+                existing = set(Project.objects.filter(id__in=ids).values_list('id', flat=True))
+                Through.objects.bulk_create(
+                    [Through(project_id=p, category_id=c) for p in existing for c in add_categories],
+                    ignore_conflicts=True,
+                )
+            if remove_categories:
+                Through.objects.filter(project_id__in=ids, category_id__in=remove_categories).delete()
+            projects_changed(*ids, touch=False, related=bool(
+                set(changes) & set(SIMILARITY_FIELDS) or add_categories or remove_categories
+            ))
+        return Response({"success": "Projects updated", "updated": updated})
+    except (KeyError, TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
+    except (IntegrityError, DataError) as e:
+        # Validation ke baad bhi DB constraint fail ho (e.g. category beech mein delete hui)
+        return Response({"error": f"Invalid changes: {e}"}, status=400)
+
+def _batch_delete(request, queryset, label):
+    if not is_admin_user(request.user):
+        return Response({"error": "Unauthorized"}, status=403)
+    try:
+        ids = _batch_ids(request.data)
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
+
+    with transaction.atomic(), batch_project_changes():
+        _, per_model = queryset.filter(pk__in=ids).delete()
+    # Total mein cascade wali rows (images, feedbacks, links) bhi hoti hain; sirf maangi hui rows gino
+    return Response({"success": f"{label} deleted", "deleted": per_model.get(queryset.model._meta.label, 0)})
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def batch_delete_projects_api(request):
+    return _batch_delete(request, Project.objects.all(), "Projects")
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def batch_delete_images_api(request):
+    return _batch_delete(request, ProjectImage.objects.all(), "Images")
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def batch_delete_feedbacks_api(request):
+    return _batch_delete(request, Feedback.objects.all(), "Feedbacks")
+
+# ------------------ ADMIN: METRICS ------------------
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def metrics_api(request):
+    """Per-route latency/SQL/size and token cache metrics in Prometheus text format (all workers)."""
+    if not is_admin_user(request.user):
+        return Response({"error": "Admin access required"}, status=403)
+    return HttpResponse(render_metrics(collect_metrics()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # ------------------ AUTHENTICATION ------------------
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('register')])
 def register_api(request):
     username = request.data.get('username')
     password = request.data.get('password')
@@ -209,6 +570,7 @@ def register_api(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('login')])
 def login_api(request):
     username = request.data.get('username')
     password = request.data.get('password')
@@ -226,6 +588,7 @@ def login_api(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('google_check')])
 def google_check(request):
     email = request.data.get('email')
     if not email:
@@ -244,6 +607,7 @@ def google_check(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped_throttle('reset_password')])
 def reset_password_api(request):
     email = request.data.get('email', '').strip()
     new_password = request.data.get('new_password')